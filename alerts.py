@@ -0,0 +1,207 @@
+# alerts.py
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+class Ewma:
+    """Trung bình và phương sai trượt theo hàm mũ (cập nhật O(1), không giữ lịch sử)"""
+
+    __slots__ = ("alpha", "mean", "var", "count")
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.mean = None
+        self.var = 0.0
+        self.count = 0
+
+    def update(self, value):
+        self.count += 1
+        if self.mean is None:
+            self.mean = value
+            return
+        diff = value - self.mean
+        increment = self.alpha * diff
+        self.mean += increment
+        self.var = (1 - self.alpha) * (self.var + diff * increment)
+
+
+class Rule:
+    """Một luật cảnh báo trên một metric của time series
+
+    type "threshold": giá trị (làm mượt EWMA nếu có "smooth") vượt "above"/"below"
+    type "rate": tốc độ thay đổi mỗi phút trong "window" giây vượt "above"/"below"
+    type "anomaly": độ lệch so với EWMA vượt "sigma" lần độ lệch chuẩn (sau "min_samples" mẫu); vi phạm
+    kéo dài quá "adapt_after" giây được coi là mức mới và học dần vào EWMA
+
+    Mỗi series (vd. mỗi mount) có một Rule riêng giữ trạng thái của nó, xem AlertEngine.
+    """
+
+    def __init__(self, spec):
+        self.name = spec["name"]
+        self.metric = spec["metric"]
+        self.kind = spec.get("type", "threshold")
+        if self.kind not in ("threshold", "rate", "anomaly"):
+            raise ValueError(f"Unknown alert rule type {self.kind!r} in rule {self.name}")
+        self.above = spec.get("above")
+        self.below = spec.get("below")
+        self.duration = spec.get("for", 0)
+        self.severity = spec.get("severity", "warning")
+        self.smooth = Ewma(spec["smooth"]) if spec.get("smooth") else None
+        self.window = spec.get("window", 300)
+        self.history = deque()
+        self.stats = Ewma(spec.get("alpha", 0.05))
+        self.sigma = spec.get("sigma", 4)
+        self.min_samples = spec.get("min_samples", 60)
+        self.min_value = spec.get("min_value")
+        self.adapt_after = spec.get("adapt_after", 600)
+        # Trạng thái chống trùng lặp
+        self.firing = False
+        self.breach_since = None
+        self.ok_since = None
+        self.last_sent = None
+        self.fired_at = None
+
+    def _outside(self, value):
+        return (self.above is not None and value > self.above) or (self.below is not None and value < self.below)
+
+    def check(self, value, now):
+        """Trả về (vi phạm hay không, giá trị đã so sánh); None nếu chưa đủ dữ liệu"""
+        if self.kind == "threshold":
+            if self.smooth is not None:
+                self.smooth.update(value)
+                value = self.smooth.mean
+            return self._outside(value), value
+        if self.kind == "rate":
+            self.history.append((now, value))
+            while self.history and now - self.history[0][0] > self.window:
+                self.history.popleft()
+            first_time, first_value = self.history[0]
+            if now - first_time < self.window / 2:
+                return None, None
+            rate = (value - first_value) / (now - first_time) * 60
+            return self._outside(rate), rate
+        # anomaly: mẫu bất thường không được học vào EWMA, nếu không đợt tăng kéo dài sẽ tự thành "bình thường"
+        # sau vài mẫu và điều kiện "for" không bao giờ đạt. Vi phạm kéo dài quá adapt_after giây thì học tiếp:
+        # mức mới sau khi đổi cấu hình/tải không làm alert kêu mãi
+        stats = self.stats
+        if stats.count < self.min_samples or stats.var <= 0:
+            stats.update(value)
+            return None, None
+        score = (value - stats.mean) / math.sqrt(stats.var)
+        breach = abs(score) > self.sigma and (self.min_value is None or value >= self.min_value)
+        if not breach or (self.breach_since is not None and now - self.breach_since >= self.adapt_after):
+            stats.update(value)
+        return breach, round(score, 2)
+
+
+class AlertEngine:
+    """Đánh giá luật trên từng mẫu, chỉ trả về thay đổi trạng thái (firing/resolved) và nhắc lại định kỳ
+
+    Mẫu có thể gắn nhãn (vd. {"mount": "/var"}): mỗi tổ hợp luật + nhãn giữ trạng thái riêng và
+    alert mang theo nhãn đó.
+    """
+
+    def __init__(self, rules, repeat_interval=3600, clock=time.monotonic):
+        self.by_metric = {}
+        for spec in rules:
+            Rule(spec)  # Cấu hình sai báo lỗi ngay khi khởi động
+            self.by_metric.setdefault(spec["metric"], []).append(spec)
+        self.series = {}  # (tên luật, nhãn) -> Rule
+        self.repeat_interval = repeat_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    def _alert(self, rule, state, value, now, labels):
+        return {
+            "rule": rule.name,
+            "metric": rule.metric,
+            "labels": dict(labels),
+            "type": rule.kind,
+            "severity": rule.severity,
+            "state": state,
+            "value": round(value, 3) if isinstance(value, float) else value,
+            "above": rule.above,
+            "below": rule.below,
+            "duration": round(now - rule.fired_at, 1) if rule.fired_at is not None else 0,
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    def evaluate(self, sample, labels=None):
+        """Cho một mẫu {metric: giá trị} (gắn nhãn `labels` nếu có), trả về danh sách alert cần gửi"""
+        with self._lock:
+            alerts = self._evaluate(sample, tuple(sorted((labels or {}).items())), self.clock())
+        self._log(alerts)
+        return alerts
+
+    def evaluate_series(self, series, metrics):
+        """Đánh giá một nhóm series [(nhãn, mẫu)] của các `metrics` (vd. mọi mount trong một lần collect)
+
+        Series của các metric này không còn trong nhóm (mount đã gỡ, thiết bị bị rút) được resolve
+        nếu đang firing và bỏ trạng thái.
+        """
+        now = self.clock()
+        alerts = []
+        with self._lock:
+            seen = set()
+            for labels, sample in series:
+                key = tuple(sorted(labels.items()))
+                seen.add(key)
+                alerts.extend(self._evaluate(sample, key, now))
+            for (name, key), rule in list(self.series.items()):
+                if rule.metric in metrics and key not in seen:
+                    if rule.firing:
+                        alerts.append(self._alert(rule, "resolved", None, now, key))
+                    del self.series[(name, key)]
+        self._log(alerts)
+        return alerts
+
+    def _rule(self, spec, key):
+        rule = self.series.get((spec["name"], key))
+        if rule is None:
+            rule = self.series[(spec["name"], key)] = Rule(spec)
+        return rule
+
+    def _evaluate(self, sample, key, now):
+        """Đánh giá một mẫu của series có nhãn `key` (đang giữ lock)"""
+        alerts = []
+        for metric, value in sample.items():
+            if value is None or metric not in self.by_metric:
+                continue
+            for spec in self.by_metric[metric]:
+                rule = self._rule(spec, key)
+                breach, observed = rule.check(float(value), now)
+                if breach is None:
+                    continue
+                if breach:
+                    rule.ok_since = None
+                    if rule.breach_since is None:
+                        rule.breach_since = now
+                    if not rule.firing and now - rule.breach_since >= rule.duration:
+                        rule.firing = True
+                        rule.fired_at = rule.last_sent = now
+                        alerts.append(self._alert(rule, "firing", observed, now, key))
+                    elif rule.firing and now - rule.last_sent >= self.repeat_interval:
+                        rule.last_sent = now
+                        alerts.append(self._alert(rule, "firing", observed, now, key))
+                else:
+                    rule.breach_since = None
+                    if rule.firing:
+                        # Hết vi phạm trong cùng khoảng "for" mới coi là hết, tránh bật tắt liên tục
+                        if rule.ok_since is None:
+                            rule.ok_since = now
+                        if now - rule.ok_since >= rule.duration:
+                            alerts.append(self._alert(rule, "resolved", observed, now, key))
+                            rule.firing = False
+                            rule.fired_at = rule.ok_since = None
+        return alerts
+
+    @staticmethod
+    def _log(alerts):
+        for alert in alerts:
+            labels = "".join(f" {name}={value}" for name, value in sorted(alert["labels"].items()))
+            logging.warning(f"Alert {alert['rule']} {alert['state']}:{labels} {alert['metric']} = {alert['value']}")
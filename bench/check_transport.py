@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# bench/check_transport.py
+"""Kiểm tra Transport với mock ingest server cục bộ: một luôn trả 503, một bình thường, một trả lời chậm
+
+    python3 bench/check_transport.py       # lỗi thì exit 1
+
+Kiểm tra: thử lại lỗi tạm thời, ngân sách thử lại, failover sang endpoint tốt và ở lại đó,
+tái sử dụng kết nối keep-alive, POST không có Idempotency-Key không bị gửi lại khi read timeout.
+"""
+
+import logging
+import os
+import sys
+import threading
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import requests
+
+from ingest_server import IngestServer
+from transport import Transport
+
+BODY = b'{"records": []}'
+KEY = {"Idempotency-Key": "check:0.0-1.0"}
+
+
+def serve(**kwargs):
+    server = IngestServer(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, name="ingest")
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def new_transport(endpoints, **kwargs):
+    options = {"max_retries": 2, "retry_base": 0.001, "read_timeout": 5}
+    options.update(kwargs)
+    return Transport(endpoints, **options)
+
+
+def check_failover(failing, healthy, results):
+    """503 được thử lại max_retries lần rồi chuyển sang endpoint tốt; các lần sau gửi thẳng tới đó"""
+    transport = new_transport([f"{failing.url}/ingest", f"{healthy.url}/ingest"])
+    try:
+        response = transport.post_ingest(data=BODY, headers=KEY)
+        results["failover.status"] = (response.status_code, 200)
+        results["failover.retries_on_failing"] = (failing.stats["failed"], 3)
+        results["failover.preferred"] = (transport.preferred, 1)
+        for _ in range(10):
+            transport.post_ingest(data=BODY, headers=KEY)
+        results["failover.stays_on_healthy"] = (failing.stats["failed"], 3)
+        results["failover.accepted"] = (healthy.stats["accepted"], 11)
+        # Pool keep-alive: mọi POST tuần tự tới endpoint tốt đi trên cùng một kết nối
+        results["reuse.connections"] = (len(healthy.clients), 1)
+    finally:
+        transport.close()
+
+
+def check_budget(failing, results, requests_count=20):
+    """Ngân sách thử lại: khi endpoint lỗi liên tục, tổng số retry không vượt số token ban đầu"""
+    failing.reset()
+    transport = new_transport([f"{failing.url}/ingest"], retry_budget_ratio=0.0)
+    try:
+        for _ in range(requests_count):
+            try:
+                transport.post_ingest(data=BODY, headers=KEY)
+            except requests.RequestException:
+                pass
+        # 10 token ban đầu, ratio 0: 20 request + 10 retry
+        results["budget.attempts"] = (failing.stats["failed"], requests_count + transport.budget.max_tokens)
+    finally:
+        transport.close()
+
+
+def check_read_timeout(slow, results):
+    """Read timeout: POST không có Idempotency-Key không gửi lại (server có thể đã ghi), có key thì gửi lại"""
+    transport = new_transport([f"{slow.url}/ingest"], read_timeout=0.2)
+    try:
+        for label, headers, expected in (("no_key", {}, 1), ("with_key", KEY, 3)):
+            slow.reset()
+            try:
+                transport.post_ingest(data=BODY, headers=headers)
+            except requests.RequestException:
+                pass
+            results[f"read_timeout.{label}_attempts"] = (len(slow.keys), expected)
+    finally:
+        transport.close()
+
+
+def main():
+    logging.basicConfig(level=logging.ERROR)
+    failing = serve(failure_rate=1.0)
+    healthy = serve()
+    slow = serve(delay=0.5)
+    results = {}
+    try:
+        check_failover(failing, healthy, results)
+        check_budget(failing, results)
+        check_read_timeout(slow, results)
+    finally:
+        for server in (failing, healthy, slow):
+            server.shutdown()
+
+    width = max(len(name) for name in results)
+    failures = []
+    for name, (value, expected) in sorted(results.items()):
+        ok = value == expected
+        print(f"{name:<{width}}  {value}  {'ok' if ok else f'FAIL (expected {expected})'}")
+        if not ok:
+            failures.append(name)
+    if failures:
+        print(f"\nFAILED: {', '.join(failures)}")
+        return 1
+    print("\nTransport checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+# bench/fixtures.py
+
+import json
+import os
+import random
+import struct
+import time
+
+# Cùng layout với wtmp.UTMP (glibc, 384 byte)
+UTMP = struct.Struct("<h2xi32s4s32s256s2hi2i4i20s")
+BOOT_TIME = 2
+USER_PROCESS = 7
+DEAD_PROCESS = 8
+
+# Kích thước mặc định tương ứng với các máy lớn nhất đang chạy agent
+DEFAULT_SIZES = {
+    "iptables_rules": 50000,
+    "services": 2000,
+    "wtmp_records": 50000,
+    "btmp_records": 20000,
+    "dimms": 48,
+    "cpus": 2,
+}
+
+
+def dmidecode(dimms=48, cpus=2):
+    """Đầu ra `dmidecode` của một server 2 socket nhiều DIMM"""
+    lines = ["# dmidecode 3.3", "Getting SMBIOS data from sysfs.", "SMBIOS 3.2.0 present.", ""]
+    handle = 0
+
+    def section(dmi_type, name, fields):
+        nonlocal handle
+        lines.append(f"Handle 0x{handle:04X}, DMI type {dmi_type}, 64 bytes")
+        lines.append(name)
+        for key, value in fields:
+            if isinstance(value, list):
+                lines.append(f"\t{key}:")
+                lines.extend(f"\t\t{item}" for item in value)
+            else:
+                lines.append(f"\t{key}: {value}")
+        lines.append("")
+        handle += 1
+
+    section(0, "BIOS Information", [
+        ("Vendor", "Dell Inc."), ("Version", "2.12.2"), ("Release Date", "07/09/2021"),
+        ("Characteristics", ["PCI is supported", "BIOS is upgradeable", "Boot from CD is supported",
+                             "Selectable boot is supported", "ACPI is supported", "UEFI is supported"]),
+    ])
+    section(1, "System Information", [
+        ("Manufacturer", "Dell Inc."), ("Product Name", "PowerEdge R740xd"),
+        ("Serial Number", "BENCH01"), ("UUID", "4c4c4544-0042-4e10-8031-b3c04f353032"),
+    ])
+    section(2, "Base Board Information", [("Manufacturer", "Dell Inc."), ("Product Name", "08D89F")])
+    section(3, "Chassis Information", [("Manufacturer", "Dell Inc."), ("Type", "Rack Mount Chassis")])
+    for cpu in range(cpus):
+        section(4, "Processor Information", [
+            ("Socket Designation", f"CPU{cpu + 1}"), ("Type", "Central Processor"),
+            ("Family", "Xeon"), ("Manufacturer", "Intel"),
+            ("Version", "Intel(R) Xeon(R) Gold 6248R CPU @ 3.00GHz"),
+            ("Flags", [f"FLAG{i} (feature {i})" for i in range(30)]),
+            ("Core Count", "24"), ("Thread Count", "48"),
+        ])
+    for slot in range(dimms):
+        section(17, "Memory Device", [
+            ("Size", "32 GB"), ("Locator", f"A{slot + 1}"), ("Type", "DDR4"),
+            ("Speed", "2933 MT/s"), ("Manufacturer", "Micron"), ("Serial Number", f"{slot:08X}"),
+        ])
+    for slot in range(8):
+        section(9, "System Slot Information", [
+            ("Designation", f"PCIe Slot {slot + 1}"), ("Type", "x16 PCI Express 3"), ("Current Usage", "Available"),
+        ])
+    return "\n".join(lines)
+
+
+def iptables_save(path, rules=50000, generation=0):
+    """Ghi đầu ra `iptables-save -c` kiểu node Kubernetes: ~`rules` rule kube-proxy trong bảng nat
+
+    Mỗi `generation` tăng counter của ~5% rule có traffic và đổi endpoint của một service.
+    """
+    rng = random.Random(rules)
+    services = max(1, rules // 10)  # Mỗi service: 1 rule KUBE-SERVICES, 3 rule KUBE-SVC, 3 KUBE-SEP x 2 rule
+
+    def counter(base):
+        packets = base + (generation * rng.randrange(1, 1000) if rng.random() < 0.05 else 0)
+        return f"[{packets}:{packets * 60}]"
+
+    with open(path, "w") as f:
+        f.write("# Generated by iptables-save v1.8.7\n*raw\n:PREROUTING ACCEPT [0:0]\n:OUTPUT ACCEPT [0:0]\nCOMMIT\n")
+        f.write("*filter\n:INPUT ACCEPT [1000:60000]\n:FORWARD DROP [0:0]\n:OUTPUT ACCEPT [900:54000]\n")
+        f.write(":KUBE-FIREWALL - [0:0]\n")
+        f.write(f"{counter(1000)} -A INPUT -j KUBE-FIREWALL\n")
+        f.write(f"{counter(5)} -A KUBE-FIREWALL -m mark --mark 0x8000/0x8000 -j DROP\nCOMMIT\n")
+        f.write("*nat\n:PREROUTING ACCEPT [0:0]\n:OUTPUT ACCEPT [0:0]\n:POSTROUTING ACCEPT [0:0]\n")
+        f.write(":KUBE-SERVICES - [0:0]\n")
+        for svc in range(services):
+            f.write(f":KUBE-SVC-{svc:016X} - [0:0]\n")
+            for ep in range(3):
+                f.write(f":KUBE-SEP-{svc:012X}{ep:04X} - [0:0]\n")
+        f.write(f"{counter(500)} -A PREROUTING -m comment --comment \"kubernetes service portals\" -j KUBE-SERVICES\n")
+        for svc in range(services):
+            f.write(f"{counter(rng.randrange(100))} -A KUBE-SERVICES -d 10.96.{svc // 256}.{svc % 256}/32 -p tcp "
+                    f"-m comment --comment \"default/svc-{svc}\" -m tcp --dport 80 -j KUBE-SVC-{svc:016X}\n")
+        for svc in range(services):
+            for ep in range(3):
+                probability = "" if ep == 2 else f" -m statistic --mode random --probability {1 / (3 - ep):.11f}"
+                f.write(f"{counter(rng.randrange(100))} -A KUBE-SVC-{svc:016X}{probability} "
+                        f"-j KUBE-SEP-{svc:012X}{ep:04X}\n")
+            for ep in range(3):
+                # Service 0 đổi endpoint sau mỗi generation (pod được lên lịch lại)
+                host = (svc * 3 + ep + (generation if svc == 0 else 0)) % 65536
+                f.write(f"{counter(rng.randrange(100))} -A KUBE-SEP-{svc:012X}{ep:04X} -s 10.244.{host // 256}.{host % 256}/32 "
+                        f"-j KUBE-MARK-MASQ\n")
+                f.write(f"{counter(rng.randrange(100))} -A KUBE-SEP-{svc:012X}{ep:04X} -p tcp -m tcp "
+                        f"-j DNAT --to-destination 10.244.{host // 256}.{host % 256}:8080\n")
+        f.write("COMMIT\n")
+
+
+def nft_ruleset(path, rules=200, generation=0):
+    """Ghi đầu ra `nft -j list ruleset` của một bảng inet filter"""
+    items = [
+        {"metainfo": {"version": "1.0.2", "json_schema_version": 1}},
+        {"table": {"family": "inet", "name": "filter", "handle": 1}},
+        {"chain": {"family": "inet", "table": "filter", "name": "input", "handle": 1,
+                   "type": "filter", "hook": "input", "prio": 0, "policy": "drop"}},
+    ]
+    for i in range(rules):
+        items.append({"rule": {"family": "inet", "table": "filter", "chain": "input", "handle": i + 2, "expr": [
+            {"match": {"op": "==", "left": {"payload": {"protocol": "tcp", "field": "dport"}}, "right": 1000 + i}},
+            {"counter": {"packets": i * (generation + 1), "bytes": i * 60 * (generation + 1)}},
+            {"accept": None},
+        ]}})
+    with open(path, "w") as f:
+        json.dump({"nftables": items}, f)
+
+
+def systemctl_show(path, services=2000, generation=0):
+    """Ghi đầu ra `systemctl show` cho `services` unit; mỗi `generation` đổi accounting và vài trạng thái"""
+    rng = random.Random(generation)
+    with open(path, "w") as f:
+        for i in range(services):
+            active = (i + generation) % 97 != 0  # ~1% unit đổi trạng thái giữa các generation
+            accounting = i % 10 != 0  # Một phần không bật accounting: phải đọc cgroup
+            f.write(
+                f"Id=bench-{i}.service\n"
+                f"Description=Benchmark service {i}\n"
+                f"LoadState=loaded\n"
+                f"ActiveState={'active' if active else 'inactive'}\n"
+                f"SubState={'running' if active else 'dead'}\n"
+                f"UnitFileState=enabled\n"
+                f"MainPID={1000 + i if active else 0}\n"
+                f"NRestarts={generation // 10}\n"
+                f"MemoryCurrent={rng.randrange(10 ** 6, 10 ** 9) if active and accounting else '[not set]'}\n"
+                f"CPUUsageNSec={(generation + 1) * 10 ** 9 + i if active and accounting else '[not set]'}\n"
+                f"TasksCurrent={rng.randrange(1, 64) if active else '[not set]'}\n"
+                f"ControlGroup=/system.slice/bench-{i}.service\n"
+                "\n"
+            )
+
+
+def utmp_records(count, start_time=None, failed=False, seed=0):
+    """Các bản ghi utmp: phiên login/logout xen kẽ reboot (hoặc login lỗi cho btmp)"""
+    rng = random.Random(seed)
+    now = int(start_time or time.time() - count * 60)
+    for i in range(count):
+        user = f"user{rng.randrange(200)}".encode()
+        host = f"203.0.113.{rng.randrange(256)}".encode()
+        line = f"pts/{i % 64}".encode()
+        if failed:
+            ut_type = USER_PROCESS
+        elif i % 5000 == 4999:
+            ut_type, user, line = BOOT_TIME, b"reboot", b"~"
+        else:
+            ut_type = USER_PROCESS if i % 2 == 0 else DEAD_PROCESS
+        yield UTMP.pack(ut_type, 10000 + i, line, b"ts", user, host, 0, 0, 0, now + i * 60, 0,
+                        0, 0, 0, 0, b"")
+
+
+def write_utmp(path, count, failed=False, seed=0, mode="wb"):
+    with open(path, mode) as f:
+        for record in utmp_records(count, failed=failed, seed=seed):
+            f.write(record)
+
+
+def generate(directory, sizes=None):
+    """Tạo toàn bộ fixture trong `directory`, trả về {tên: đường dẫn}"""
+    sizes = dict(DEFAULT_SIZES, **(sizes or {}))
+    os.makedirs(directory, exist_ok=True)
+    paths = {
+        "dmidecode": os.path.join(directory, "dmidecode.txt"),
+        "iptables": [os.path.join(directory, f"iptables_save.{g}.txt") for g in range(3)],
+        "nft": [os.path.join(directory, f"nft_ruleset.{g}.json") for g in range(3)],
+        "services": [os.path.join(directory, f"systemctl_show.{g}.txt") for g in range(3)],
+        "wtmp": os.path.join(directory, "wtmp"),
+        "btmp": os.path.join(directory, "btmp"),
+    }
+    with open(paths["dmidecode"], "w") as f:
+        f.write(dmidecode(sizes["dimms"], sizes["cpus"]))
+    for generation, path in enumerate(paths["iptables"]):
+        iptables_save(path, sizes["iptables_rules"], generation)
+    for generation, path in enumerate(paths["nft"]):
+        nft_ruleset(path, generation=generation)
+    for generation, path in enumerate(paths["services"]):
+        systemctl_show(path, sizes["services"], generation)
+    write_utmp(paths["wtmp"], sizes["wtmp_records"])
+    write_utmp(paths["btmp"], sizes["btmp_records"], failed=True, seed=1)
+    return paths
@@ -0,0 +1,134 @@
+# bench/ingest_server.py
+
+import gzip
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class IngestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive như server thật
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        # /stats và /reset cho harness; /ip thay cho PUBLIC_IP_URL, còn lại thay cho UPDATE_URL
+        if self.path.startswith("/stats"):
+            self._reply(200, self.server.stats)
+        elif self.path.startswith("/reset"):
+            self.server.reset()
+            self._reply(200, self.server.stats)
+        elif self.path.startswith("/ip"):
+            data = b"203.0.113.10\n"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._reply(200, {"version": "0.0.0"})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        server.track(self.client_address, self.headers.get("Idempotency-Key"))
+        if server.delay:
+            time.sleep(server.delay)
+        if server.failure_rate and random.random() < server.failure_rate:
+            server.count("failed", len(body))
+            self._reply(503, {"status": "unavailable"})
+            return
+        encoding = self.headers.get("Content-Encoding")
+        try:
+            if encoding == "gzip":
+                decoded = gzip.decompress(body)
+            elif encoding == "zstd" and zstandard is not None:
+                decoded = zstandard.ZstdDecompressor().decompressobj().decompress(body)
+            else:
+                decoded = body
+        except Exception as e:
+            server.count("rejected", len(body))
+            self._reply(400, {"status": "error", "error": str(e)})
+            return
+        wire = len(body) + sum(len(k) + len(v) + 4 for k, v in self.headers.items())
+        server.count("accepted", wire, len(decoded))
+        self._reply(200, {"status": "ok"}, server.accept_headers)
+
+
+class IngestServer(ThreadingMixIn, HTTPServer):
+    """Server ingest giả lập trên localhost: nhận mọi upload và đếm số byte trên đường truyền"""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, failure_rate=0.0, accept_headers=None, delay=0.0):
+        super().__init__(("127.0.0.1", port), IngestHandler)
+        self.failure_rate = failure_rate
+        self.delay = delay  # Giây chờ trước khi trả lời (giả lập server chậm)
+        self.accept_headers = accept_headers if accept_headers is not None else {
+            "X-Ingest-Accept-Encoding": "msgpack, cbor, json",
+            "X-Ingest-Accept-Compression": "zstd, gzip, identity",
+        }
+        self.stats = {"accepted": 0, "failed": 0, "rejected": 0, "wire_bytes": 0, "decoded_bytes": 0}
+        self.clients = set()  # (ip, port) của các kết nối TCP đã gửi POST
+        self.keys = []  # Idempotency-Key theo thứ tự nhận
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, outcome, wire_bytes, decoded_bytes=0):
+        with self._lock:
+            self.stats[outcome] += 1
+            self.stats["wire_bytes"] += wire_bytes
+            self.stats["decoded_bytes"] += decoded_bytes
+
+    def handle_error(self, request, client_address):
+        # Client bỏ kết nối giữa chừng (read timeout của agent) là tình huống được kiểm tra, không in traceback
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    def track(self, client_address, key):
+        with self._lock:
+            self.clients.add(client_address)
+            self.keys.append(key)
+
+    def reset(self):
+        with self._lock:
+            for key in self.stats:
+                self.stats[key] = 0
+            self.clients.clear()
+            self.keys.clear()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Mock ingest server cho agent")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = IngestServer(args.port, args.failure_rate)
+    print(f"Listening on {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(server.stats))
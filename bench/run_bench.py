@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# bench/run_bench.py
+"""Benchmark agent trên fixture của máy lớn nhất và N agent giả lập gửi tới mock ingest server
+
+    python3 bench/run_bench.py                          # so với bench/budgets.json, lỗi thì exit 1
+    python3 bench/run_bench.py --agents 50 --cycles 10 --failure-rate 0.1
+    python3 bench/run_bench.py --save-baseline baseline.json
+    python3 bench/run_bench.py --baseline baseline.json --tolerance 0.25
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import requests
+
+import executor
+import fixtures
+from config import Config
+from executor import CommandResult
+from main import ServerAgent
+from services import parse_show
+from timeseries import summarize
+from wtmp import LoginHistoryReader
+
+# Số wtmp record mới ghi thêm giữa hai chu kỳ
+WTMP_APPEND_PER_CYCLE = 100
+# Mẫu time series chỉ tốn ~0.2 ms, dưới độ phân giải của getrusage: đo cả loạt rồi chia
+TIMESERIES_SAMPLES_PER_CYCLE = 50
+# Metric càng lớn càng tốt: không so với baseline
+HIGHER_IS_BETTER = ("fleet.agents", "fleet.uploads", "fleet.uploads_per_sec")
+# Module nặng không được nạp trước khi mẫu đầu tiên được thu thập
+HEAVY_MODULES = ("requests", "urllib3", "distro", "platform", "http.server", "msgpack", "cbor2", "zstandard")
+
+# Process agent mới khởi động qua ServerAgent.start() như main(): đo lúc bản ghi đầu tiên vào spool
+# (module nặng đã nạp, RSS) và lúc upload đầu tiên được ack
+STARTUP_SCRIPT = """
+import json, sys, threading, types
+sys.path.insert(0, sys.argv[1])
+from config import Config
+Config.DATA_DIR, Config.LOG_FILE, Config.MONITOR_URLS = sys.argv[2], sys.argv[3], [sys.argv[4]]
+Config.TIMESERIES_SOCKET = Config.METRICS_PORT = Config.HOST_CONFIG_PATH = None
+Config.COLLECTOR_PLUGIN_DIRS = []
+from main import ServerAgent
+from instrumentation import metrics
+agent = ServerAgent()
+sampled, uploaded = threading.Event(), threading.Event()
+first = threading.Lock()
+enqueue, ack = agent.enqueue, agent.spool.ack
+
+def first_enqueue(record_type, data):
+    # Các collector nhẹ cùng chạy lúc khởi động: chỉ bản ghi đầu tiên được in
+    with first:
+        if not sampled.is_set():
+            loaded = [name for name in json.loads(sys.argv[5]) if type(sys.modules.get(name)) is types.ModuleType]
+            print(json.dumps({"rss": metrics.usage.rss_bytes(), "loaded": loaded, "type": record_type}), flush=True)
+            sampled.set()
+    enqueue(record_type, data)
+
+def first_ack(cursor):
+    ack(cursor)
+    uploaded.set()
+
+agent.enqueue, agent.spool.ack = first_enqueue, first_ack
+agent.start()
+sampled.wait(30)
+print(json.dumps({"uploaded": uploaded.wait(30)}), flush=True)
+agent.stop()
+"""
+
+
+class FixtureRunner:
+    """Thay run_command: trả về output ghi sẵn theo lệnh thay vì chạy lệnh thật"""
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.calls = {}
+
+    def __call__(self, cmd, timeout=None):
+        name = os.path.basename(cmd[0])
+        count = self.calls.get(name, 0)
+        self.calls[name] = count + 1
+        if name == "dmidecode":
+            path = self.paths["dmidecode"]
+        elif name in ("iptables-save", "nft", "systemctl"):
+            # Xoay vòng các generation để có thay đổi rule, counter, trạng thái giữa các chu kỳ
+            generations = self.paths[{"iptables-save": "iptables", "nft": "nft", "systemctl": "services"}[name]]
+            path = generations[count % len(generations)]
+        else:
+            return CommandResult(cmd, error=f"{name}: not available in benchmark")
+        with open(path, "r") as f:
+            return CommandResult(cmd, 0, f.read(), "")
+
+    def install(self):
+        """Thay run_command trong mọi module đã import nó"""
+        for module in list(sys.modules.values()):
+            if getattr(module, "run_command", None) is executor.run_command and module is not executor:
+                module.run_command = self
+
+
+class IngestProcess:
+    """Mock ingest server chạy ở process riêng để CPU/RSS đo được chỉ là của agent"""
+
+    def __init__(self, failure_rate=0.0):
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.join(BENCH_DIR, "ingest_server.py"), "--port", "0",
+             "--failure-rate", str(failure_rate)],
+            stdout=subprocess.PIPE, universal_newlines=True
+        )
+        self.url = self.proc.stdout.readline().split()[-1]
+
+    def stats(self, reset=False):
+        return requests.get(f"{self.url}/{'reset' if reset else 'stats'}", timeout=5).json()
+
+    def stop(self):
+        self.proc.terminate()
+        self.proc.wait()
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # ru_maxrss tính bằng KB trên Linux
+
+
+def timed(samples, name, func, *args, repeat=1):
+    """Chạy func `repeat` lần, ghi (độ trễ ms, CPU giây) trung bình một lần vào samples[name]"""
+    cpu = cpu_seconds()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(*args)
+    samples.setdefault(name, []).append(((time.perf_counter() - start) * 1000 / repeat,
+                                         (cpu_seconds() - cpu) / repeat))
+    return result
+
+
+def configure(workdir, ingest_url):
+    """Trỏ agent tới mock server và thư mục tạm"""
+    Config.DATA_DIR = os.path.join(workdir, "agent")
+    Config.LOG_FILE = os.path.join(workdir, "agent.log")
+    Config.MONITOR_URLS = [f"{ingest_url}/ingest"]
+    Config.PUBLIC_IP_URL = f"{ingest_url}/ip"
+    Config.UPDATE_URL = f"{ingest_url}/latest_version.json"
+    Config.TIMESERIES_SOCKET = None
+    Config.HTTP_RETRY_BASE = 0.01
+    # Bench chạy cả trong container: bật tường minh collector host_only để số đo giống nhau ở mọi nơi
+    Config.HOST_CONFIG_PATH = os.path.join(workdir, "host.json")
+    Config.COLLECTOR_PLUGIN_DIRS = []
+    with open(Config.HOST_CONFIG_PATH, "w") as f:
+        json.dump({"collectors": {"hardware": {"enabled": True}}}, f)
+
+
+def new_agent(data_dir, paths):
+    """ServerAgent thật, chỉ đổi nguồn wtmp/btmp sang fixture"""
+    agent = ServerAgent(data_dir)
+    agent.monitor.login_reader = LoginHistoryReader(
+        agent.data_dir / "login_cursor.json", wtmp=paths["wtmp"], btmp=paths["btmp"],
+        auth_logs=(), backfill_records=Config.LOGIN_HISTORY_BACKFILL
+    )
+    return agent
+
+
+def startup(workdir, ingest, runs=3):
+    """Khởi động process agent mới qua start(): thời gian tới mẫu đầu tiên / upload đầu tiên, RSS, module nặng đã nạp"""
+    first_sample, first_upload, rss, loaded = [], [], [], set()
+    for i in range(runs):
+        data_dir = os.path.join(workdir, "startup", str(i))
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-c", STARTUP_SCRIPT, os.path.dirname(BENCH_DIR), data_dir,
+             os.path.join(workdir, "startup.log"), f"{ingest.url}/ingest", json.dumps(HEAVY_MODULES)],
+            stdout=subprocess.PIPE, universal_newlines=True
+        )
+        sample = json.loads(proc.stdout.readline())
+        first_sample.append((time.perf_counter() - start) * 1000)
+        upload = json.loads(proc.stdout.readline())
+        if upload["uploaded"]:  # Với --failure-rate, lần gửi bị mock server từ chối không tính
+            first_upload.append((time.perf_counter() - start) * 1000)
+        proc.wait()
+        rss.append(sample["rss"] / 1024 / 1024)
+        loaded.update(sample["loaded"])
+    if loaded:
+        print(f"Heavy modules loaded before the first sample: {', '.join(sorted(loaded))}")
+    result = {
+        "startup.first_sample_ms": round(min(first_sample), 1),
+        "startup.rss_mb": round(min(rss), 1),
+        "startup.heavy_modules": len(loaded),
+    }
+    if first_upload:
+        result["startup.first_upload_ms"] = round(min(first_upload), 1)
+    return result
+
+
+def run_cycle(agent, samples):
+    """Một chu kỳ upload: mọi collector chạy một lần rồi gửi ngay (không chờ lịch thật)"""
+    for collector in agent.registry.enabled():
+        timed(samples, collector.name, agent.run_collector, collector)
+    timed(samples, "timeseries", agent.sample_timeseries, repeat=TIMESERIES_SAMPLES_PER_CYCLE)
+    agent.next_snapshot = agent.next_upload = 0
+    timed(samples, "send_to_server", agent.send_to_server)
+
+
+def bench_parsers(monitor, paths, samples, repeat):
+    """Các bộ phân tích trên toàn bộ fixture (trường hợp xấu nhất: mất cursor, mất cache)"""
+    with open(paths["dmidecode"], "r") as f:
+        dmi_output = f.read()
+    with open(paths["services"][0], "r") as f:
+        show_output = f.read()
+    state_dir = tempfile.mkdtemp(prefix="bench-wtmp-")
+    try:
+        for i in range(repeat):
+            timed(samples, "parse.dmidecode", monitor.parse_dmidecode, dmi_output)
+            timed(samples, "parse.systemctl_show", parse_show, show_output)
+            reader = LoginHistoryReader(os.path.join(state_dir, f"cursor{i}.json"), wtmp=paths["wtmp"],
+                                        btmp=paths["btmp"], auth_logs=(), backfill_records=10 ** 9)
+            timed(samples, "parse.wtmp_full", reader.read)
+    finally:
+        shutil.rmtree(state_dir)
+
+
+def profile(agent, paths, ingest, cycles, samples):
+    """Một agent qua nhiều chu kỳ: độ trễ, CPU, RSS và số byte gửi đi mỗi chu kỳ"""
+    agent.snapshots.start()
+    wire = []
+    for cycle in range(cycles):
+        if cycle:
+            fixtures.write_utmp(paths["wtmp"], WTMP_APPEND_PER_CYCLE, seed=cycle, mode="ab")
+        ingest.stats(reset=True)
+        run_cycle(agent, samples)
+        wire.append(ingest.stats())
+    return wire
+
+
+def fleet(paths, ingest, agents, cycles, workdir, concurrency):
+    """N agent giả lập chạy đồng thời gửi tới mock server"""
+    ingest.stats(reset=True)
+    fleet_agents = [new_agent(os.path.join(workdir, "fleet", str(i)), paths) for i in range(agents)]
+
+    def run_agent(agent):
+        samples = {}
+        for _ in range(cycles):
+            run_cycle(agent, samples)
+        records, _ = agent.spool.read_batch(Config.SPOOL_BATCH_RECORDS, Config.SPOOL_BATCH_BYTES)
+        return len(records)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        undelivered = sum(pool.map(run_agent, fleet_agents))
+    elapsed = time.perf_counter() - start
+    stats = ingest.stats()
+    return {
+        "fleet.agents": agents,
+        "fleet.uploads": stats["accepted"],
+        "fleet.failed_uploads": stats["failed"] + stats["rejected"],
+        "fleet.undelivered_records": undelivered,
+        "fleet.uploads_per_sec": round(stats["accepted"] / elapsed, 1),
+        "fleet.wire_bytes_per_agent_cycle": stats["wire_bytes"] // (agents * cycles),
+    }
+
+
+def report(agent, samples, wire):
+    """Gộp số đo thành các metric phẳng {tên: số}"""
+    metrics = {}
+    for name, values in sorted(samples.items()):
+        latency = summarize([ms for ms, _ in values])
+        metrics[f"{name}.p95_ms"] = round(latency["p95"], 1)
+        metrics[f"{name}.max_ms"] = round(latency["max"], 1)
+        metrics[f"{name}.cpu_ms"] = round(sum(cpu for _, cpu in values) / len(values) * 1000, 1)
+
+    # CPU trung bình trong một CHECK_INTERVAL theo đúng lịch của từng job
+    jobs = {collector.name: collector.interval for collector in agent.registry.enabled()}
+    jobs.update({"timeseries": Config.TIMESERIES_SAMPLE_INTERVAL, "send_to_server": Config.CHECK_INTERVAL})
+    steady = sum(metrics[f"{name}.cpu_ms"] / 1000 * Config.CHECK_INTERVAL / interval
+                 for name, interval in jobs.items() if f"{name}.cpu_ms" in metrics)
+    metrics["steady.cpu_seconds_per_interval"] = round(steady, 3)
+    metrics["steady.cpu_percent"] = round(steady / Config.CHECK_INTERVAL * 100, 3)
+    metrics["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    metrics["wire.first_cycle_bytes"] = wire[0]["wire_bytes"]
+    if len(wire) > 1:
+        metrics["wire.cycle_bytes"] = max(w["wire_bytes"] for w in wire[1:])
+        metrics["wire.cycle_decoded_bytes"] = max(w["decoded_bytes"] for w in wire[1:])
+    return metrics
+
+
+def check(metrics, limits, tolerance=0.0, label="budget"):
+    """Các metric vượt giới hạn (metric không có trong giới hạn thì bỏ qua)"""
+    failures = []
+    for name, limit in sorted(limits.items()):
+        if name not in metrics or name in HIGHER_IS_BETTER or not isinstance(limit, (int, float)):
+            continue
+        allowed = limit * (1 + tolerance)
+        if metrics[name] > allowed:
+            failures.append(f"{name} = {metrics[name]} exceeds {label} {round(allowed, 3)}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline của agent trên fixture máy lớn")
+    parser.add_argument("--cycles", type=int, default=5, help="Số chu kỳ upload của agent được đo")
+    parser.add_argument("--agents", type=int, default=10, help="Số agent giả lập (0 để bỏ qua)")
+    parser.add_argument("--fleet-cycles", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Tỉ lệ upload bị mock server trả 503")
+    parser.add_argument("--parse-repeat", type=int, default=3)
+    parser.add_argument("--budgets", default=os.path.join(BENCH_DIR, "budgets.json"))
+    parser.add_argument("--baseline", help="So với kết quả lần trước, lỗi nếu chậm hơn quá --tolerance")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--save-baseline", help="Ghi kết quả lần chạy này làm baseline")
+    parser.add_argument("--keep", action="store_true", help="Giữ lại thư mục tạm (fixture, log của agent)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="server-agent-bench-")
+    ingest = IngestProcess(args.failure_rate)
+    try:
+        print(f"Generating fixtures in {workdir} ...")
+        paths = fixtures.generate(os.path.join(workdir, "fixtures"))
+        configure(workdir, ingest.url)
+        logging.basicConfig(filename=Config.LOG_FILE, level=logging.INFO,
+                            format='%(asctime)s - %(levelname)s - %(message)s')
+        FixtureRunner(paths).install()
+
+        samples = {}
+        startup_metrics = startup(workdir, ingest)
+        agent = new_agent(Config.DATA_DIR, paths)
+        bench_parsers(agent.monitor, paths, samples, args.parse_repeat)
+        wire = profile(agent, paths, ingest, args.cycles, samples)
+        metrics = report(agent, samples, wire)
+        metrics.update(startup_metrics)
+        if args.agents:
+            metrics.update(fleet(paths, ingest, args.agents, args.fleet_cycles, workdir, args.concurrency))
+    finally:
+        ingest.stop()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    width = max(len(name) for name in metrics)
+    for name, value in sorted(metrics.items()):
+        print(f"{name:<{width}}  {value}")
+
+    failures = []
+    if args.budgets and os.path.exists(args.budgets):
+        with open(args.budgets, "r") as f:
+            failures += check(metrics, json.load(f))
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            failures += check(metrics, json.load(f), args.tolerance, "baseline")
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(metrics, f, indent=2, sort_keys=True)
+
+    if failures:
+        print("\nREGRESSIONS:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\nAll metrics within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
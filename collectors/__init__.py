@@ -0,0 +1,190 @@
+# collectors/__init__.py
+
+import importlib
+import importlib.util
+import inspect
+import json
+import logging
+import os
+import pkgutil
+
+from scheduler import is_number
+
+# Thứ tự tăng dần; host có "max_cost" thấp hơn sẽ tắt các collector đắt hơn
+COST_CLASSES = ("light", "medium", "heavy")
+OPTIONS = ("interval", "jitter", "timeout", "enabled")
+
+# Kiểm tra kiểu của từng tùy chọn lấy từ Config/host.json: giá trị sai bị bỏ qua thay vì làm chết scheduler
+OPTION_CHECKS = {
+    "interval": lambda value: is_number(value, 0, inclusive=False),
+    "jitter": is_number,
+    "timeout": lambda value: value is None or is_number(value, 0, inclusive=False),
+    "enabled": lambda value: isinstance(value, bool),
+}
+
+
+class Collector:
+    """Plugin collector: tên, lịch chạy, mức chi phí, dữ liệu đầu ra và cờ bật/tắt
+
+    Lớp con khai báo các thuộc tính và cài đặt collect(agent). Kết quả khác None được agent
+    đưa vào spool với loại bản ghi `record`; collector có `document` publish snapshot cùng tên
+    và sender gửi tài liệu đó theo delta. Schema đầu ra gồm `version` (gửi kèm mỗi upload để server
+    biết cách đọc) và `fields` là các khóa bắt buộc của bản ghi, kiểm tra trước khi vào spool.
+    """
+
+    name = None
+    interval = 60
+    min_interval = None  # Sàn cho interval (collector đắt): cấu hình thấp hơn bị nâng lên
+    jitter = 0
+    timeout = None
+    cost = "light"
+    record = None
+    document = None
+    enabled = True
+    host_only = False  # Cần phần cứng/kernel của host (dmidecode...): tắt khi chạy trong container
+    version = 1  # Tăng khi đổi cấu trúc của record/document
+    fields = ("timestamp",)
+
+    def __init__(self, options=None):
+        for key, value in (options or {}).items():
+            if key in OPTIONS:
+                setattr(self, key, value)
+        if self.min_interval and self.interval < self.min_interval:
+            logging.warning(f"Collector {self.name} interval {self.interval}s is below its minimum, "
+                            f"using {self.min_interval}s")
+            self.interval = self.min_interval
+        self.disabled_reason = None if self.enabled else "config"
+
+    def collect(self, agent):
+        raise NotImplementedError
+
+    def check(self, data):
+        """Lỗi schema của kết quả collect() (chuỗi mô tả), None nếu hợp lệ"""
+        if not isinstance(data, dict):
+            return f"expected an object, got {type(data).__name__}"
+        missing = [field for field in self.fields if field not in data]
+        return f"missing fields {', '.join(missing)}" if missing else None
+
+
+def load_host_config(path):
+    """File cấu hình riêng của host (nằm ngoài thư mục cài đặt nên không mất khi update); không có thì {}"""
+    if not path:
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logging.error(f"Ignoring unreadable host config {path}: {str(e)}")
+        return {}
+
+
+class Registry:
+    """Các collector tìm thấy trong package này và các thư mục plugin, cấu hình theo host"""
+
+    def __init__(self):
+        self.classes = {}
+        self.collectors = {}
+
+    def register(self, cls):
+        if cls.cost not in COST_CLASSES:
+            logging.error(f"Collector {cls.name} from {cls.__module__} has unknown cost {cls.cost!r}, skipping")
+            return
+        if cls.name in self.classes and self.classes[cls.name] is not cls:
+            logging.info(f"Collector {cls.name} from {cls.__module__} replaces {self.classes[cls.name].__module__}")
+        self.classes[cls.name] = cls
+
+    def _register_module(self, module):
+        for _, cls in inspect.getmembers(module, inspect.isclass):
+            if issubclass(cls, Collector) and cls.name and cls.__module__ == module.__name__:
+                self.register(cls)
+
+    def discover(self, directories=()):
+        """Nạp collector có sẵn (các module trong package) rồi tới các file .py trong `directories`"""
+        for info in pkgutil.iter_modules(__path__):
+            self._register_module(importlib.import_module(f"{__name__}.{info.name}"))
+        for directory in directories:
+            try:
+                files = sorted(f for f in os.listdir(directory) if f.endswith(".py") and not f.startswith("_"))
+            except OSError:
+                continue
+            for filename in files:
+                path = os.path.join(directory, filename)
+                try:
+                    spec = importlib.util.spec_from_file_location(f"collector_plugin_{filename[:-3]}", path)
+                    module = importlib.util.module_from_spec(spec)
+                    spec.loader.exec_module(module)
+                except Exception as e:
+                    logging.error(f"Failed to load collector plugin {path}: {str(e)}")
+                    continue
+                self._register_module(module)
+        return self
+
+    def configure(self, defaults, host_config=None, container=None):
+        """Tạo collector với tùy chọn: mặc định của lớp < `defaults` (Config) < cấu hình host
+
+        Host có thể tắt/bật từng collector, đổi lịch và đặt "max_cost". Collector vượt max_cost
+        hoặc cần host thật khi chạy trong container bị tắt, trừ khi cấu hình host bật tường minh.
+        """
+        host_config = host_config if isinstance(host_config, dict) else {}
+        host_options = host_config.get("collectors", {})
+        if not isinstance(host_options, dict):
+            logging.error(f"Ignoring host config collectors: expected an object, got {host_options!r}")
+            host_options = {}
+        max_cost = host_config.get("max_cost", COST_CLASSES[-1])
+        if max_cost not in COST_CLASSES:
+            logging.error(f"Ignoring host config max_cost {max_cost!r}: expected one of {', '.join(COST_CLASSES)}")
+            max_cost = COST_CLASSES[-1]
+        for name in host_options:
+            if name not in self.classes:
+                logging.warning(f"Host config mentions unknown collector {name}")
+        self.collectors = {}
+        for name, cls in sorted(self.classes.items()):
+            overrides = self._valid_options(name, "host config", host_options.get(name, {}))
+            options = dict(self._valid_options(name, "Config.COLLECTORS", defaults.get(name, {})), **overrides)
+            collector = cls(options)
+            forced = overrides.get("enabled") is True
+            if collector.enabled and not forced:
+                if container and collector.host_only:
+                    collector.enabled, collector.disabled_reason = False, f"container:{container}"
+                elif COST_CLASSES.index(collector.cost) > COST_CLASSES.index(max_cost):
+                    collector.enabled, collector.disabled_reason = False, f"cost:{collector.cost}"
+            self.collectors[name] = collector
+        disabled = [f"{c.name} ({c.disabled_reason})" for c in self.collectors.values() if not c.enabled]
+        logging.info(f"Collectors enabled: {', '.join(c.name for c in self.enabled())}; "
+                     f"disabled: {', '.join(disabled) or 'none'}")
+        return self
+
+    @staticmethod
+    def _valid_options(name, source, options):
+        """Các tùy chọn hợp lệ của một collector; mục sai tên/kiểu được ghi log và bỏ qua"""
+        if not isinstance(options, dict):
+            logging.error(f"Ignoring {source} for collector {name}: expected an object, got {options!r}")
+            return {}
+        valid = {}
+        for key, value in options.items():
+            if key not in OPTION_CHECKS:
+                logging.error(f"Ignoring unknown option {key} for collector {name} in {source}")
+            elif not OPTION_CHECKS[key](value):
+                logging.error(f"Ignoring invalid {key}={value!r} for collector {name} in {source}")
+            else:
+                valid[key] = value
+        return valid
+
+    def enabled(self):
+        return [collector for collector in self.collectors.values() if collector.enabled]
+
+    def get(self, name):
+        return self.collectors.get(name)
+
+    def documents(self):
+        """Tên các tài liệu do collector đang bật tạo ra, cho snapshot store và sender"""
+        return [collector.document for collector in self.enabled() if collector.document]
+
+    def schemas(self):
+        """Phiên bản schema của từng record/document đang được gửi, kèm theo mỗi upload"""
+        return {
+            "records": {c.record: c.version for c in self.enabled() if c.record},
+            "documents": {c.document: c.version for c in self.enabled() if c.document},
+        }
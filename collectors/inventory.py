@@ -0,0 +1,80 @@
+# collectors/inventory.py
+
+from datetime import datetime
+
+from collectors import Collector
+
+
+class SystemInfo(Collector):
+    """OS, IP public, tài khoản và lịch sử đăng nhập"""
+
+    name = "system_info"
+    interval = 86400
+    cost = "medium"
+    document = "system_info"
+
+    def collect(self, agent):
+        agent.monitor.get_system_info()
+
+
+class Hardware(Collector):
+    """dmidecode (cache theo boot/sysfs); trong container chỉ thấy phần cứng của host nên tắt"""
+
+    name = "hardware"
+    interval = 86400
+    cost = "heavy"
+    document = "hardware_info"
+    host_only = True
+
+    def collect(self, agent):
+        agent.monitor.get_hardware_info()
+
+
+class Users(Collector):
+    """Tài khoản trong /etc/passwd; chủ yếu chạy theo thay đổi (Config.WATCHES)"""
+
+    name = "users"
+    interval = 86400
+    cost = "light"
+
+    def collect(self, agent):
+        agent.monitor.refresh_users()
+
+
+class Services(Collector):
+    """Unit systemd: tài liệu đầy đủ theo delta, chỉ unit đổi trạng thái và accounting vào spool"""
+
+    name = "services"
+    interval = 60
+    cost = "medium"
+    record = "services"
+    document = "services"
+    fields = ("timestamp", "changes", "removed", "accounting")
+
+    def collect(self, agent):
+        result = agent.monitor.get_running_services()
+        if result and (result["changes"] or result["removed"] or result["accounting"]):
+            return {
+                "timestamp": datetime.now().isoformat(),
+                "changes": result["changes"],
+                "removed": result["removed"],
+                "accounting": result["accounting"]
+            }
+        return None
+
+
+class Firewall(Collector):
+    """Rule set theo tài liệu firewall_info (delta); counter của rule vào spool theo chênh lệch"""
+
+    name = "firewall"
+    interval = 3600
+    cost = "heavy"
+    record = "firewall_counters"
+    document = "firewall_info"
+    fields = ("timestamp", "chains")
+
+    def collect(self, agent):
+        result = agent.monitor.detect_firewall()
+        if result and result["counters"]["chains"]:
+            return dict(result["counters"], timestamp=datetime.now().isoformat())
+        return None
@@ -0,0 +1,66 @@
+# collectors/resources.py
+
+from datetime import datetime
+
+from collectors import Collector
+from config import Config
+from filesystems import ALERT_METRICS, alert_series, series_sample
+
+
+class ResourceUsage(Collector):
+    """CPU, RAM, disk gốc, mạng và sensor"""
+
+    name = "resource_usage"
+    interval = 10
+    cost = "light"
+    record = "resource_usage"
+    fields = ("timestamp", "cpu", "memory", "disk", "network")
+
+    def collect(self, agent):
+        return agent.monitor.get_resource_usage()
+
+
+class Filesystems(Collector):
+    """Mọi mount thật và IO theo thiết bị; chỉ số gộp đi vào time series, từng mount/thiết bị vào luật cảnh báo"""
+
+    name = "filesystems"
+    interval = 30
+    cost = "light"
+    record = "filesystems"
+    fields = ("timestamp", "filesystems", "devices")
+
+    def collect(self, agent):
+        filesystems = agent.monitor.get_filesystems()
+        if filesystems:
+            agent.timeseries.record(series_sample(filesystems))
+            agent.check_alert_series(alert_series(filesystems), ALERT_METRICS)
+        return filesystems
+
+
+class Processes(Collector):
+    """Top-N process theo CPU, RAM và IO"""
+
+    name = "processes"
+    interval = 15
+    cost = "medium"
+    record = "processes"
+    fields = ("timestamp", "total", "top")
+
+    def collect(self, agent):
+        return agent.monitor.get_top_processes()
+
+
+class NetConnections(Collector):
+    """Bảng kết nối đầy đủ: rất tốn CPU trên LB nên mặc định tắt (Config.NET_CONNECTIONS_FULL)"""
+
+    name = "net_connections"
+    interval = Config.NET_CONNECTIONS_MIN_INTERVAL
+    min_interval = Config.NET_CONNECTIONS_MIN_INTERVAL
+    cost = "heavy"
+    record = "net_connections"
+    fields = ("timestamp", "connections")
+    enabled = Config.NET_CONNECTIONS_FULL
+
+    def collect(self, agent):
+        connections = agent.monitor.get_net_connections()
+        return {"timestamp": datetime.now().isoformat(), "connections": connections}
@@ -3,8 +3,145 @@
 class Config:
     VERSION = "1.0.0"
     UPDATE_URL = "https://raw.githubusercontent.com/thesunbg/server_agent_project/refs/heads/master/latest_version.json"
-    CHECK_INTERVAL = 300  # 5 phút (giây)
+    CHECK_INTERVAL = 300  # 5 phút (giây) - chu kỳ gửi dữ liệu lên server
+    UPDATE_INTERVAL = 86400  # Kiểm tra cập nhật mỗi ngày
+    UPDATE_JITTER = 1800
     DATA_DIR = "/var/log/server_agent"
+    PERSIST_SNAPSHOTS = True  # Ghi bản sao snapshot ra DATA_DIR (nền, rename nguyên tử) để debug/khôi phục
     LOG_FILE = "/var/log/server_agent.log"
     MONITOR_URL = "nguyenvando.com"
-    MONITOR_TOKEN = "xxx"
\ No newline at end of file
+    MONITOR_URLS = [MONITOR_URL]  # Các endpoint ingest theo thứ tự ưu tiên (failover); thiếu scheme thì dùng https
+    MONITOR_TOKEN = "xxx"
+    PUBLIC_IP_URL = "https://whois.inet.vn/api/ifconfig"
+    DELTA_FULL_RESYNC_INTERVAL = 86400  # Gửi lại đầy đủ mỗi ngày dù không có thay đổi
+
+    # Spool trên đĩa (DATA_DIR/spool) giữ dữ liệu khi không gửi được lên server
+    SPOOL_SEGMENT_BYTES = 4 * 1024 * 1024
+    SPOOL_MAX_BYTES = 256 * 1024 * 1024  # Vượt quá thì xóa segment cũ nhất
+    SPOOL_BATCH_RECORDS = 500
+    SPOOL_BATCH_BYTES = 8 * 1024 * 1024  # Trước khi nén
+    SPOOL_MAX_BATCHES = 20  # Số batch tối đa mỗi lượt gửi
+    SCHEDULER_FIRST_RUN_SPREAD = 60  # Giây; lần chạy đầu của job medium/heavy lệch ngẫu nhiên trong khoảng này
+    # Giây chờ sau khi khởi động trước lần chạy đầu của collector medium/heavy và check_update: mẫu đầu tiên
+    # và lần upload đầu tiên không phải tranh CPU/nạp requests cùng chúng
+    STARTUP_DELAY = 15
+    SPOOL_SEND_TICK = 5  # Chu kỳ kiểm tra gửi/thử lại (giây)
+    SPOOL_RETRY_BASE = 10  # Backoff lũy thừa khi gửi lỗi (giây)
+    SPOOL_RETRY_MAX = 900
+    # Batch bị server từ chối (400/422) sau số lần này thì chuyển sang thư mục quarantine và bỏ qua,
+    # không chặn cả spool; 413 thì chia đôi batch trước
+    SPOOL_REJECT_ATTEMPTS = 3
+    SPOOL_QUARANTINE_FILES = 20  # Chỉ giữ số batch bị cách ly mới nhất
+
+    # Định dạng upload theo thứ tự ưu tiên, chốt lại theo danh sách server chấp nhận
+    UPLOAD_ENCODINGS = ["msgpack", "cbor", "json"]  # msgpack/cbor cần gói tương ứng
+    UPLOAD_COMPRESSIONS = ["zstd", "gzip"]  # zstd cần gói zstandard
+    ZSTD_DICT_PATH = None  # Dictionary zstd dùng chung với server (tùy chọn)
+
+    # HTTP dùng chung (pool keep-alive, timeout, retry có jitter trong ngân sách)
+    HTTP_POOL_SIZE = 4
+    HTTP_CONNECT_TIMEOUT = 5
+    HTTP_READ_TIMEOUT = 30
+    HTTP_MAX_RETRIES = 2
+    HTTP_RETRY_BASE = 0.5  # Giây, backoff lũy thừa với full jitter
+    HTTP_RETRY_BUDGET_RATIO = 0.2  # Tối đa 1 lần retry cho mỗi 5 request
+    HTTP_MAX_CONCURRENCY = 4
+
+    # Thực thi lệnh hệ thống
+    COMMAND_TIMEOUT = 20  # Timeout mặc định cho mỗi lệnh hệ thống (giây)
+    PROBE_TIMEOUT = 60  # Thời gian tối đa chờ một nhóm probe chạy song song
+    PROBE_MAX_WORKERS = 4
+
+    # Bảng kết nối đầy đủ (psutil.net_connections) rất tốn CPU trên máy nhiều socket: chỉ bật khi cần
+    NET_CONNECTIONS_FULL = False
+    NET_CONNECTIONS_MIN_INTERVAL = 600  # Tối đa một lần mỗi 10 phút khi bật
+
+    # Lần đầu đọc wtmp/btmp chỉ lấy N bản ghi cuối, sau đó đọc tăng dần theo cursor
+    LOGIN_HISTORY_BACKFILL = 1000
+
+    # Time series trong RAM: lấy mẫu mỗi giây, gửi lên server dạng rollup min/max/avg/p95
+    TIMESERIES_SAMPLE_INTERVAL = 1
+    TIMESERIES_CAPACITY = 3600  # Số điểm giữ lại cho mỗi chuỗi (1 giờ ở 1 mẫu/giây)
+    TIMESERIES_ROLLUP_STEP = 60
+    TIMESERIES_SOCKET = "/run/server_agent.sock"  # API truy vấn cục bộ, để trống để tắt
+
+    # Số liệu tự đo của agent (thời gian collector, lỗi, CPU/RSS): /metrics (Prometheus) và /metrics.json
+    METRICS_HOST = "127.0.0.1"  # Chỉ localhost
+    METRICS_PORT = 9477  # None để tắt endpoint (số liệu vẫn gửi kèm mỗi lần upload)
+
+    # Top process theo CPU/RAM/IO
+    PROCESS_TOP_N = 10
+    PROCESS_MAX_HANDLES = 512  # Số file /proc/<pid>/stat giữ mở giữa các lần quét
+    # Process đang nghỉ chỉ được đọc lại mỗi N lượt (N x interval giây); 5k process: ~26ms/lượt thay vì ~90ms
+    PROCESS_FULL_SCAN_EVERY = 6
+
+    # Filesystem: bỏ filesystem ảo / image chỉ đọc và mount của container, pod
+    FILESYSTEM_IGNORE_TYPES = [
+        "proc", "sysfs", "cgroup", "cgroup2", "devpts", "devtmpfs", "mqueue", "debugfs", "tracefs",
+        "securityfs", "pstore", "bpf", "configfs", "fusectl", "hugetlbfs", "autofs", "binfmt_misc",
+        "efivarfs", "rpc_pipefs", "nsfs", "selinuxfs", "squashfs", "overlay", "ramfs", "nfsd",
+    ]
+    FILESYSTEM_IGNORE_PATHS = ["/proc", "/sys", "/dev", "/run/user", "/var/lib/kubelet/pods", "/snap"]
+    FILESYSTEM_STATVFS_TIMEOUT = 2  # Giây; mount không trả lời (NFS chết) bị bỏ qua tới khi hồi phục
+
+    # Thay đổi theo dõi bằng inotify: nhóm -> file/thư mục ("/" ở cuối = mọi file trong thư mục, tên file
+    # có thể là mẫu glob) và job chạy lại ngay; "documents": False khi bản ghi của job đã mang thay đổi,
+    # không cần gửi lại tài liệu. Thay đổi chỉ có ở runtime (lệnh iptables, unit đổi trạng thái không qua
+    # systemd) vẫn do lịch định kỳ bên dưới bắt. {} để tắt.
+    WATCHES = {
+        "users": {
+            "paths": ["/etc/passwd", "/etc/group", "/etc/shadow", "/etc/sudoers", "/etc/sudoers.d/"],
+            "job": "users",
+        },
+        "firewall": {
+            "paths": ["/etc/iptables/", "/etc/sysconfig/iptables", "/etc/sysconfig/ip6tables",
+                      "/etc/nftables.conf", "/etc/sysconfig/nftables.conf", "/etc/ufw/", "/etc/firewalld/",
+                      "/etc/firewalld/zones/"],
+            "job": "firewall",
+        },
+        "services": {
+            # systemd tạo/xóa /run/systemd/units/invocation:<unit> mỗi lần unit start/stop, kể cả scope của
+            # session SSH, cron, container: chỉ lấy .service
+            "paths": ["/run/systemd/units/invocation:*.service", "/etc/systemd/system/*.service",
+                      "/etc/systemd/system/multi-user.target.wants/*.service"],
+            "job": "services",
+            "documents": False,  # Bản ghi "services" trong spool đã có các unit đổi trạng thái
+        },
+    }
+    WATCH_DEBOUNCE = 2  # Giây gom các sự kiện của một thao tác (useradd ghi passwd, shadow, group...)
+    WATCH_PUSH_MIN_INTERVAL = 60  # Giây tối thiểu giữa hai lần gửi ngay/chạy lại job của cùng một nhóm
+
+    # Luật cảnh báo đánh giá tại agent trên mỗi mẫu time series (xem alerts.Rule); vi phạm thì gửi ngay,
+    # mỗi luật chỉ gửi lúc bắt đầu/kết thúc và nhắc lại sau ALERT_REPEAT_INTERVAL giây nếu vẫn vi phạm
+    ALERT_RULES = [
+        {"name": "cpu_saturated", "metric": "cpu.percent", "above": 95, "smooth": 0.1, "for": 120},
+        {"name": "memory_exhausted", "metric": "memory.percent", "above": 95, "for": 60, "severity": "critical"},
+        {"name": "iowait_anomaly", "metric": "cpu.iowait", "type": "anomaly", "sigma": 6, "min_value": 30,
+         "min_samples": 300, "for": 10, "adapt_after": 600},
+        # Luật fs.* và disk.* đánh giá riêng từng mount/thiết bị (filesystems.alert_series), alert có nhãn mount/device
+        {"name": "filesystem_full", "metric": "fs.used_percent", "above": 90, "severity": "critical"},
+        {"name": "inodes_full", "metric": "fs.inodes_percent", "above": 90, "severity": "critical"},
+        # % dung lượng mỗi phút: đầy 10% trong 20 phút
+        {"name": "filesystem_filling", "metric": "fs.used_percent", "type": "rate", "above": 0.5, "window": 1200},
+        {"name": "disk_saturated", "metric": "disk.util_percent", "above": 90, "for": 300},
+    ]
+    ALERT_REPEAT_INTERVAL = 3600
+
+    # Collector là plugin (package collectors/ và các file .py trong COLLECTOR_PLUGIN_DIRS). Cấu hình riêng
+    # của host (JSON, ngoài thư mục cài đặt): {"max_cost": "light|medium|heavy",
+    # "collectors": {"<tên>": {"enabled": false, "interval": ...}}}
+    HOST_CONFIG_PATH = "/etc/server_agent/host.json"
+    COLLECTOR_PLUGIN_DIRS = ["/etc/server_agent/collectors.d"]
+
+    # Lịch chạy riêng cho từng collector (giây): interval, jitter ngẫu nhiên, timeout, enabled
+    COLLECTORS = {
+        "resource_usage": {"interval": 10, "jitter": 1, "timeout": 30},
+        "filesystems": {"interval": 30, "jitter": 3, "timeout": 60},
+        "services": {"interval": 60, "jitter": 5, "timeout": 60},
+        "processes": {"interval": 15, "jitter": 1, "timeout": 30},
+        "firewall": {"interval": 3600, "jitter": 300, "timeout": 300},
+        "system_info": {"interval": 86400, "jitter": 1800, "timeout": 600},
+        "hardware": {"interval": 86400, "jitter": 1800, "timeout": 600},
+        "net_connections": {"jitter": 60, "timeout": 300},
+        "users": {"interval": 86400, "jitter": 1800, "timeout": 60},  # Chủ yếu chạy theo WATCHES
+    }
@@ -0,0 +1,55 @@
+# cpu_sampler.py
+
+import threading
+
+import psutil
+
+# Các mode được báo cáo; guest/guest_nice đã nằm trong user/nice nên không cộng vào tổng
+MODES = ("user", "nice", "system", "idle", "iowait", "irq", "softirq", "steal")
+
+
+class CpuSampler:
+    """Tính % CPU từ chênh lệch cpu_times giữa hai lần gọi, không chặn thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last = self._snapshot()
+
+    def _snapshot(self):
+        return [t._asdict() for t in psutil.cpu_times(percpu=True)]
+
+    @staticmethod
+    def _total(times):
+        return sum(times.values()) - times.get("guest", 0.0) - times.get("guest_nice", 0.0)
+
+    def _usage(self, prev, curr):
+        """% theo từng mode và % bận (không tính idle/iowait) giữa hai snapshot"""
+        elapsed = self._total(curr) - self._total(prev)
+        modes = {}
+        for mode in MODES:
+            if mode in curr:
+                delta = max(0.0, curr[mode] - prev.get(mode, 0.0))
+                modes[mode] = round(delta / elapsed * 100, 2) if elapsed > 0 else 0.0
+        idle = modes.get("idle", 0.0) + modes.get("iowait", 0.0)
+        percent = round(max(0.0, 100.0 - idle), 2) if elapsed > 0 else 0.0
+        return {"percent": percent, "modes": modes}
+
+    def sample(self):
+        """Trả về mức sử dụng kể từ lần gọi trước: tổng hợp và theo từng core"""
+        curr = self._snapshot()
+        with self._lock:
+            prev, self._last = self._last, curr
+        # Số core có thể thay đổi (CPU hotplug), khi đó coi như chưa có mốc trước
+        if len(prev) != len(curr):
+            prev = [dict.fromkeys(c, 0.0) for c in curr]
+
+        total_prev, total_curr = {}, {}
+        for p, c in zip(prev, curr):
+            for key, value in p.items():
+                total_prev[key] = total_prev.get(key, 0.0) + value
+            for key, value in c.items():
+                total_curr[key] = total_curr.get(key, 0.0) + value
+
+        usage = self._usage(total_prev, total_curr)
+        usage["per_cpu"] = [self._usage(p, c) for p, c in zip(prev, curr)]
+        return usage
@@ -0,0 +1,179 @@
+# delta.py
+
+import hashlib
+import json
+import logging
+import os
+import time
+
+PROTOCOL = "delta/1"
+
+
+def canonical_json(value):
+    """JSON ổn định của một giá trị (sắp xếp key, không khoảng trắng), đầu vào của content_hash"""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _sha1(encoded):
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+def content_hash(value):
+    """Hash ổn định của một giá trị JSON (sắp xếp key, không khoảng trắng)"""
+    return _sha1(canonical_json(value))
+
+
+def document_hashes(document):
+    """(hash tài liệu, {section: hash}), mỗi section chỉ mã hóa JSON một lần
+
+    JSON của tài liệu dict được ghép từ JSON của từng section theo thứ tự key nên hash
+    tài liệu giống hệt content_hash(document).
+    """
+    if not isinstance(document, dict):
+        doc_hash = content_hash(document)
+        return doc_hash, {"": doc_hash}
+    encoded = {key: canonical_json(value) for key, value in document.items()}
+    whole = "{" + ",".join(f"{json.dumps(key)}:{encoded[key]}" for key in sorted(encoded)) + "}"
+    return _sha1(whole), {key: _sha1(value) for key, value in encoded.items()}
+
+
+def diff(old, new, path=None):
+    """So sánh cấu trúc hai giá trị JSON, trả về danh sách thao tác set/del/append"""
+    path = path or []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "del", "path": path + [key]})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "set", "path": path + [key], "value": value})
+            elif old[key] != value:
+                ops.extend(diff(old[key], value, path + [key]))
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        if len(new) == len(old):
+            ops = []
+            for i, (a, b) in enumerate(zip(old, new)):
+                if a != b:
+                    ops.extend(diff(a, b, path + [i]))
+            return ops
+        # Danh sách chỉ dài thêm (vd. lịch sử đăng nhập): gửi phần mới
+        if len(new) > len(old) and new[:len(old)] == old:
+            return [{"op": "append", "path": path, "values": new[len(old):]}]
+    return [{"op": "set", "path": path, "value": new}]
+
+
+def apply_diff(value, ops):
+    """Áp dụng các thao tác của diff() lên một bản sao đã giải mã từ JSON"""
+    for op in ops:
+        if not op["path"]:
+            if op["op"] == "append":
+                value = value + op["values"]
+            else:
+                value = op.get("value")
+            continue
+        target = value
+        for key in op["path"][:-1]:
+            target = target[key]
+        last = op["path"][-1]
+        if op["op"] == "set":
+            target[last] = op["value"]
+        elif op["op"] == "del":
+            del target[last]
+        elif op["op"] == "append":
+            target[last] = target[last] + op["values"]
+    return value
+
+
+class DeltaEncoder:
+    """Mã hóa tài liệu upload dưới dạng delta so với phiên bản server đã xác nhận"""
+
+    def __init__(self, state_file, full_resync_interval):
+        self.state_file = state_file
+        self.full_resync_interval = full_resync_interval
+        self.acked = {}
+        self.last_full = 0
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.state_file, "r") as f:
+                state = json.load(f)
+            self.acked = state.get("acked", {})
+            self.last_full = state.get("last_full", 0)
+        except FileNotFoundError:
+            pass
+        except (ValueError, OSError) as e:
+            logging.warning(f"Delta state {self.state_file} unreadable, forcing full resync: {str(e)}")
+            self.force_resync()
+
+    def save(self):
+        tmp_file = f"{self.state_file}.tmp"
+        # json.dumps dùng bộ mã hóa C; json.dump ghi từng mảnh nhỏ và chậm hơn nhiều với tài liệu lớn
+        data = json.dumps({"acked": self.acked, "last_full": self.last_full}, separators=(",", ":"))
+        with open(tmp_file, "w") as f:
+            f.write(data)
+        os.replace(tmp_file, self.state_file)
+
+    def force_resync(self):
+        """Lần encode tiếp theo sẽ gửi đầy đủ mọi tài liệu"""
+        self.acked = {}
+        self.last_full = 0
+
+    def encode(self, documents):
+        """Trả về (payload, pending); gọi ack(pending) khi server xác nhận đã nhận"""
+        now = time.time()
+        full = now - self.last_full >= self.full_resync_interval
+        payload = {"protocol": PROTOCOL, "full": full, "documents": {}}
+        pending = {"full": full, "time": now, "acked": {}}
+
+        for name, document in documents.items():
+            doc_hash, hashes = document_hashes(document)
+            sections = document if isinstance(document, dict) else {"": document}
+            # Hash từng section được lưu cùng mốc để lần sau không phải hash lại phiên bản cũ
+            pending["acked"][name] = {"hash": doc_hash, "sections": sections, "hashes": hashes}
+            base = self.acked.get(name)
+
+            if full or base is None:
+                payload["documents"][name] = {"mode": "full", "hash": doc_hash, "data": document}
+                continue
+            if base["hash"] == doc_hash:
+                payload["documents"][name] = {"mode": "unchanged", "hash": doc_hash}
+                continue
+
+            base_hashes = base.get("hashes", {})
+            encoded = {}
+            for key, value in sections.items():
+                section_hash = hashes[key]
+                if key not in base["sections"]:
+                    encoded[key] = {"hash": section_hash, "value": value}
+                elif (base_hashes.get(key) or content_hash(base["sections"][key])) == section_hash:
+                    encoded[key] = {"hash": section_hash}
+                else:
+                    encoded[key] = {"hash": section_hash, "diff": diff(base["sections"][key], value)}
+            removed = [key for key in base["sections"] if key not in sections]
+            payload["documents"][name] = {
+                "mode": "delta",
+                "base": base["hash"],
+                "hash": doc_hash,
+                "sections": encoded,
+                "removed": removed
+            }
+        return payload, pending
+
+    def ack(self, pending):
+        """Ghi nhận phiên bản vừa gửi thành công làm mốc cho các delta sau"""
+        changed = pending["full"] or any(
+            name not in self.acked or self.acked[name]["hash"] != entry["hash"] for name, entry in pending["acked"].items()
+        )
+        self.acked.update(pending["acked"])
+        if pending["full"]:
+            self.last_full = pending["time"]
+        if not changed:
+            # Không tài liệu nào đổi: state trên đĩa vẫn đúng, khỏi ghi lại vài MB JSON
+            return
+        try:
+            self.save()
+        except OSError as e:
+            logging.error(f"Failed to save delta state to {self.state_file}: {str(e)}")
@@ -0,0 +1,136 @@
+# encoding.py
+
+import gzip
+import json
+import logging
+
+from lazy import lazy_import
+
+# Phiên bản schema dữ liệu: 2 = bộ đếm dạng số nguyên (byte), namedtuple của psutil thành dict
+# 3 = firewall theo bảng/chain (iptables-save, nft -j) có hash, counter gửi riêng dạng chênh lệch
+# 4 = bản ghi "filesystems" (mọi mount + IO theo thiết bị), bỏ disk.partitions khỏi resource_usage
+# 5 = hardware_info là tài liệu riêng (không còn trong system_info), net_connections là bản ghi riêng
+SCHEMA_VERSION = 5
+
+# Các định dạng nhị phân là tùy chọn (None nếu chưa cài), luôn có JSON; chỉ nạp khi mã hóa lần đầu
+msgpack = lazy_import("msgpack", optional=True)
+cbor2 = lazy_import("cbor2", optional=True)
+zstandard = lazy_import("zstandard", optional=True)
+
+
+def _json_default(value):
+    if hasattr(value, "_asdict"):
+        return value._asdict()
+    return str(value)
+
+
+def encode_json(payload):
+    return json.dumps(payload, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+def encode_msgpack(payload):
+    return msgpack.packb(payload, use_bin_type=True, default=_json_default)
+
+
+def encode_cbor(payload):
+    return cbor2.dumps(payload, default=lambda encoder, value: encoder.encode(_json_default(value)))
+
+
+ENCODINGS = {
+    "json": ("application/json", encode_json),
+    "msgpack": ("application/msgpack", encode_msgpack),
+    "cbor": ("application/cbor", encode_cbor),
+}
+
+
+def available_encodings():
+    """Các định dạng dùng được trên máy này (thư viện tương ứng đã cài)"""
+    return [name for name, module in (("msgpack", msgpack), ("cbor", cbor2), ("json", json)) if module]
+
+
+def available_compressions():
+    return (["zstd"] if zstandard else []) + ["gzip", "identity"]
+
+
+class Compressor:
+    """Nén body theo gzip/zstd; zstd có thể dùng dictionary huấn luyện sẵn"""
+
+    def __init__(self, zstd_dict_path=None, zstd_level=3):
+        self.zstd_dict_path = zstd_dict_path
+        self.zstd_level = zstd_level
+        self.zstd_dict = None
+        self.zstd_dict_id = None
+        self._zstd = None
+
+    def _zstd_compressor(self):
+        """ZstdCompressor (và dictionary) tạo ở lần nén zstd đầu tiên"""
+        if self._zstd is None and zstandard is not None:
+            if self.zstd_dict_path:
+                try:
+                    with open(self.zstd_dict_path, "rb") as f:
+                        self.zstd_dict = zstandard.ZstdCompressionDict(f.read())
+                    self.zstd_dict_id = self.zstd_dict.dict_id()
+                except OSError as e:
+                    logging.error(f"Failed to load zstd dictionary {self.zstd_dict_path}: {str(e)}")
+                    self.zstd_dict_path = None
+            self._zstd = zstandard.ZstdCompressor(level=self.zstd_level, dict_data=self.zstd_dict)
+        return self._zstd
+
+    def compress(self, body, method):
+        """Trả về (bytes, headers) cho phương thức nén đã chọn"""
+        if method == "zstd" and self._zstd_compressor() is not None:
+            headers = {"Content-Encoding": "zstd"}
+            if self.zstd_dict_id:
+                headers["X-Zstd-Dict-Id"] = str(self.zstd_dict_id)
+            return self._zstd.compress(body), headers
+        if method == "identity":
+            return body, {}
+        return gzip.compress(body, compresslevel=6), {"Content-Encoding": "gzip"}
+
+
+class Negotiator:
+    """Chọn định dạng/nén theo thứ tự ưu tiên của agent và danh sách server chấp nhận
+
+    Agent quảng bá khả năng qua header X-Agent-Accept-*; server trả về X-Ingest-Accept-*.
+    Chưa biết server hỗ trợ gì thì dùng JSON + gzip (mọi server đều đọc được).
+    """
+
+    DEFAULT = ("json", "gzip")
+
+    def __init__(self, preferred_encodings, preferred_compressions, compressor):
+        self.encodings = [e for e in preferred_encodings if e in available_encodings()] or ["json"]
+        self.compressions = [c for c in preferred_compressions if c in available_compressions()] or ["gzip"]
+        self.compressor = compressor
+        self.current = self.DEFAULT
+
+    def reset(self):
+        self.current = self.DEFAULT
+
+    def update(self, response_headers):
+        """Cập nhật lựa chọn từ header phản hồi của server"""
+        server_encodings = self._parse(response_headers.get("X-Ingest-Accept-Encoding"))
+        server_compressions = self._parse(response_headers.get("X-Ingest-Accept-Compression"))
+        if not server_encodings and not server_compressions:
+            return
+        encoding = next((e for e in self.encodings if e in server_encodings), "json")
+        compression = next((c for c in self.compressions if c in server_compressions), "gzip")
+        if (encoding, compression) != self.current:
+            logging.info(f"Upload encoding negotiated: {encoding}+{compression}")
+            self.current = (encoding, compression)
+
+    @staticmethod
+    def _parse(value):
+        return [v.strip().lower() for v in value.split(",")] if value else []
+
+    def encode(self, payload):
+        """Mã hóa và nén payload, trả về (body, headers)"""
+        encoding, compression = self.current
+        content_type, encoder = ENCODINGS[encoding]
+        body, headers = self.compressor.compress(encoder(payload), compression)
+        headers.update({
+            "Content-Type": content_type,
+            "X-Schema-Version": str(SCHEMA_VERSION),
+            "X-Agent-Accept-Encoding": ", ".join(self.encodings),
+            "X-Agent-Accept-Compression": ", ".join(self.compressions),
+        })
+        return body, headers
@@ -0,0 +1,112 @@
+# executor.py
+
+import logging
+import os
+import signal
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from config import Config
+from instrumentation import metrics
+
+
+class CommandResult:
+    """Kết quả chạy một lệnh: mã thoát, stdout/stderr và trạng thái timeout"""
+
+    def __init__(self, cmd, returncode=None, output="", stderr="", timed_out=False, error=None):
+        self.cmd = cmd
+        self.returncode = returncode
+        self.output = output
+        self.stderr = stderr
+        self.timed_out = timed_out
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.timed_out and self.error is None
+
+    def describe(self):
+        if self.error:
+            return self.error
+        if self.timed_out:
+            return "timed out"
+        return (self.stderr or self.output).strip() or f"exit code {self.returncode}"
+
+
+def _record(result, started):
+    """Thời gian chạy và kết quả của lệnh theo tên chương trình"""
+    command = os.path.basename(result.cmd[0])
+    if result.ok:
+        outcome = "success"
+    elif result.timed_out:
+        outcome = "timeout"
+    else:
+        # Không chạy được (chưa cài, thiếu quyền) khác với lệnh chạy nhưng lỗi
+        outcome = "unavailable" if result.error else "error"
+    metrics.observe("agent_command_duration_seconds", time.monotonic() - started, command=command)
+    metrics.inc("agent_command_runs_total", command=command, outcome=outcome)
+    return result
+
+
+def run_command(cmd, timeout=None):
+    """Chạy lệnh với timeout; quá hạn thì kill cả process group và trả về phần đã đọc được"""
+    timeout = timeout or Config.COMMAND_TIMEOUT
+    started = time.monotonic()
+    try:
+        proc = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True, start_new_session=True
+        )
+    except (FileNotFoundError, PermissionError) as e:
+        return _record(CommandResult(cmd, error=str(e)), started)
+
+    try:
+        output, stderr = proc.communicate(timeout=timeout)
+        return _record(CommandResult(cmd, proc.returncode, output, stderr), started)
+    except subprocess.TimeoutExpired:
+        # Lệnh treo (vd. firewall-cmd chờ D-Bus): kill cả các process con
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        output, stderr = proc.communicate()
+        logging.error(f"Command {' '.join(cmd)} timed out after {timeout}s, killed")
+        return _record(CommandResult(cmd, proc.returncode, output or "", stderr or "", timed_out=True), started)
+
+
+def _timed_probe(name, func):
+    started = time.monotonic()
+    try:
+        return func()
+    finally:
+        metrics.observe("agent_probe_duration_seconds", time.monotonic() - started, probe=name)
+
+
+def run_parallel(tasks, timeout=None, max_workers=None):
+    """Chạy song song các hàm trong dict {tên: hàm}; trả về {tên: kết quả}
+
+    Task lỗi hoặc chưa xong khi hết timeout sẽ có kết quả None (kết quả từng phần).
+    """
+    timeout = timeout or Config.PROBE_TIMEOUT
+    executor = ThreadPoolExecutor(max_workers=max_workers or Config.PROBE_MAX_WORKERS)
+    futures = {executor.submit(_timed_probe, name, func): name for name, func in tasks.items()}
+    done, not_done = wait(futures, timeout=timeout)
+    # Không chờ task treo; run_command tự kill lệnh con khi hết timeout của nó
+    executor.shutdown(wait=False)
+
+    results = {}
+    for future, name in futures.items():
+        if future in not_done:
+            future.cancel()
+            logging.error(f"Probe {name} did not finish within {timeout}s, skipping")
+            metrics.inc("agent_probe_runs_total", probe=name, outcome="timeout")
+            results[name] = None
+        elif future.exception() is not None:
+            logging.error(f"Probe {name} failed: {str(future.exception())}")
+            metrics.inc("agent_probe_runs_total", probe=name, outcome="error")
+            results[name] = None
+        else:
+            metrics.inc("agent_probe_runs_total", probe=name, outcome="success")
+            results[name] = future.result()
+    return results
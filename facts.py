@@ -0,0 +1,114 @@
+# facts.py
+
+import json
+import logging
+import os
+
+DMI_SYSFS = "/sys/class/dmi/id"
+BOOT_ID = "/proc/sys/kernel/random/boot_id"
+# Các trường DMI rẻ đọc từ sysfs, dùng để nhận biết phần cứng có đổi hay không
+SYSFS_FIELDS = (
+    "bios_vendor", "bios_version", "bios_date", "sys_vendor", "product_name",
+    "product_version", "product_serial", "product_uuid", "board_vendor",
+    "board_name", "board_serial", "chassis_vendor", "chassis_type",
+)
+
+
+def _read(path):
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def read_sysfs_dmi():
+    """Đọc các trường DMI trong /sys/class/dmi/id (serial/uuid cần quyền root)"""
+    values = {}
+    for field in SYSFS_FIELDS:
+        value = _read(os.path.join(DMI_SYSFS, field))
+        if value is not None:
+            values[field] = value
+    return values
+
+
+def cache_key():
+    """Khóa của cache: boot_id, mtime các file DMI trong sysfs và phiên bản kernel"""
+    mtimes = {}
+    try:
+        for name in sorted(os.listdir(DMI_SYSFS)):
+            try:
+                mtimes[name] = os.stat(os.path.join(DMI_SYSFS, name)).st_mtime
+            except OSError:
+                pass
+    except OSError:
+        pass
+    return {"boot_id": _read(BOOT_ID), "dmi_mtimes": mtimes, "kernel": os.uname().release}
+
+
+def detect_container():
+    """Loại container agent đang chạy trong (docker, podman, kubernetes, lxc...) hoặc None nếu là host"""
+    if os.path.exists("/.dockerenv"):
+        return "docker"
+    if os.path.exists("/run/.containerenv"):
+        return "podman"
+    # systemd-nspawn, lxc, podman đặt biến `container` cho PID 1 (đọc được khi chạy root)
+    try:
+        with open("/proc/1/environ", "rb") as f:
+            for item in f.read().split(b"\0"):
+                if item.startswith(b"container="):
+                    return item[len(b"container="):].decode("utf-8", "replace") or "container"
+    except OSError:
+        pass
+    cgroup = _read("/proc/1/cgroup") or ""
+    for marker, name in (("kubepods", "kubernetes"), ("docker", "docker"), ("lxc", "lxc"), ("containerd", "containerd")):
+        if marker in cgroup:
+            return name
+    return None
+
+
+class FactCache:
+    """Cache thông tin phần cứng tĩnh, chỉ probe lại khi khóa thay đổi"""
+
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self.cache = self.load()
+
+    def load(self):
+        try:
+            with open(self.cache_file, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (ValueError, OSError) as e:
+            logging.warning(f"Fact cache {self.cache_file} unreadable, re-probing: {str(e)}")
+            return {}
+
+    def save(self):
+        tmp_file = f"{self.cache_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(self.cache, f)
+        os.replace(tmp_file, self.cache_file)
+
+    def get(self, probe):
+        """Trả về thông tin phần cứng; `probe()` (dmidecode) chỉ chạy khi thật sự cần"""
+        key = cache_key()
+        if self.cache.get("key") == key and "hardware_info" in self.cache:
+            return self.cache["hardware_info"]
+
+        # Khóa đổi (reboot, nâng kernel...): so sánh các trường sysfs rẻ trước khi chạy dmidecode
+        sysfs = read_sysfs_dmi()
+        if sysfs and sysfs == self.cache.get("sysfs") and "hardware_info" in self.cache:
+            logging.info("Hardware unchanged since last probe, reusing cached dmidecode data")
+            hardware_info = self.cache["hardware_info"]
+        else:
+            hardware_info = probe()
+            if hardware_info is None:
+                return self.cache.get("hardware_info", {})
+
+        self.cache = {"key": key, "sysfs": sysfs, "hardware_info": hardware_info}
+        try:
+            self.save()
+        except OSError as e:
+            logging.error(f"Failed to save fact cache to {self.cache_file}: {str(e)}")
+        return hardware_info
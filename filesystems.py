@@ -0,0 +1,293 @@
+# filesystems.py
+
+import logging
+import os
+import re
+import select
+import threading
+import time
+
+from procfs import ProcFile, SECTOR_SIZE
+from instrumentation import metrics
+
+# Filesystem qua mạng: statvfs có thể treo khi server chết
+REMOTE_FILESYSTEMS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "ceph", "glusterfs", "9p", "lustre", "gpfs", "afs"}
+ESCAPE_RE = re.compile(r"\\([0-7]{3})")
+
+
+def _unescape(value):
+    """mountinfo mã hóa khoảng trắng, tab, xuống dòng và "\\" dạng bát phân (\\040...)"""
+    return ESCAPE_RE.sub(lambda m: chr(int(m.group(1), 8)), value) if "\\" in value else value
+
+
+def parse_mountinfo(output):
+    """Phân tích /proc/self/mountinfo thành danh sách mount (giữ thứ tự mount)"""
+    mounts = []
+    for line in output.splitlines():
+        # 36 35 98:0 /mnt1 /mnt2 rw,noatime master:1 - ext3 /dev/root rw,errors=continue
+        left, sep, right = line.partition(" - ")
+        fields = left.split()
+        extra = right.split()
+        if not sep or len(fields) < 6 or len(extra) < 2:
+            continue
+        mounts.append({
+            "mount_point": _unescape(fields[4]),
+            "root": _unescape(fields[3]),
+            "major_minor": fields[2],
+            "fstype": extra[0],
+            "source": _unescape(extra[1]),
+            "readonly": "ro" in fields[5].split(","),
+        })
+    return mounts
+
+
+def is_remote(fstype):
+    return fstype in REMOTE_FILESYSTEMS or fstype.startswith("fuse.")
+
+
+def select_mounts(mounts, ignore_types=(), ignore_paths=()):
+    """Các mount chứa dữ liệu thật: bỏ filesystem ảo và đường dẫn bị loại, mỗi thiết bị giữ một mount
+
+    Bind mount (cùng major:minor) cho cùng số liệu statvfs nên chỉ giữ mount của gốc filesystem,
+    hoặc mount point ngắn nhất nếu gốc không được mount.
+    """
+    ignore_types = set(ignore_types)
+    selected = {}
+    for mount in mounts:
+        path = mount["mount_point"]
+        if mount["fstype"] in ignore_types:
+            continue
+        if any(path == prefix or path.startswith(prefix.rstrip("/") + "/") for prefix in ignore_paths):
+            continue
+        # NFS/CIFS dùng chung major 0 nhưng mỗi export là một filesystem riêng
+        key = (mount["major_minor"], mount["source"]) if is_remote(mount["fstype"]) else mount["major_minor"]
+        current = selected.get(key)
+        if current is None or (mount["root"] == "/", -len(path)) > (current["root"] == "/", -len(current["mount_point"])):
+            selected[key] = mount
+    return sorted(selected.values(), key=lambda m: m["mount_point"])
+
+
+def series_sample(result):
+    """Chỉ số gộp của một lần collect (mount đầy nhất, thiết bị bận nhất) cho time series"""
+    def highest(items, key):
+        values = [item[key] for item in items if item.get(key) is not None]
+        return max(values) if values else None
+
+    devices = list(result["devices"].values())
+    awaits = [value for d in devices for value in (d.get("read_await_ms"), d.get("write_await_ms")) if value is not None]
+    return {
+        "fs.used_percent.max": highest(result["filesystems"], "percent"),
+        "fs.inodes_percent.max": highest(result["filesystems"], "inodes_percent"),
+        "disk.util_percent.max": highest(devices, "util_percent"),
+        "disk.await_ms.max": max(awaits) if awaits else None,
+    }
+
+
+# Metric theo từng mount/thiết bị do alert_series tạo ra
+ALERT_METRICS = ("fs.used_percent", "fs.inodes_percent", "disk.util_percent", "disk.await_ms")
+
+
+def alert_series(result):
+    """Chỉ số theo từng mount và từng thiết bị cho luật cảnh báo: [(nhãn, mẫu)]
+
+    Mount không đọc được (statvfs treo/lỗi) vẫn có mặt với mẫu rỗng để trạng thái alert của nó được giữ.
+    """
+    series = []
+    for fs in result["filesystems"]:
+        series.append(({"mount": fs["mount_point"], "device": fs.get("device")}, {
+            "fs.used_percent": fs.get("percent"),
+            "fs.inodes_percent": fs.get("inodes_percent"),
+        }))
+    for name, device in result["devices"].items():
+        awaits = [value for value in (device.get("read_await_ms"), device.get("write_await_ms")) if value is not None]
+        series.append(({"device": name}, {
+            "disk.util_percent": device.get("util_percent"),
+            "disk.await_ms": max(awaits) if awaits else None,
+        }))
+    return series
+
+
+class MountTable:
+    """Danh sách mount được cache, chỉ đọc lại khi kernel báo mountinfo thay đổi (POLLPRI)"""
+
+    def __init__(self, path="/proc/self/mountinfo", ignore_types=(), ignore_paths=()):
+        # Node Kubernetes có hàng nghìn mount (~90 byte/dòng): buffer đầu 256 KB, lớn hơn thì ProcFile tự nới
+        self.file = ProcFile(path, size=256 * 1024)
+        self.ignore_types = ignore_types
+        self.ignore_paths = ignore_paths
+        self.mounts = None
+        self._poll = None
+        self._fd = None
+
+    def _watch(self):
+        """Đăng ký poll trên handle đang mở của mountinfo (mở lại sau lỗi thì đăng ký lại)"""
+        handle = self.file.handle
+        if handle is None or not hasattr(select, "poll"):
+            self._poll = self._fd = None
+            return
+        if handle.fileno() != self._fd:
+            self._poll = select.poll()
+            self._poll.register(handle, select.POLLPRI | select.POLLERR)
+            self._fd = handle.fileno()
+            self._poll.poll(0)  # Bỏ sự kiện đang chờ từ trước lần đọc này
+
+    def changed(self):
+        if self.mounts is None or self._poll is None:
+            return True
+        return bool(self._poll.poll(0))
+
+    def get(self):
+        """Trả về (mount đã lọc, có đọc lại hay không)"""
+        if not self.changed():
+            return self.mounts, False
+        data = self.file.read().decode("utf-8", "replace")
+        self._watch()
+        mounts = select_mounts(parse_mountinfo(data), self.ignore_types, self.ignore_paths)
+        if self.mounts is not None and mounts != self.mounts:
+            logging.info(f"Mount table changed: {len(mounts)} filesystems")
+        self.mounts = mounts
+        return mounts, True
+
+
+class DiskStats:
+    """IOPS, throughput, độ trễ và % bận theo từng thiết bị từ chênh lệch /proc/diskstats"""
+
+    def __init__(self, path="/proc/diskstats"):
+        # Mỗi thiết bị (cả dm-/loop của container) một dòng ~150 byte
+        self.file = ProcFile(path, size=256 * 1024)
+        self.last = None  # (thời điểm, {tên: bộ đếm})
+        self.names = {}  # "major:minor" -> tên thiết bị
+
+    def sample(self, devices):
+        """Số liệu của các thiết bị trong `devices` (tên); lần đầu chỉ có số IO đang chờ"""
+        now = time.monotonic()
+        counters = {}
+        names = {}
+        for line in self.file.read().decode("ascii", "replace").splitlines():
+            fields = line.split()
+            if len(fields) < 14:
+                continue
+            names[f"{fields[0]}:{fields[1]}"] = fields[2]
+            if fields[2] in devices:
+                # (reads, sector đọc, ms đọc, writes, sector ghi, ms ghi, ms bận, ms có trọng số), IO đang chờ
+                counters[fields[2]] = ([int(fields[i]) for i in (3, 5, 6, 7, 9, 10, 12, 13)], int(fields[11]))
+        self.names = names
+        result = {}
+        last_time, last = self.last or (None, {})
+        elapsed = now - last_time if last_time else 0
+        for name, (values, in_flight) in counters.items():
+            entry = {"in_flight": in_flight}
+            previous = last.get(name)
+            if previous is not None and elapsed > 0:
+                reads, read_sectors, read_ms, writes, write_sectors, write_ms, busy_ms, weighted_ms = (
+                    a - b for a, b in zip(values, previous[0]))
+                # Bộ đếm 32 bit bị tràn hoặc thiết bị được tạo lại: bỏ qua mẫu này
+                if min(reads, read_sectors, read_ms, writes, write_sectors, write_ms, busy_ms, weighted_ms) >= 0:
+                    entry.update({
+                        "reads_per_sec": round(reads / elapsed, 1),
+                        "writes_per_sec": round(writes / elapsed, 1),
+                        "read_bytes_per_sec": int(read_sectors * SECTOR_SIZE / elapsed),
+                        "write_bytes_per_sec": int(write_sectors * SECTOR_SIZE / elapsed),
+                        "read_await_ms": round(read_ms / reads, 2) if reads else None,
+                        "write_await_ms": round(write_ms / writes, 2) if writes else None,
+                        "util_percent": round(min(100.0, busy_ms / (elapsed * 1000) * 100), 1),
+                        "queue_depth": round(weighted_ms / (elapsed * 1000), 2),
+                    })
+            result[name] = entry
+        self.last = (now, counters)
+        return result
+
+
+class FilesystemCollector:
+    """Dung lượng/inode của mọi mount thật (statvfs có timeout) và IO theo thiết bị"""
+
+    def __init__(self, ignore_types=(), ignore_paths=(), statvfs_timeout=2.0,
+                 mountinfo="/proc/self/mountinfo", diskstats="/proc/diskstats", sys_block="/sys/block"):
+        self.mount_table = MountTable(mountinfo, ignore_types, ignore_paths)
+        self.disk_stats = DiskStats(diskstats)
+        self.statvfs_timeout = statvfs_timeout
+        self.sys_block = sys_block
+        self.disks = set()
+        self._hung = {}  # mount point -> thread statvfs chưa trả về
+
+    def _whole_disks(self):
+        try:
+            return {d for d in os.listdir(self.sys_block) if not d.startswith(("loop", "ram", "zram"))}
+        except OSError:
+            return set()
+
+    @staticmethod
+    def _statvfs(path, results):
+        try:
+            results[path] = os.statvfs(path)
+        except OSError as e:
+            results[path] = e
+
+    def statvfs_all(self, paths):
+        """statvfs song song, mỗi mount một thread; mount không trả lời trong timeout được đánh dấu treo
+
+        Thread treo (NFS chết) không bị kill được: mount đó bị bỏ qua cho tới khi lời gọi cũ trả về.
+        """
+        results = {}
+        threads = []
+        for path in paths:
+            hung = self._hung.get(path)
+            if hung is not None:
+                if hung.is_alive():
+                    continue
+                del self._hung[path]
+                logging.info(f"statvfs of {path} responding again")
+            thread = threading.Thread(target=self._statvfs, args=(path, results), name="statvfs")
+            thread.daemon = True
+            thread.start()
+            threads.append((path, thread))
+        deadline = time.monotonic() + self.statvfs_timeout
+        for path, thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+            if thread.is_alive():
+                self._hung[path] = thread
+                metrics.inc("agent_statvfs_timeouts_total")
+                logging.warning(f"statvfs of {path} timed out after {self.statvfs_timeout}s, skipping until it returns")
+        return dict(results)
+
+    def collect(self):
+        mounts, refreshed = self.mount_table.get()
+        if refreshed:
+            self.disks = self._whole_disks()
+        stats = self.statvfs_all([m["mount_point"] for m in mounts])
+        # Thiết bị của các mount (phân vùng, dm, md) cùng với các ổ đĩa nguyên
+        devices = set(self.disks)
+        devices.update(self.disk_stats.names[m["major_minor"]] for m in mounts
+                       if m["major_minor"] in self.disk_stats.names)
+        io = self.disk_stats.sample(devices)
+
+        filesystems = []
+        for mount in mounts:
+            entry = {
+                "mount_point": mount["mount_point"],
+                "source": mount["source"],
+                "fstype": mount["fstype"],
+                "device": self.disk_stats.names.get(mount["major_minor"]),
+                "readonly": mount["readonly"],
+                "remote": is_remote(mount["fstype"]),
+            }
+            st = stats.get(mount["mount_point"])
+            if st is None:
+                entry["stale"] = True
+            elif isinstance(st, OSError):
+                entry["error"] = st.strerror
+            elif st.f_blocks:
+                # Như df: % dùng tính trên phần user thường được dùng (trừ vùng dành cho root)
+                used = (st.f_blocks - st.f_bfree) * st.f_frsize
+                available = st.f_bavail * st.f_frsize
+                entry.update({
+                    "total": st.f_blocks * st.f_frsize,
+                    "used": used,
+                    "available": available,
+                    "percent": round(used / (used + available) * 100, 1) if used + available else 0.0,
+                    "inodes_total": st.f_files,
+                    "inodes_used": st.f_files - st.f_ffree,
+                    "inodes_percent": round((st.f_files - st.f_ffree) / st.f_files * 100, 1) if st.f_files else None,
+                })
+            filesystems.append(entry)
+        return {"filesystems": filesystems, "devices": io}
@@ -0,0 +1,156 @@
+# firewall.py
+
+import hashlib
+import json
+import logging
+import time
+
+
+def _counters(text):
+    """"[packets:bytes]" -> [packets, bytes]"""
+    packets, _, nbytes = text.strip("[]").partition(":")
+    return [int(packets), int(nbytes)]
+
+
+def parse_iptables_save(output):
+    """Phân tích `iptables-save -c` (mọi bảng) thành {bảng: {chain: {policy, rules, counters}}}
+
+    Rule giữ nguyên dạng tham số của iptables (bỏ "-A <chain>"), counter tách riêng
+    để phần rule không đổi giữa các lần đọc.
+    """
+    tables = {}
+    table = None
+    for line in output.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("*"):
+            table = tables.setdefault(line[1:].strip(), {})
+        elif line == "COMMIT":
+            table = None
+        elif table is None:
+            continue
+        elif line.startswith(":"):
+            # :INPUT ACCEPT [12:720] ; chain tự tạo có policy "-"
+            parts = line[1:].split()
+            table[parts[0]] = {
+                "policy": parts[1] if len(parts) > 1 and parts[1] != "-" else None,
+                "rules": [],
+                "counters": [],
+                "policy_counters": _counters(parts[2]) if len(parts) > 2 else None,
+            }
+        else:
+            counters = None
+            if line.startswith("["):
+                end = line.find("]")
+                counters = _counters(line[:end + 1])
+                line = line[end + 1:].lstrip()
+            parts = line.split(None, 2)
+            if len(parts) < 2 or parts[0] != "-A":
+                continue
+            chain = table.setdefault(parts[1], {"policy": None, "rules": [], "counters": [], "policy_counters": None})
+            chain["rules"].append(parts[2] if len(parts) > 2 else "")
+            chain["counters"].append(counters)
+    return tables
+
+
+def parse_nft_json(output):
+    """Phân tích `nft -j list ruleset` thành {"<family> <bảng>": {chain: {policy, hook, rules, counters}}}"""
+    tables = {}
+    for item in json.loads(output).get("nftables", []):
+        if "chain" in item:
+            chain = item["chain"]
+            table = tables.setdefault(f"{chain['family']} {chain['table']}", {})
+            entry = table.setdefault(chain["name"], {"rules": [], "counters": []})
+            entry.update({key: chain[key] for key in ("type", "hook", "prio", "policy") if key in chain})
+        elif "rule" in item:
+            rule = item["rule"]
+            table = tables.setdefault(f"{rule['family']} {rule['table']}", {})
+            entry = table.setdefault(rule["chain"], {"rules": [], "counters": []})
+            expr = []
+            counters = None
+            for statement in rule.get("expr", []):
+                # Counter ẩn danh nằm ngay trong rule: tách ra, chỉ giữ phần định nghĩa rule
+                if isinstance(statement, dict) and isinstance(statement.get("counter"), dict):
+                    counters = [statement["counter"].get("packets", 0), statement["counter"].get("bytes", 0)]
+                    expr.append({"counter": None})
+                else:
+                    expr.append(statement)
+            spec = {"expr": expr}
+            if rule.get("comment"):
+                spec["comment"] = rule["comment"]
+            entry["rules"].append(spec)
+            entry["counters"].append(counters)
+    return tables
+
+
+def chain_hash(chain):
+    """Dấu vân tay của chain: policy, hook và các rule (không tính counter)"""
+    definition = {key: value for key, value in chain.items() if key not in ("counters", "policy_counters")}
+    encoded = json.dumps(definition, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def _delta(current, previous):
+    """Chênh lệch counter [packets, bytes]; counter bị reset (zero) thì lấy giá trị hiện tại"""
+    if current is None or previous is None:
+        return None
+    if current[0] < previous[0] or current[1] < previous[1]:
+        return current
+    return [current[0] - previous[0], current[1] - previous[1]]
+
+
+class FirewallCollector:
+    """Hash từng chain để bỏ qua rule set không đổi, tính counter theo chênh lệch giữa hai lần đọc"""
+
+    def __init__(self):
+        self.chains = {}  # "<nguồn>/<bảng>/<chain>" -> (hash, chain đã gửi, counters, policy_counters)
+        self.last_time = None
+        self._next = {}
+        self._deltas = {}
+
+    def fingerprint(self, source, tables):
+        """Bỏ counter khỏi các chain, gắn hash; chain không đổi dùng lại đúng đối tượng lần trước"""
+        result = {}
+        for table_name, chains in tables.items():
+            result[table_name] = {}
+            for chain_name, chain in chains.items():
+                key = f"{source}/{table_name}/{chain_name}"
+                counters = chain.pop("counters", [])
+                policy_counters = chain.pop("policy_counters", None)
+                digest = chain_hash(chain)
+                previous = self.chains.get(key)
+                if previous is not None and previous[0] == digest:
+                    document = previous[1]
+                    self._count(key, digest, counters, policy_counters, previous)
+                else:
+                    document = dict(chain, hash=digest)
+                self._next[key] = (digest, document, counters, policy_counters)
+                result[table_name][chain_name] = document
+        return result
+
+    def _count(self, key, digest, counters, policy_counters, previous):
+        rules = {}
+        for index, (current, last) in enumerate(zip(counters, previous[2])):
+            delta = _delta(current, last)
+            if delta and (delta[0] or delta[1]):
+                rules[str(index)] = delta
+        policy = _delta(policy_counters, previous[3])
+        if rules or (policy and (policy[0] or policy[1])):
+            self._deltas[key] = {"hash": digest, "rules": rules}
+            if policy and (policy[0] or policy[1]):
+                self._deltas[key]["policy"] = policy
+
+    def finish(self):
+        """Kết thúc một lượt: trả về counter delta của các chain không đổi kể từ lần trước"""
+        now = time.monotonic()
+        changed = sum(1 for key, state in self._next.items()
+                      if key not in self.chains or self.chains[key][0] != state[0])
+        if changed and self.chains:
+            logging.info(f"Firewall: {changed} chains changed of {len(self._next)}")
+        counters = {
+            "interval": round(now - self.last_time, 1) if self.last_time else None,
+            "chains": self._deltas,
+        }
+        self.chains, self._next, self._deltas = self._next, {}, {}
+        self.last_time = now
+        return counters
@@ -0,0 +1,201 @@
+# instrumentation.py
+
+import functools
+import os
+import resource
+import threading
+import time
+
+# Giới hạn trên của các bucket histogram (giây / byte)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+class Histogram:
+    """Histogram bucket cố định kiểu Prometheus (đếm không cộng dồn, cộng dồn khi xuất)"""
+
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Phần tử cuối là +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "max": round(self.max, 6),
+            "buckets": {str(bound): n for bound, n in zip(self.buckets + ("+Inf",), self.counts) if n},
+        }
+
+
+class SelfUsage:
+    """CPU và bộ nhớ của chính process agent"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self._last = (self.started, self.cpu_seconds())
+
+    @staticmethod
+    def cpu_seconds():
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime + usage.ru_stime
+
+    @staticmethod
+    def rss_bytes():
+        try:
+            with open("/proc/self/statm", "rb") as f:
+                return int(f.read().split()[1]) * PAGE_SIZE
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def uptime(self):
+        """Số giây kể từ khi process khởi động (tính cả thời gian import trước khi đo)"""
+        try:
+            with open("/proc/self/stat", "rb") as f:
+                data = f.read()
+            with open("/proc/uptime", "rb") as f:
+                system_uptime = float(f.read().split()[0])
+            # Sau ")" : starttime là trường thứ 20 (tính theo clock tick từ lúc boot)
+            return system_uptime - int(data[data.rfind(b")") + 2:].split()[19]) / CLOCK_TICKS
+        except (OSError, ValueError, IndexError):
+            return time.monotonic() - self.started
+
+    def cpu_percent(self):
+        """% một core kể từ lần gọi trước (dùng cho time series, chỉ một nơi gọi)"""
+        now, cpu = time.monotonic(), self.cpu_seconds()
+        last_time, last_cpu = self._last
+        self._last = (now, cpu)
+        return round((cpu - last_cpu) / (now - last_time) * 100, 3) if now > last_time else None
+
+    def snapshot(self):
+        uptime = self.uptime()
+        cpu = self.cpu_seconds()
+        try:
+            open_fds = len(os.listdir("/proc/self/fd"))
+        except OSError:
+            open_fds = None
+        return {
+            "uptime_seconds": round(uptime, 1),
+            "cpu_seconds": round(cpu, 3),
+            "cpu_percent_avg": round(cpu / uptime * 100, 3) if uptime > 0 else None,
+            "rss_bytes": self.rss_bytes(),
+            "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,  # ru_maxrss tính bằng KB
+            "threads": threading.active_count(),
+            "open_fds": open_fds,
+        }
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Metrics:
+    """Bộ đếm, gauge và histogram của agent, dùng chung cho mọi thread"""
+
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.usage = SelfUsage()
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, buckets=DURATION_BUCKETS, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def instrument(self, collector):
+        """Decorator cho collector: đo thời gian, đếm success/error (trả về None cũng tính là lỗi)"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.monotonic()
+                outcome = "error"
+                try:
+                    result = func(*args, **kwargs)
+                    if result is not None:
+                        outcome = "success"
+                    return result
+                finally:
+                    self.observe("agent_collector_duration_seconds", time.monotonic() - start, collector=collector)
+                    self.inc("agent_collector_runs_total", collector=collector, outcome=outcome)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        """Toàn bộ số liệu dạng JSON (gửi kèm mỗi lần upload và cho endpoint /metrics.json)"""
+        def group(items):
+            result = {}
+            for (name, labels), value in sorted(items):
+                result.setdefault(name, []).append(dict(labels, value=value))
+            return result
+
+        with self._lock:
+            counters = list(self.counters.items())
+            gauges = list(self.gauges.items())
+            histograms = [(key, h.to_dict()) for key, h in self.histograms.items()]
+        return {
+            "process": self.usage.snapshot(),
+            "counters": group(counters),
+            "gauges": group(gauges),
+            "histograms": group(histograms),
+        }
+
+    def prometheus(self):
+        """Định dạng text exposition của Prometheus"""
+        lines = []
+        for name, value in sorted(self.usage.snapshot().items()):
+            if value is not None:
+                lines.append(f"agent_process_{name} {value}")
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"{name}{_labels(labels)} {value}")
+            for (name, labels), value in sorted(self.gauges.items()):
+                lines.append(f"{name}{_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+# Registry dùng chung của process (giống logging: module nào cũng ghi vào được)
+metrics = Metrics()
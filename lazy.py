@@ -0,0 +1,32 @@
+# lazy.py
+
+import importlib
+import importlib.util
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Đại diện cho module chưa import; lần truy cập thuộc tính đầu tiên mới import thật"""
+
+    def __getattr__(self, attr):
+        module = self.__dict__.get("_module")
+        if module is None:
+            # import_module giữ import lock: các job thread cùng chạm vào module chỉ nạp một lần
+            module = self.__dict__["_module"] = importlib.import_module(self.__name__)
+        return getattr(module, attr)
+
+
+def lazy_import(name, optional=False):
+    """Trả về module `name` nhưng chỉ thực thi code của nó khi thuộc tính đầu tiên được dùng
+
+    Giúp agent khởi động nhanh, ít RAM: module nặng (requests, distro...) chỉ được nạp
+    khi collector cần tới lần đầu. `optional=True` trả về None nếu module chưa cài.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if importlib.util.find_spec(name) is None:
+        if optional:
+            return None
+        raise ImportError(f"No module named {name!r}")
+    return LazyModule(name)
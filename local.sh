@@ -1,6 +1,9 @@
+python3 bench/check_procfs.py &&
+python3 bench/check_transport.py &&
+python3 bench/run_bench.py &&
 rm -rf server_agent_project.tar.gz &&
 cd .. &&
-tar -czvf server_agent_project.tar.gz --exclude='.git' server_agent_project/ &&
+tar -czvf server_agent_project.tar.gz --exclude='.git' --exclude='server_agent_project/bench' server_agent_project/ &&
 cp server_agent_project.tar.gz server_agent_project/ &&
 cd server_agent_project &&
 git status &&
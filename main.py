@@ -6,27 +6,94 @@ import logging
 import os
 import sys
 import json
-import requests
+import random
+import signal
 import threading
 import subprocess
+from datetime import datetime
 from pathlib import Path
 from monitor import ServerMonitor  # Import từ file monitor.py
 from config import Config          # Import từ file config.py
+from scheduler import Scheduler
+from delta import DeltaEncoder, PROTOCOL as DELTA_PROTOCOL
+from spool import Spool
+from encoding import Compressor, Negotiator, SCHEMA_VERSION, encode_json
+from timeseries import TimeSeriesStore, QueryServer
+from snapshot import SnapshotStore
+from instrumentation import metrics, SIZE_BUCKETS
+from watcher import Watcher
+from alerts import AlertEngine
+from facts import detect_container
+from collectors import Registry, load_host_config
+from lazy import lazy_import
+
+# requests nặng (~100ms, vài MB RAM): chỉ nạp khi có request HTTP đầu tiên
+requests = lazy_import("requests")
+transport = lazy_import("transport")
+metrics_http = lazy_import("metrics_http")
+
+# Server từ chối nội dung batch: gửi lại y nguyên không có ích
+REJECT_STATUSES = (400, 413, 422)
 
 class ServerAgent:
-    def __init__(self):
+    def __init__(self, data_dir=None):
         self.setup_logging()
-        self.data_dir = Path("/var/log/server_agent")
+        self.data_dir = Path(data_dir or Config.DATA_DIR)
         self.data_dir.mkdir(parents=True, exist_ok=True)
         self.running = True
+        self.first_sample_sent = False
+        self.documents_published = set()  # Collector đã có tài liệu đầu tiên kể từ khi khởi động
         self.version = Config.VERSION
         self.update_url = Config.UPDATE_URL
-        self.monitor = ServerMonitor(self.data_dir)
-        self.session = requests.Session()
+        # Collector tìm từ package collectors/ và thư mục plugin, bật/tắt theo cấu hình host và container
+        self.container = detect_container()
+        self.registry = Registry().discover(Config.COLLECTOR_PLUGIN_DIRS).configure(
+            Config.COLLECTORS, load_host_config(Config.HOST_CONFIG_PATH), self.container
+        )
+        # Các tài liệu gửi theo delta; khóa upload giữ tên file cũ để server không phải đổi
+        self.documents = self.registry.documents()
+        self.schemas = self.registry.schemas()
+        self.snapshots = SnapshotStore(self.data_dir, persist=Config.PERSIST_SNAPSHOTS)
+        self.snapshots.load(self.documents)
+        self._transport = None
+        self._transport_lock = threading.Lock()
+        self.watcher = None
+        self.push_at = {}  # nhóm WATCHES -> thời điểm của lần gửi ngay gần nhất (hoặc đang hẹn)
+        self.monitor = ServerMonitor(self.data_dir, self.snapshots, self.get_transport)
+        self.scheduler = Scheduler(first_run_spread=Config.SCHEDULER_FIRST_RUN_SPREAD)
+        self.delta = DeltaEncoder(self.data_dir / "delta_state.json", Config.DELTA_FULL_RESYNC_INTERVAL)
+        self.spool = Spool(self.data_dir / "spool", Config.SPOOL_SEGMENT_BYTES, Config.SPOOL_MAX_BYTES)
+        self.next_snapshot = 0
+        self.next_upload = 0
+        self.upload_failures = 0
+        self.batch_records = Config.SPOOL_BATCH_RECORDS
+        self.rejections = 0
+        self.timeseries = TimeSeriesStore(Config.TIMESERIES_CAPACITY)
+        self.alerts = AlertEngine(Config.ALERT_RULES, Config.ALERT_REPEAT_INTERVAL)
+        self.negotiator = Negotiator(
+            Config.UPLOAD_ENCODINGS, Config.UPLOAD_COMPRESSIONS, Compressor(Config.ZSTD_DICT_PATH)
+        )
+        self.last_rollup = time.time()
+
+    def get_transport(self):
+        """Transport dùng chung cho ingest, kiểm tra cập nhật và lấy IP public, tạo ở lần dùng đầu tiên"""
+        with self._transport_lock:
+            if self._transport is None:
+                self._transport = transport.Transport(
+                    Config.MONITOR_URLS,
+                    pool_size=Config.HTTP_POOL_SIZE,
+                    connect_timeout=Config.HTTP_CONNECT_TIMEOUT,
+                    read_timeout=Config.HTTP_READ_TIMEOUT,
+                    max_retries=Config.HTTP_MAX_RETRIES,
+                    retry_base=Config.HTTP_RETRY_BASE,
+                    retry_budget_ratio=Config.HTTP_RETRY_BUDGET_RATIO,
+                    max_concurrency=Config.HTTP_MAX_CONCURRENCY
+                )
+            return self._transport
 
     def setup_logging(self):
         logging.basicConfig(
-            filename='/var/log/server_agent.log',
+            filename=Config.LOG_FILE,
             level=logging.INFO,
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
@@ -34,7 +101,7 @@ class ServerAgent:
     def check_update(self):
         # Logic cập nhật giữ nguyên, sẽ gọi update.sh
         try:
-            response = requests.get(self.update_url)
+            response = self.get_transport().get(self.update_url)
             update_info = response.json()
             # if update_info['version'] > self.version:
             #     logging.info(f"New version found: {update_info['version']}")
@@ -44,70 +111,348 @@ class ServerAgent:
             logging.error(f"Update failed: {str(e)}")
 
     def run(self):
-        last_day_check = 0
-        while self.running:
-            current_day = time.localtime().tm_mday
-            if current_day != last_day_check:
-                self.check_update()
-                self.monitor.get_system_info()
-                self.monitor.detect_firewall()
-                last_day_check = current_day
-            self.monitor.get_resource_usage()
-            self.monitor.get_running_services()
-            self.send_to_server()
-            time.sleep(300)
+        for collector in self.registry.enabled():
+            try:
+                self.scheduler.add_job(
+                    collector.name, lambda collector=collector: self.run_collector(collector),
+                    interval=collector.interval,
+                    jitter=collector.jitter,
+                    timeout=collector.timeout,
+                    # Collector nhẹ chạy ngay để có mẫu đầu tiên; collector tốn kém chờ STARTUP_DELAY rồi lệch nhau
+                    delay=0 if collector.cost == "light" else Config.STARTUP_DELAY,
+                    spread_first=collector.cost != "light"
+                )
+            except ValueError as e:
+                logging.error(f"Collector {collector.name} not scheduled: {str(e)}")
+        self.scheduler.add_job(
+            "timeseries", self.sample_timeseries,
+            interval=Config.TIMESERIES_SAMPLE_INTERVAL, timeout=10
+        )
+        # Cả fleet không cùng hỏi UPDATE_URL trong một tick sau khi update.sh khởi động lại
+        self.scheduler.add_job("check_update", self.check_update, interval=Config.UPDATE_INTERVAL,
+                               jitter=Config.UPDATE_JITTER, timeout=60, delay=Config.STARTUP_DELAY)
+        # Tài liệu gửi lần đầu sau một chu kỳ resource để các collector kịp có dữ liệu;
+        # mẫu đầu tiên vào spool thì gửi ngay qua trigger() trong run_collector
+        resource_usage = self.registry.get("resource_usage")
+        self.next_snapshot = time.monotonic() + (resource_usage.interval if resource_usage else Config.SPOOL_SEND_TICK)
+        self.scheduler.add_job(
+            "send_to_server", self.send_to_server,
+            interval=Config.SPOOL_SEND_TICK, timeout=300, delay=Config.SPOOL_SEND_TICK
+        )
+        self.scheduler.run()
 
     def start(self):
-        thread = threading.Thread(target=self.run)
+        # Scheduler chạy trước để mẫu đầu tiên không phải chờ các endpoint phụ khởi động
+        thread = threading.Thread(target=self.run, name="scheduler")
         thread.daemon = True
         thread.start()
+        self.snapshots.start()
+        if Config.WATCHES:
+            self.watcher = Watcher(
+                {group: watch["paths"] for group, watch in Config.WATCHES.items()},
+                self.on_change, Config.WATCH_DEBOUNCE
+            )
+            self.watcher.start()
+        if Config.TIMESERIES_SOCKET:
+            try:
+                QueryServer(Config.TIMESERIES_SOCKET, self.timeseries).start()
+            except OSError as e:
+                logging.error(f"Failed to start time series query API: {str(e)}")
+        if Config.METRICS_PORT:
+            try:
+                metrics_http.MetricsServer(Config.METRICS_HOST, Config.METRICS_PORT).start()
+            except OSError as e:
+                logging.error(f"Failed to start metrics endpoint: {str(e)}")
 
     def stop(self):
         self.running = False
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.scheduler.stop()
+        self.snapshots.flush()
+        if self._transport is not None:
+            self._transport.close()
         logging.info("Agent stopped")
 
-    def send_to_server(self):
-        """Gửi dữ liệu monitor đến server"""
-        # Tập hợp dữ liệu từ các file
-        files_to_send = [
-            "system_info.json",
-            "resource_usage.json",
-            "services.json",
-            "firewall_info.json"
-        ]
-        
-        monitor_data = {}
-        for file_name in files_to_send:
-            file_path = self.data_dir / file_name
-            if file_path.exists():
-                with open(file_path, 'r') as f:
-                    monitor_data[file_name] = json.load(f)
+    def on_change(self, group, changes):
+        """inotify báo thay đổi: gửi bản ghi sự kiện, chạy lại collector liên quan rồi gửi kết quả
+
+        Mỗi nhóm gửi ngay tối đa một lần mỗi WATCH_PUSH_MIN_INTERVAL giây; thay đổi dồn dập (node có
+        container/cron liên tục) được gộp vào lần gửi kế tiếp thay vì chạy lại collector mỗi lần.
+        """
+        metrics.inc("agent_watch_events_total", group=group)
+        logging.info(f"Change detected ({group}): {', '.join(change['path'] for change in changes)}")
+        self.enqueue("change_event", {
+            "timestamp": datetime.now().isoformat(),
+            "group": group,
+            "changes": changes,
+        })
+        now = time.monotonic()
+        last = self.push_at.get(group)
+        if last is not None and last > now:
+            # Đã có lần gửi hẹn trước cho nhóm này: sự kiện đi cùng lần đó
+            metrics.inc("agent_watch_pushes_coalesced_total", group=group)
+            return
+        when = now if last is None else max(now, last + Config.WATCH_PUSH_MIN_INTERVAL)
+        self.push_at[group] = when
+        delay = when - now
+        watch = Config.WATCHES[group]
+        job = watch.get("job")
+        if job:
+            # Tài liệu chỉ mã hóa lại khi bản ghi của job không tự mang thay đổi (users, firewall)
+            then = self.push_documents if watch.get("documents", True) else self.push_records
+            self.scheduler.trigger(job, then=then, delay=delay)
+        else:
+            if self.upload_failures == 0:
+                self.next_upload = min(self.next_upload, when)
+            self.scheduler.trigger("send_to_server", delay=delay)
+
+    def push_documents(self):
+        """Gửi tài liệu mới nhất ngay ở lượt gửi kế tiếp thay vì chờ CHECK_INTERVAL"""
+        self.next_snapshot = 0
+        self.push_records()
+
+    def push_records(self):
+        """Gửi ngay các bản ghi trong spool, không mã hóa lại tài liệu"""
+        if self.upload_failures == 0:
+            self.next_upload = 0
+        self.scheduler.trigger("send_to_server")
+
+    def enqueue(self, record_type, data):
+        """Đưa một bản ghi vào spool và ghi nhận kích thước theo loại"""
+        size = self.spool.append({"type": record_type, "data": data})
+        metrics.observe("agent_payload_bytes", size, buckets=SIZE_BUCKETS, type=record_type)
+
+    def run_collector(self, collector):
+        """Chạy một collector; kết quả (nếu có) vào spool theo loại bản ghi của collector"""
+        data = collector.collect(self)
+        if collector.document and collector.name not in self.documents_published:
+            # Tài liệu đầu tiên sau khi khởi động (collector chạy trễ STARTUP_DELAY) gửi ngay, không chờ CHECK_INTERVAL
+            self.documents_published.add(collector.name)
+            self.push_documents()
+        if data and collector.record:
+            problem = collector.check(data)
+            if problem:
+                # Plugin trả về sai schema: không gửi dữ liệu server không đọc được
+                metrics.inc("agent_collector_schema_errors_total", collector=collector.name)
+                logging.error(f"Collector {collector.name} output does not match its schema: {problem}")
+                return
+            self.enqueue(collector.record, data)
+            if not self.first_sample_sent:
+                # Mẫu đầu tiên sau khi khởi động (restart, update.sh) gửi ngay, không chờ tick gửi
+                self.first_sample_sent = True
+                self.scheduler.trigger("send_to_server")
+
+    def sample_timeseries(self):
+        """Lấy mẫu số liệu tần suất cao vào ring buffer"""
+        sample = self.monitor.sample_metrics()
+        # CPU/RSS của chính agent, gửi lên cùng rollup để chứng minh chi phí của agent
+        sample["agent.cpu_percent"] = metrics.usage.cpu_percent()
+        sample["agent.rss_bytes"] = metrics.usage.rss_bytes()
+        self.timeseries.record(sample)
+        self.check_alerts(sample)
+
+    def check_alerts(self, sample):
+        """Đánh giá luật cảnh báo trên mẫu mới; alert được gửi ngay trên thread pool của transport"""
+        self.send_alerts(self.alerts.evaluate(sample))
+
+    def check_alert_series(self, series, metrics):
+        """Như check_alerts cho một nhóm series có nhãn (mỗi mount, mỗi thiết bị)"""
+        self.send_alerts(self.alerts.evaluate_series(series, metrics))
+
+    def send_alerts(self, alerts):
+        for alert in alerts:
+            metrics.inc("agent_alerts_total", rule=alert["rule"], state=alert["state"])
+            if self.upload_failures:
+                # Server đang không nhận: alert đi cùng dữ liệu tồn đọng khi kết nối lại
+                self.enqueue("alert", alert)
             else:
-                logging.warning(f"File {file_path} not found, skipping")
+                self.get_transport().submit(self.push_alert, alert)
+
+    def push_alert(self, alert):
+        """Gửi một alert ngoài chu kỳ batch (JSON nhỏ, không nén); lỗi thì đưa vào spool để không mất"""
+        body = encode_json({
+            "schema_version": SCHEMA_VERSION,
+            "hostname": os.uname().nodename,
+            "records": [{"type": "alert", "data": alert}],
+        })
+        headers = {
+            "Content-Type": "application/json",
+            "X-Schema-Version": str(SCHEMA_VERSION),
+            "token": f"{Config.MONITOR_TOKEN}",
+            "X-Upload-Protocol": DELTA_PROTOCOL,
+        }
+        try:
+            response = self.get_transport().post_ingest(data=body, headers=headers)
+            response.raise_for_status()
+            metrics.inc("agent_alert_pushes_total", outcome="success")
+        except requests.RequestException as e:
+            metrics.inc("agent_alert_pushes_total", outcome="error")
+            logging.error(f"Failed to push alert {alert['rule']}, queued for the next upload: {str(e)}")
+            self.enqueue("alert", alert)
+
+    def enqueue_rollup(self):
+        """Gộp các bucket đã đủ dữ liệu kể từ lần gửi trước và đưa vào spool"""
+        step = Config.TIMESERIES_ROLLUP_STEP
+        now = time.time()
+        end = now - now % step
+        if end <= self.last_rollup:
+            return
+        rollup = self.timeseries.rollup(self.last_rollup, end, step)
+        if rollup:
+            self.enqueue("rollup", {"start": self.last_rollup, "end": end, "step": step, "series": rollup})
+        self.last_rollup = end
+
+    def enqueue_documents(self):
+        """Lấy snapshot mới nhất của các tài liệu, mã hóa delta và đưa vào spool"""
+        # resource_usage đã vào spool theo từng mẫu nên không nằm trong tài liệu
+        monitor_data = {
+            f"{name}.json": snapshot.data for name, snapshot in self.snapshots.latest(self.documents).items()
+        }
         
         if not monitor_data:
             logging.warning("No monitor data to send")
             return
-        
-        # Gửi dữ liệu đến server
+
+        # Spool bị xóa bớt thì server có thể thiếu phiên bản gốc của delta
+        if self.spool.pop_evicted():
+            self.delta.force_resync()
+
+        # Spool giao theo đúng thứ tự nên phiên bản vừa ghi vào spool là mốc cho delta sau
+        payload, pending = self.delta.encode(monitor_data)
+        self.enqueue("documents", payload)
+        self.delta.ack(pending)
+
+    def send_to_server(self):
+        """Gửi dữ liệu monitor đến server theo batch nén, thử lại với backoff khi lỗi"""
+        now = time.monotonic()
+        if now >= self.next_snapshot:
+            self.next_snapshot = now + Config.CHECK_INTERVAL
+            self.enqueue_rollup()
+            self.enqueue_documents()
+            if self.upload_failures == 0:
+                self.next_upload = now
+        if now < self.next_upload:
+            return
+
+        for _ in range(Config.SPOOL_MAX_BATCHES):
+            start = self.spool.cursor
+            records, cursor = self.spool.read_batch(self.batch_records, Config.SPOOL_BATCH_BYTES)
+            if not records:
+                break
+            batch_id = self.spool.batch_id(start, cursor)
+            body, headers = self.negotiator.encode({
+                "schema_version": SCHEMA_VERSION,
+                "schemas": self.schemas,  # Phiên bản của từng record/document theo collector
+                "hostname": os.uname().nodename,
+                # Vị trí của batch trong spool: batch gửi lại sau khi mất ack có cùng id để server bỏ trùng
+                "batch": {"id": batch_id, "from": list(start), "to": list(cursor)},
+                "records": records,
+                "agent": metrics.snapshot()  # Số liệu tự đo của agent (thời gian collector, lỗi, CPU/RSS)
+            })
+            headers.update({
+                "token": f"{Config.MONITOR_TOKEN}",
+                "X-Upload-Protocol": DELTA_PROTOCOL,
+                "Idempotency-Key": batch_id,
+            })
+
+            # Gửi dữ liệu đến server
+            metrics.observe("agent_upload_bytes", len(body), buckets=SIZE_BUCKETS)
+            started = time.monotonic()
+            try:
+                response = self.get_transport().post_ingest(data=body, headers=headers)
+                if response.status_code in (406, 415):
+                    # Server không đọc được định dạng đã chọn: quay về JSON + gzip ở lần thử sau
+                    self.negotiator.reset()
+                if response.status_code in REJECT_STATUSES and self.reject_batch(records, cursor, batch_id, response):
+                    continue
+                response.raise_for_status()
+                self.negotiator.update(response.headers)
+                result = response.json()
+            except (requests.RequestException, ValueError) as e:
+                metrics.inc("agent_uploads_total", outcome="error")
+                self.upload_failures += 1
+                metrics.set_gauge("agent_upload_consecutive_failures", self.upload_failures)
+                backoff = min(Config.SPOOL_RETRY_MAX, Config.SPOOL_RETRY_BASE * 2 ** (self.upload_failures - 1))
+                self.next_upload = now + random.uniform(backoff / 2, backoff)
+                logging.error(f"Failed to send monitor data to server (attempt {self.upload_failures}, "
+                              f"retry in {self.next_upload - now:.0f}s): {str(e)}")
+                return
+            finally:
+                metrics.observe("agent_upload_duration_seconds", time.monotonic() - started)
+
+            metrics.inc("agent_uploads_total", outcome="success")
+            metrics.inc("agent_uploaded_records_total", len(records))
+            self.spool.ack(cursor)
+            self.upload_failures = self.rejections = 0
+            # Sau khi chia nhỏ vì 413: tăng dần lại kích thước batch
+            self.batch_records = min(Config.SPOOL_BATCH_RECORDS, self.batch_records * 2)
+            metrics.set_gauge("agent_upload_consecutive_failures", 0)
+            if isinstance(result, dict) and result.get("resync"):
+                self.delta.force_resync()
+            logging.info(f"Successfully sent {len(records)} records to server: {result}")
+        else:
+            # Còn tồn đọng sau khi mất kết nối: gửi tiếp ở tick sau
+            self.next_upload = now
+            return
+        self.next_upload = self.next_snapshot
+
+    def reject_batch(self, records, cursor, batch_id, response):
+        """Server từ chối batch (lỗi vĩnh viễn): chia đôi batch quá lớn, cách ly batch bị từ chối nhiều lần
+
+        Trả về True nếu đã xử lý (gửi tiếp ngay), False để đi theo đường backoff như lỗi thường.
+        """
+        status = response.status_code
+        metrics.inc("agent_uploads_total", outcome="rejected")
+        if status == 413 and len(records) > 1:
+            self.batch_records = max(1, len(records) // 2)
+            logging.warning(f"Batch {batch_id} too large ({len(records)} records), splitting to {self.batch_records}")
+            return True
+        self.rejections += 1
+        if self.rejections < Config.SPOOL_REJECT_ATTEMPTS:
+            logging.warning(f"Batch {batch_id} rejected with {status} (attempt {self.rejections})")
+            return False
+        self.quarantine(records, batch_id, status, response.text[:1000])
+        self.spool.ack(cursor)
+        self.rejections = 0
+        metrics.inc("agent_batches_quarantined_total", status=str(status))
+        metrics.inc("agent_quarantined_records_total", len(records))
+        if any(record.get("type") == "documents" for record in records):
+            # Server thiếu một phiên bản tài liệu: delta sau phải là bản đầy đủ
+            self.delta.force_resync()
+        logging.error(f"Batch {batch_id} rejected {Config.SPOOL_REJECT_ATTEMPTS} times with {status}, "
+                      f"moved {len(records)} records to quarantine")
+        return True
+
+    def quarantine(self, records, batch_id, status, reason):
+        """Lưu batch bị từ chối ra đĩa để điều tra, chỉ giữ SPOOL_QUARANTINE_FILES file mới nhất"""
+        directory = self.data_dir / "quarantine"
         try:
-            headers = {"token": f"{Config.MONITOR_TOKEN}"}
-            response = self.session.post(
-                f"{Config.MONITOR_URL}",
-                json=monitor_data,
-                headers=headers,
-                timeout=10
-            )
-            response.raise_for_status()
-            logging.info(f"Successfully sent monitor data to server: {response.json()}")
-        except requests.RequestException as e:
-            logging.error(f"Failed to send monitor data to server: {str(e)}")
+            directory.mkdir(exist_ok=True)
+            path = directory / f"{int(time.time())}-{batch_id.replace(':', '_')}.json"
+            with open(path, "w") as f:
+                json.dump({"batch": batch_id, "status": status, "reason": reason, "records": records}, f, default=str)
+            for old in sorted(directory.glob("*.json"))[:-Config.SPOOL_QUARANTINE_FILES]:
+                old.unlink()
+        except OSError as e:
+            logging.error(f"Failed to write quarantined batch {batch_id}: {str(e)}")
 
-if __name__ == "__main__":
+
+def main():
     agent = ServerAgent()
+    stopped = threading.Event()
+
+    def handle_signal(signum, frame):
+        logging.info(f"Received signal {signum}, stopping")
+        stopped.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
     agent.start()
-    try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        agent.stop()
\ No newline at end of file
+    # Thread chính ngủ tới khi có SIGTERM/SIGINT thay vì thức dậy mỗi giây
+    stopped.wait()
+    agent.stop()
+
+
+if __name__ == "__main__":
+    main()
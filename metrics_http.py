@@ -0,0 +1,46 @@
+# metrics_http.py
+# Endpoint HTTP tách khỏi instrumentation để http.server (~20ms, vài MB) không nạp lúc khởi động
+
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from instrumentation import metrics
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """GET /metrics (Prometheus text) hoặc /metrics.json"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, content_type = json.dumps(metrics.snapshot()).encode("utf-8"), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = metrics.prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsServer(ThreadingMixIn, HTTPServer):
+    """Endpoint số liệu của agent, chỉ lắng nghe trên localhost"""
+
+    daemon_threads = True
+
+    def __init__(self, host, port):
+        super().__init__((host, port), MetricsHandler)
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, name="metrics-http")
+        thread.daemon = True
+        thread.start()
+        logging.info(f"Metrics endpoint listening on http://{self.server_address[0]}:{self.server_address[1]}/metrics")
@@ -1,309 +1,432 @@
 # monitor.py
 
 import psutil
-import subprocess
-import json
 from datetime import datetime
-import requests, distro, platform, os, re, logging
+import os, re, logging
+from cpu_sampler import CpuSampler
+from executor import run_command, run_parallel
+from procfs import ProcStats
+from wtmp import LoginHistoryReader
+from services import ServiceCollector
+from firewall import FirewallCollector, parse_iptables_save, parse_nft_json
+from facts import FactCache, read_sysfs_dmi
+from processes import ProcessSampler
+from filesystems import FilesystemCollector
+from snapshot import SnapshotStore
+from instrumentation import metrics
+from lazy import lazy_import
+from config import Config
+
+# Chỉ dùng cho system_info (chạy thưa) và khi gửi HTTP: nạp khi dùng lần đầu để khởi động nhanh, ít RAM
+requests = lazy_import("requests")
+distro = lazy_import("distro")
+platform = lazy_import("platform")
+transport = lazy_import("transport")
 
 class ServerMonitor:
-    def __init__(self, data_dir):
+    def __init__(self, data_dir, snapshots=None, get_transport=None):
         self.data_dir = data_dir
+        # Transport dùng chung do agent tạo khi cần; chạy riêng thì tự tạo ở lần gửi HTTP đầu tiên
+        self.get_transport = get_transport
+        self._transport = None
+        # Kết quả collector được chuyển cho sender qua bộ nhớ thay vì ghi rồi đọc lại file JSON
+        self.snapshots = snapshots or SnapshotStore()
+        self.cpu_sampler = CpuSampler()
+        self.proc_stats = ProcStats()
+        # Bộ đếm riêng cho sampler tần suất cao để không ảnh hưởng chênh lệch của get_resource_usage
+        self.fast_cpu_sampler = CpuSampler()
+        self.fast_proc_stats = ProcStats()
+        self.service_collector = ServiceCollector()
+        self.firewall_collector = FirewallCollector()
+        self.fact_cache = FactCache(self.data_dir / "facts_cache.json")
+        self.process_sampler = ProcessSampler(
+            Config.PROCESS_TOP_N, Config.PROCESS_MAX_HANDLES, Config.PROCESS_FULL_SCAN_EVERY
+        )
+        self.filesystem_collector = FilesystemCollector(
+            Config.FILESYSTEM_IGNORE_TYPES, Config.FILESYSTEM_IGNORE_PATHS, Config.FILESYSTEM_STATVFS_TIMEOUT
+        )
+        self.login_reader = LoginHistoryReader(
+            self.data_dir / "login_cursor.json",
+            backfill_records=Config.LOGIN_HISTORY_BACKFILL
+        )
+
+    @property
+    def transport(self):
+        if self._transport is None:
+            self._transport = self.get_transport() if self.get_transport else transport.Transport()
+        return self._transport
 
     def parse_dmidecode(self, dmi_output):
-        """Phân tích đầu ra dmidecode thành JSON chuẩn"""
+        """Phân tích đầu ra dmidecode thành JSON chuẩn (mọi DMI type trong một lượt)"""
         dmi_data = {
             "bios": {},
             "system": {},
             "memory_devices": [],
-            "processors": []
+            "processors": [],
+            "tables": {}  # Các type còn lại: {type: {"name": ..., "entries": [...]}}
         }
         
         if not dmi_output or "No SMBIOS" in dmi_output or "Permission denied" in dmi_output:
             logging.error("dmidecode output is empty or access denied")
             return dmi_data
         
-        current_section = {}
-        current_type = None
+        sections = []  # (type, tên bảng, dict các trường)
+        current_section = None
+        current_key = None
         
-        # Ghi log đầu ra để debug
-        logging.debug(f"dmidecode output:\n{dmi_output}")
-        
-        lines = dmi_output.splitlines()
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if not line or line.startswith('#'):
+        for line in dmi_output.splitlines():
+            if not line.strip() or line.startswith('#'):
                 continue
             
             # Bắt đầu một section mới với Handle
             if line.startswith('Handle'):
-                if current_section and current_type is not None:
-                    if current_type == 0:
-                        dmi_data["bios"] = current_section
-                    elif current_type == 1:
-                        dmi_data["system"] = current_section
-                    elif current_type == 17:
-                        dmi_data["memory_devices"].append(current_section)
-                    elif current_type == 4:
-                        dmi_data["processors"].append(current_section)
-                current_section = {}
                 match = re.search(r'type (\d+)', line, re.I)
-                if match:
-                    current_type = int(match.group(1))
+                current_section = {"type": int(match.group(1)) if match else None, "name": None, "fields": {}}
+                sections.append(current_section)
+                current_key = None
+                continue
+            if current_section is None:
                 continue
             
-            # Phân tích key-value trong section
-            if ':' in line:
+            depth = len(line) - len(line.lstrip('\t'))
+            line = line.strip()
+            if depth == 0:
+                # Dòng đầu tiên sau Handle là tên bảng (vd. "Base Board Information")
+                current_section["name"] = current_section["name"] or line
+            elif depth == 1 and ':' in line:
                 key, value = [part.strip() for part in line.split(':', 1)]
+                current_key = key
                 if value:  # Chỉ thêm nếu có giá trị
-                    current_section[key] = value
+                    current_section["fields"][key] = value
+            elif depth >= 2 and current_key:
+                # Giá trị nhiều dòng (vd. Characteristics, Flags): gom thành danh sách
+                values = current_section["fields"].setdefault(current_key, [])
+                if isinstance(values, list):
+                    values.append(line)
         
-        # Lưu section cuối cùng nếu có
-        if current_section and current_type is not None:
-            if current_type == 0:
-                dmi_data["bios"] = current_section
-            elif current_type == 1:
-                dmi_data["system"] = current_section
-            elif current_type == 17:
-                dmi_data["memory_devices"].append(current_section)
-            elif current_type == 4:
-                dmi_data["processors"].append(current_section)
+        for section in sections:
+            section_type, fields = section["type"], section["fields"]
+            if section_type is None or not fields:
+                continue
+            if section_type == 0:
+                dmi_data["bios"] = fields
+            elif section_type == 1:
+                dmi_data["system"] = fields
+            elif section_type == 17:
+                dmi_data["memory_devices"].append(fields)
+            elif section_type == 4:
+                dmi_data["processors"].append(fields)
+            else:
+                table = dmi_data["tables"].setdefault(str(section_type), {"name": section["name"], "entries": []})
+                table["entries"].append(fields)
         
-        # Log kết quả phân tích
-        logging.info(f"Parsed dmidecode data: {json.dumps(dmi_data, indent=2)}")
+        logging.info(f"Parsed dmidecode data: {len(sections)} structures, "
+                     f"{len(dmi_data['processors'])} processors, {len(dmi_data['memory_devices'])} memory devices")
         return dmi_data
 
+    def probe_hardware(self):
+        """Chạy dmidecode đầy đủ; không có quyền root thì dùng các trường DMI trong sysfs"""
+        if os.geteuid() != 0:
+            logging.error("Need root privileges to run dmidecode, using sysfs DMI fields only")
+            return {"sysfs": read_sysfs_dmi()}
+        result = run_command(["dmidecode"])
+        if not result.ok:
+            logging.error(f"Failed to run dmidecode: {result.describe()}")
+            return None
+        # Phân tích thành JSON chuẩn
+        return self.parse_dmidecode(result.output)
+
+    @metrics.instrument("system_info")
     def get_system_info(self):
-        """Lấy và lưu thông tin cấu hình hệ thống từ dmidecode"""
+        """Lấy và lưu thông tin cấu hình hệ thống (phần cứng lấy từ cache, chỉ probe lại khi đổi)"""
         try:
-            if os.geteuid() != 0:
-                logging.error("Need root privileges to run dmidecode")
-                return
-
-            dmi_info = subprocess.check_output(["dmidecode"], universal_newlines=True, stderr=subprocess.STDOUT)
-            
-            # Phân tích thành JSON chuẩn
-            parsed_dmi = self.parse_dmidecode(dmi_info)
+            # Lịch sử đăng nhập và IP public chạy song song, mỗi probe có timeout riêng
+            results = run_parallel({
+                "publicip": self.get_public_ip,
+                "login_history": self.get_login_history,
+            })
             
             # Tạo dữ liệu JSON
             system_info = {
                 "timestamp": datetime.now().isoformat(),
                 "hostname": os.uname().nodename,
                 "os": self.get_os_info(),
-                "publicip": self.get_public_ip(),
+                "publicip": results["publicip"] or "unknown",
                 "users": self.get_user_accounts(),
-                "login_history": self.get_login_history(),
-                "hardware_info": parsed_dmi,
+                "login_history": results["login_history"] or {
+                    "successful_logins": [],
+                    "failed_logins": [],
+                    "last_login_summary": []
+                },
             }
             
-            output_file = self.data_dir / "system_info.json"
-            with open(output_file, "w") as f:
-                json.dump(system_info, f, indent=2)
-            logging.info(f"System info collected and saved to {output_file}")
-
-        except subprocess.CalledProcessError as e:
-            logging.error(f"Failed to run dmidecode: {e.output}")
-        except PermissionError:
-            logging.error(f"Permission denied when writing to {output_file}")
+            self.snapshots.publish("system_info", system_info)
+            logging.info("System info collected")
+            return system_info
+
         except Exception as e:
             logging.error(f"Failed to get system info: {str(e)}")
 
+    @metrics.instrument("hardware")
+    def get_hardware_info(self):
+        """Phần cứng (dmidecode, lấy từ cache và chỉ probe lại khi đổi), tài liệu riêng với system_info"""
+        try:
+            hardware_info = {
+                "timestamp": datetime.now().isoformat(),
+                "hardware_info": self.fact_cache.get(self.probe_hardware) or {},
+            }
+            self.snapshots.publish("hardware_info", hardware_info)
+            return hardware_info
+        except Exception as e:
+            logging.error(f"Failed to get hardware info: {str(e)}")
+
+    @metrics.instrument("timeseries")
+    def sample_metrics(self):
+        """Mẫu số liệu nhẹ (chỉ đọc /proc) cho time series tần suất cao"""
+        cpu = self.fast_cpu_sampler.sample()
+        meminfo = self.fast_proc_stats.meminfo()
+        interfaces = self.fast_proc_stats.net_dev()
+        io = self.fast_proc_stats.diskstats()
+        load_1m, load_5m, load_15m = os.getloadavg()
+        memory_total = meminfo.get("MemTotal", 0)
+        memory_available = meminfo.get("MemAvailable", meminfo.get("MemFree", 0))
+
+        def total_rate(key):
+            rates = [i.get(key) for name, i in interfaces.items() if name != "lo" and i.get(key) is not None]
+            return sum(rates) if rates else None
+
+        return {
+            "cpu.percent": cpu["percent"],
+            "cpu.user": cpu["modes"].get("user"),
+            "cpu.system": cpu["modes"].get("system"),
+            "cpu.iowait": cpu["modes"].get("iowait"),
+            "cpu.steal": cpu["modes"].get("steal"),
+            "load.1m": load_1m,
+            "memory.available": memory_available,
+            "memory.percent": (memory_total - memory_available) / memory_total * 100 if memory_total else None,
+            "net.rx_bytes_per_sec": total_rate("rx_bytes_per_sec"),
+            "net.tx_bytes_per_sec": total_rate("tx_bytes_per_sec"),
+            "disk.reads_per_sec": io.get("reads_per_sec"),
+            "disk.writes_per_sec": io.get("writes_per_sec"),
+            "disk.read_bytes_per_sec": io.get("read_bytes_per_sec"),
+            "disk.write_bytes_per_sec": io.get("write_bytes_per_sec"),
+        }
+
+    @metrics.instrument("net_connections")
+    def get_net_connections(self):
+        """Bảng kết nối đầy đủ (rất tốn CPU trên LB): collector riêng, mặc định tắt"""
+        return [{
+            "fd": c.fd,
+            "family": int(c.family),
+            "type": int(c.type),
+            "laddr": f"{c.laddr.ip}:{c.laddr.port}" if c.laddr else None,
+            "raddr": f"{c.raddr.ip}:{c.raddr.port}" if c.raddr else None,
+            "status": c.status,
+            "pid": c.pid
+        } for c in psutil.net_connections()]
+
+    @metrics.instrument("resource_usage")
     def get_resource_usage(self):
         """Lấy thông tin sử dụng tài nguyên"""
         try:
-            memory = psutil.virtual_memory()
+            # Số liệu tần suất cao đọc thẳng từ /proc thay vì các hàm nặng của psutil
+            meminfo = self.proc_stats.meminfo()
+            interfaces = self.proc_stats.net_dev()
             disk = psutil.disk_usage('/')
-            net_io = psutil.net_io_counters()
+            cpu_usage = self.cpu_sampler.sample()
+            battery = psutil.sensors_battery()
+            memory_total = meminfo.get("MemTotal", 0)
+            memory_available = meminfo.get("MemAvailable", meminfo.get("MemFree", 0))
 
             resource_info = {
                 "timestamp": datetime.now().isoformat(),
                 "cpu": {
-                    "percent": psutil.cpu_percent(interval=1),
+                    "percent": cpu_usage["percent"],
+                    "modes": cpu_usage["modes"],  # user/system/iowait/steal/irq...
+                    "per_cpu": cpu_usage["per_cpu"],
                     "count": psutil.cpu_count(),
                     "count_no_logical": psutil.cpu_count(logical=False),
-                    "getloadavg": psutil.getloadavg()
+                    "getloadavg": os.getloadavg()
                 },
                 "memory": {
-                    "total": memory.total / (1024*1024),  # MB
-                    "available": memory.available / (1024*1024),
-                    "percent": memory.percent
+                    "total": memory_total,  # byte
+                    "available": memory_available,
+                    "percent": round((memory_total - memory_available) / memory_total * 100, 1) if memory_total else 0,
+                    "swap_total": meminfo.get("SwapTotal", 0),
+                    "swap_free": meminfo.get("SwapFree", 0)
                 },
                 "disk": {
-                    "total": disk.total / (1024*1024*1024),  # GB
-                    "used": disk.used / (1024*1024*1024),
-                    "free": disk.free / (1024*1024*1024),
+                    "total": disk.total,  # byte
+                    "used": disk.used,
+                    "free": disk.free,
                     "percent": disk.percent,
-                    "partitions": psutil.disk_partitions()
+                    "io": self.proc_stats.diskstats()  # Từng mount và thiết bị: collector filesystems
                 },
                 "network": {
-                    "bytes_sent": net_io.bytes_sent / (1024*1024),  # MB
-                    "bytes_recv": net_io.bytes_recv / (1024*1024),
-                    "net_connections": psutil.net_connections(),
+                    "bytes_sent": sum(i["tx_bytes"] for i in interfaces.values()),  # byte
+                    "bytes_recv": sum(i["rx_bytes"] for i in interfaces.values()),
+                    "interfaces": interfaces,
+                    "tcp_states": self.proc_stats.tcp_states(),
+                    "sockstat": self.proc_stats.sockstat(),
+                    "snmp": self.proc_stats.snmp(),
                 },
                 "sensors": {
-                    "temperatures": psutil.sensors_temperatures(fahrenheit=False),
-                    "fans": psutil.sensors_fans(),
-                    "battery": psutil.sensors_battery()
+                    "temperatures": {name: [t._asdict() for t in entries]
+                                     for name, entries in psutil.sensors_temperatures(fahrenheit=False).items()},
+                    "fans": {name: [f._asdict() for f in entries] for name, entries in psutil.sensors_fans().items()},
+                    "battery": battery._asdict() if battery else None
                 },
-                "boot_time": psutil.boot_time(),
-                "users": psutil.users()
+                "boot_time": int(psutil.boot_time()),
+                "users": [u._asdict() for u in psutil.users()]
             }
-
-            with open(self.data_dir / "resource_usage.json", "w") as f:
-                json.dump(resource_info, f, indent=2)
+            self.snapshots.publish("resource_usage", resource_info)
+            return resource_info
 
         except Exception as e:
             logging.error(f"Failed to get resource usage: {str(e)}")
+            return None
 
+    @metrics.instrument("filesystems")
+    def get_filesystems(self):
+        """Dung lượng, inode của mọi mount thật và IOPS, throughput, độ trễ, % bận theo thiết bị"""
+        try:
+            filesystems = self.filesystem_collector.collect()
+            filesystems["timestamp"] = datetime.now().isoformat()
+            return filesystems
+        except Exception as e:
+            logging.error(f"Failed to get filesystems: {str(e)}")
+            return None
+
+    @metrics.instrument("processes")
+    def get_top_processes(self):
+        """Top-N process theo CPU, RAM và IO kể từ lần quét trước"""
+        try:
+            processes = self.process_sampler.sample()
+            processes["timestamp"] = datetime.now().isoformat()
+            return processes
+        except Exception as e:
+            logging.error(f"Failed to get top processes: {str(e)}")
+            return None
+
+    @metrics.instrument("services")
     def get_running_services(self):
         """Lấy tất cả các service và trạng thái của chúng từ systemd"""
         try:
-            result = subprocess.check_output(
-                ["systemctl", "list-units", "--type=service", "--all"],
-                universal_newlines=True, stderr=subprocess.STDOUT
-            )
-            services = []
-            lines = result.splitlines()
-            
-            # Bỏ qua header và footer
-            for line in lines[1:]:
-                if ".service" in line and "loaded" in line:
-                    parts = line.split()
-                    service_name = parts[0].replace(".service", "")
-                    load_state = parts[1]  # loaded/not-found
-                    active_state = parts[2]  # active/inactive
-                    sub_state = parts[3]  # running/exited/dead/failed/...
-                    description = " ".join(parts[4:]) if len(parts) > 4 else "No description"
-                    services.append({
-                        "name": service_name,
-                        "load_state": load_state,
-                        "active_state": active_state,
-                        "sub_state": sub_state,
-                        "description": description
-                    })
+            # Một lệnh `systemctl show` cho mọi unit thay vì parse text của list-units
+            result = self.service_collector.collect()
             
-            output_file = self.data_dir / "services.json"  # Đổi tên file để rõ ràng hơn
-            with open(output_file, "w") as f:
-                json.dump({
-                    "timestamp": datetime.now().isoformat(),
-                    "services": services
-                }, f, indent=2)
-            logging.info(f"All services saved to {output_file}")
-            return services
+            self.snapshots.publish("services", {
+                "timestamp": datetime.now().isoformat(),
+                "services": result["services"]
+            })
+            logging.info(f"All services collected: {len(result['services'])}")
+            return result
         
-        except subprocess.CalledProcessError as e:
-            logging.error(f"Failed to get services: {e.output}")
-            return []
         except Exception as e:
             logging.error(f"Error getting services: {str(e)}")
-            return []
+            return None
 
+    @metrics.instrument("firewall")
     def detect_firewall(self):
-        """Phát hiện firewall và liệt kê rules chi tiết, bao gồm tất cả chain của iptables"""
-        firewall_info = {
+        """Phát hiện firewall và lấy toàn bộ rule (mọi bảng iptables, nftables dạng JSON)"""
+        # Các probe độc lập chạy song song; probe treo hoặc lỗi trả về kết quả mặc định
+        defaults = {
             "ufw": {"installed": False, "active": False, "rules": []},
-            "iptables": {"installed": False, "chains": {}},
-            "nftables": {"installed": False, "rules": ""},
+            "iptables": {"installed": False, "tables": {}},
+            "ip6tables": {"installed": False, "tables": {}},
+            "nftables": {"installed": False, "tables": {}},
             "firewalld": {"installed": False, "active": False, "rules": []}
         }
-        
-        # Kiểm tra UFW
-        try:
-            if os.path.exists("/usr/sbin/ufw"):
-                firewall_info["ufw"]["installed"] = True
-            status = subprocess.check_output(["ufw", "status", "verbose"], universal_newlines=True)
-            if "Status: active" in status:
-                firewall_info["ufw"]["active"] = True
-                lines = status.splitlines()
-                for line in lines:
-                    if "ALLOW" in line or "DENY" in line or "REJECT" in line:
-                        firewall_info["ufw"]["rules"].append(line.strip())
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            pass
-        
-        # Kiểm tra iptables
-        try:
-            if os.path.exists("/sbin/iptables"):
-                firewall_info["iptables"]["installed"] = True
-            rules = subprocess.check_output(["iptables", "-L", "-v", "-n", "--line-numbers"], universal_newlines=True)
-            current_chain = None
-            for line in rules.splitlines():
-                if line.startswith("Chain"):
-                    current_chain = line.split()[1]
-                    firewall_info["iptables"]["chains"][current_chain] = {
-                        "policy": line.split("policy")[1].strip() if "policy" in line else "unknown",
-                        "rules": []
-                    }
-                elif line and not line.startswith("num") and current_chain:
-                    parts = line.split()
-                    if len(parts) >= 8:  # Đảm bảo đủ trường
-                        rule = {
-                            "num": parts[0],        # Số thứ tự
-                            "pkts": parts[1],       # Số gói tin
-                            "bytes": parts[2],      # Số byte
-                            "target": parts[3],     # Hành động (ACCEPT, DROP,...)
-                            "protocol": parts[4],   # Giao thức (tcp, udp,...)
-                            "opt": parts[5],        # Tùy chọn (--,...)
-                            "in": parts[6],         # Giao diện vào
-                            "out": parts[7],        # Giao diện ra
-                            "source": parts[8],     # Nguồn
-                            "destination": parts[9],# Đích
-                            "extra": " ".join(parts[10:]) if len(parts) > 10 else ""  # Thông tin bổ sung
-                        }
-                        firewall_info["iptables"]["chains"][current_chain]["rules"].append(rule)
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            pass
-        
-        # Kiểm tra nftables
-        try:
-            if os.path.exists("/usr/sbin/nft"):
-                firewall_info["nftables"]["installed"] = True
-            rules = subprocess.check_output(["nft", "list", "ruleset"], universal_newlines=True)
-            firewall_info["nftables"]["rules"] = rules.strip() if rules.strip() else "No rules defined"
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            pass
-        
-        # Kiểm tra firewalld
-        try:
-            if os.path.exists("/usr/sbin/firewall-cmd"):
-                firewall_info["firewalld"]["installed"] = True
-            status = subprocess.check_output(["firewall-cmd", "--state"], universal_newlines=True)
-            if "running" in status:
-                firewall_info["firewalld"]["active"] = True
-                rules = subprocess.check_output(["firewall-cmd", "--list-all"], universal_newlines=True)
-                lines = rules.splitlines()
-                for line in lines:
-                    if "services:" in line or "ports:" in line or "rules:" in line:
-                        firewall_info["firewalld"]["rules"].append(line.strip())
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            pass
-        
+        results = run_parallel({
+            "ufw": self._probe_ufw,
+            "iptables": lambda: self._probe_iptables("iptables-save"),
+            "ip6tables": lambda: self._probe_iptables("ip6tables-save"),
+            "nftables": self._probe_nftables,
+            "firewalld": self._probe_firewalld,
+        })
+        firewall_info = {name: results[name] or defaults[name] for name in defaults}
+
+        # Hash từng chain: rule set không đổi dùng lại đối tượng cũ (delta upload thấy "unchanged"),
+        # counter gửi riêng dưới dạng chênh lệch
+        for name in ("iptables", "ip6tables", "nftables"):
+            info = firewall_info[name]
+            info["tables"] = self.firewall_collector.fingerprint(name, info["tables"])
+            info["rule_count"] = sum(len(chain["rules"]) for chains in info["tables"].values()
+                                     for chain in chains.values())
+        counters = self.firewall_collector.finish()
+
         # Xác định firewall chính đang hoạt động
         active_firewall = "unknown"
         if firewall_info["ufw"]["active"]:
             active_firewall = "ufw"
-        elif firewall_info["iptables"]["chains"]:
+        elif firewall_info["iptables"]["rule_count"]:
             active_firewall = "iptables"
-        elif firewall_info["nftables"]["rules"] and firewall_info["nftables"]["rules"] != "No rules defined":
+        elif firewall_info["nftables"]["rule_count"]:
             active_firewall = "nftables"
         elif firewall_info["firewalld"]["active"]:
             active_firewall = "firewalld"
-        
+
         firewall_info["active_firewall"] = active_firewall
-        
-        output_file = self.data_dir / "firewall_info.json"
-        with open(output_file, "w") as f:
-            json.dump({
-                "timestamp": datetime.now().isoformat(),
-                "firewall": firewall_info
-            }, f, indent=2)
-        logging.info(f"Firewall info saved to {output_file}")
-        return firewall_info
+
+        self.snapshots.publish("firewall_info", {
+            "timestamp": datetime.now().isoformat(),
+            "firewall": firewall_info
+        })
+        logging.info(f"Firewall info collected, active firewall: {active_firewall}, "
+                     f"{firewall_info['iptables']['rule_count']} iptables rules, "
+                     f"{firewall_info['nftables']['rule_count']} nftables rules")
+        return {"firewall": firewall_info, "counters": counters}
+
+    def _probe_ufw(self):
+        """Kiểm tra UFW"""
+        info = {"installed": os.path.exists("/usr/sbin/ufw"), "active": False, "rules": []}
+        status = run_command(["ufw", "status", "verbose"])
+        if status.ok and "Status: active" in status.output:
+            info["active"] = True
+            for line in status.output.splitlines():
+                if "ALLOW" in line or "DENY" in line or "REJECT" in line:
+                    info["rules"].append(line.strip())
+        return info
+
+    def _probe_iptables(self, command):
+        """Mọi bảng (filter/nat/mangle/raw/security) kèm counter trong một lần gọi `iptables-save -c`"""
+        result = run_command([command, "-c"])
+        info = {"installed": result.error is None, "tables": {}}
+        if result.ok:
+            info["tables"] = parse_iptables_save(result.output)
+        elif result.error is None:
+            logging.error(f"Failed to run {command}: {result.describe()}")
+        return info
+
+    def _probe_nftables(self):
+        """Toàn bộ ruleset nftables dạng JSON (`nft -j`), tách theo bảng/chain"""
+        result = run_command(["nft", "-j", "list", "ruleset"])
+        info = {"installed": result.error is None, "tables": {}}
+        if result.ok and result.output.strip():
+            try:
+                info["tables"] = parse_nft_json(result.output)
+            except (ValueError, KeyError, AttributeError) as e:
+                logging.error(f"Failed to parse nft JSON output: {str(e)}")
+        elif result.error is None and not result.ok:
+            logging.error(f"Failed to run nft: {result.describe()}")
+        return info
+
+    def _probe_firewalld(self):
+        """Kiểm tra firewalld"""
+        info = {"installed": os.path.exists("/usr/sbin/firewall-cmd"), "active": False, "rules": []}
+        status = run_command(["firewall-cmd", "--state"])
+        if status.ok and "running" in status.output:
+            info["active"] = True
+            rules = run_command(["firewall-cmd", "--list-all"])
+            for line in rules.output.splitlines():
+                if "services:" in line or "ports:" in line or "rules:" in line:
+                    info["rules"].append(line.strip())
+        return info
 
     def get_public_ip(self):
         """Lấy địa chỉ IP public của server"""
         try:
-            response = requests.get("https://whois.inet.vn/api/ifconfig", timeout=5)
+            response = self.transport.get(Config.PUBLIC_IP_URL, timeout=5)
             response.raise_for_status()  # Kiểm tra lỗi HTTP
             ip = response.text.strip()
             logging.info(f"Public IP retrieved: {ip}")
@@ -337,6 +460,15 @@ class ServerMonitor:
                 "kernel": platform.release()
             }
 
+    @metrics.instrument("users")
+    def refresh_users(self):
+        """Đọc lại tài khoản và chỉ cập nhật phần users của system_info (delta chỉ gửi phần này)"""
+        users = self.get_user_accounts()
+        snapshot = self.snapshots.get("system_info")
+        if snapshot is not None:
+            self.snapshots.publish("system_info", dict(snapshot.data, users=users))
+        return users
+
     def get_user_accounts(self):
         """Kiểm tra số lượng tài khoản người dùng trên máy chủ"""
         try:
@@ -401,44 +533,11 @@ class ServerMonitor:
             }
 
     def get_login_history(self):
-        """Lấy lịch sử truy cập tài khoản vào server"""
-        login_history = {
-            "successful_logins": [],
-            "failed_logins": [],
-            "last_login_summary": []
-        }
-        
+        """Lấy lịch sử truy cập tài khoản vào server (chỉ các sự kiện mới kể từ lần trước)"""
         try:
-            # 1. Dùng lệnh `last` để lấy lịch sử đăng nhập (đăng nhập thành công)
-            try:
-                last_output = subprocess.check_output(
-                    ["last", "-F", "-w"],  # -F: Định dạng đầy đủ thời gian, -w: Dùng /var/log/wtmp
-                    universal_newlines=True, stderr=subprocess.STDOUT
-                )
-                for line in last_output.splitlines():
-                    if line.strip() and not line.startswith("reboot") and not line.startswith("shutdown"):
-                        parts = line.split()
-                        if len(parts) >= 8:
-                            user = parts[0]
-                            host = parts[2] if parts[2] != "in" else "local"
-                            login_time = " ".join(parts[4:8])
-                            logout_time = " ".join(parts[9:13]) if parts[9] != "still" else "still logged in"
-                            duration = parts[-2] if logout_time != "still logged in" else "N/A"
-                            
-                            login_entry = {
-                                "user": user,
-                                "host": host,
-                                "login_time": login_time,
-                                "logout_time": logout_time,
-                                "duration": duration
-                            }
-                            login_history["successful_logins"].append(login_entry)
-                            login_history["last_login_summary"].append(login_entry)
-            
-            except subprocess.CalledProcessError as e:
-                logging.error(f"Failed to run last command: {e.output}")
-            
-            logging.info(f"Login history: {len(login_history['successful_logins'])} successful, "
+            # Đọc trực tiếp bản ghi nhị phân wtmp/btmp thay vì chạy `last` trên toàn bộ lịch sử
+            login_history = self.login_reader.read()
+            logging.info(f"Login history: {len(login_history['successful_logins'])} new events, "
                         f"{len(login_history['failed_logins'])} failed logins")
             return login_history
         
@@ -448,4 +547,4 @@ class ServerMonitor:
                 "successful_logins": [],
                 "failed_logins": [],
                 "last_login_summary": []
-            }
\ No newline at end of file
+            }
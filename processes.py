@@ -0,0 +1,205 @@
+# processes.py
+
+import heapq
+import operator
+import os
+import time
+
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+STAT_SIZE = 1024
+
+
+class ProcessEntry:
+    """Trạng thái lần đọc trước của một process (khóa theo pid + starttime)"""
+
+    __slots__ = ("pid", "start_time", "name", "fd", "cpu_ticks", "rss", "read_bytes", "write_bytes",
+                 "cpu_percent", "read_rate", "write_rate", "cmdline", "sampled_at", "active")
+
+    def __init__(self, pid, start_time, name):
+        self.pid = pid
+        self.start_time = start_time
+        self.name = name
+        self.fd = None  # fd của /proc/<pid>/stat giữ mở giữa các lần quét (trong giới hạn max_handles)
+        self.cpu_ticks = None
+        self.rss = 0
+        self.read_bytes = None
+        self.write_bytes = None
+        self.cpu_percent = 0.0
+        self.read_rate = 0.0
+        self.write_rate = 0.0
+        self.cmdline = None
+        self.sampled_at = None
+        self.active = True  # Có dùng CPU ở lần đọc trước: đọc lại mỗi lượt
+
+
+def parse_stat(data):
+    """Tách /proc/<pid>/stat: trả về (tên, utime+stime, starttime, rss theo trang)"""
+    open_paren = data.find(b"(")
+    close_paren = data.rfind(b")")
+    if open_paren < 0 or close_paren < 0:
+        return None
+    fields = data[close_paren + 2:].split()
+    # Sau ")" : state(0) ... utime(11) stime(12) ... starttime(19) vsize(20) rss(21)
+    return (data[open_paren + 1:close_paren].decode("utf-8", "replace"),
+            int(fields[11]) + int(fields[12]), int(fields[19]), int(fields[21]))
+
+
+def read_io(pid):
+    """read_bytes/write_bytes từ /proc/<pid>/io (cần quyền root với process của user khác)"""
+    try:
+        with open(f"/proc/{pid}/io", "rb") as f:
+            data = f.read()
+    except OSError:
+        return None, None
+    values = {}
+    for line in data.splitlines():
+        key, _, value = line.partition(b":")
+        values[key] = value
+    try:
+        return int(values[b"read_bytes"]), int(values[b"write_bytes"])
+    except (KeyError, ValueError):
+        return None, None
+
+
+class ProcessSampler:
+    """Quét /proc tăng dần, tính CPU/RSS/IO theo chênh lệch và trả về top-N mỗi chiều
+
+    Mỗi lượt chỉ đọc stat của process mới, process đang dùng CPU, process trong top-N lần trước và
+    1/full_scan_every số process đang nghỉ (chọn theo pid): process nghỉ được đọc lại ít nhất một lần
+    sau full_scan_every lượt. Trên máy 5k process phần lớn đang ngủ, chi phí mỗi lượt giảm theo tỉ lệ đó.
+    """
+
+    def __init__(self, top_n=10, max_handles=512, full_scan_every=6):
+        self.top_n = top_n
+        self.max_handles = max_handles
+        self.full_scan_every = max(1, full_scan_every)
+        self.table = {}  # tên thư mục trong /proc (pid dạng chuỗi) -> ProcessEntry
+        self.handles = 0
+        self.cycle = 0
+        self.pinned = set()  # pid nằm trong top-N ở lượt trước
+
+    @staticmethod
+    def _read_stat(name, entry):
+        """Nội dung /proc/<pid>/stat và fd đã dùng (fd giữ của entry hoặc fd mới mở); lỗi thì b\"\" """
+        fd = entry.fd if entry is not None else None
+        try:
+            if fd is None:
+                fd = os.open(f"/proc/{name}/stat", os.O_RDONLY)
+            # Một pread trên fd giữ sẵn thay vì open/read/close mỗi lượt
+            return os.pread(fd, STAT_SIZE, 0), fd
+        except OSError:
+            # Process đã kết thúc (fd cũ trả về ESRCH) hoặc không đọc được
+            if fd is not None and (entry is None or fd != entry.fd):
+                os.close(fd)
+                fd = None
+            return b"", fd
+
+    def _entry(self, name):
+        """Đọc process có thư mục /proc/`name`; trả về (entry, cpu ticks, rss theo trang) hoặc None"""
+        entry = self.table.get(name)
+        data, fd = self._read_stat(name, entry)
+        parsed = parse_stat(data) if data else None
+        if parsed is None:
+            if entry is not None:
+                self._drop(self.table.pop(name))
+            elif fd is not None:
+                os.close(fd)
+            return None
+        comm, cpu_ticks, start_time, rss_pages = parsed
+        if entry is None or entry.start_time != start_time:
+            # Process mới hoặc pid đã bị dùng lại (chỉ thấy được qua fd mới mở)
+            if entry is not None:
+                self._drop(entry)
+            entry = ProcessEntry(int(name), start_time, comm)
+            self.table[name] = entry
+        if entry.fd is None:
+            # Giữ fd mở cho các lần quét sau trong giới hạn số fd cho phép
+            if self.handles < self.max_handles:
+                entry.fd = fd
+                self.handles += 1
+            else:
+                os.close(fd)
+        return entry, cpu_ticks, rss_pages
+
+    def _drop(self, entry):
+        if entry.fd is not None:
+            os.close(entry.fd)
+            entry.fd = None
+            self.handles -= 1
+
+    def sample(self):
+        """Quét một lượt, trả về top-N theo cpu, bộ nhớ, IO đọc và ghi"""
+        now = time.monotonic()
+        self.cycle += 1
+        slot = self.cycle % self.full_scan_every
+        # Phép toán tập hợp trên tên trong /proc (chạy trong C) thay vì vòng lặp Python qua mọi pid
+        names = set(os.listdir("/proc"))
+        for name in self.table.keys() - names:
+            self._drop(self.table.pop(name))
+        due = {name for name in names - self.table.keys() if name.isdigit()}
+        due.update(name for name, entry in self.table.items()
+                   if entry.active or entry.pid % self.full_scan_every == slot)
+        due.update(self.pinned & names)
+
+        for name in due:
+            result = self._entry(name)
+            if result is None:
+                continue
+            entry, cpu_ticks, rss_pages = result
+            entry.rss = rss_pages * PAGE_SIZE
+            elapsed = now - entry.sampled_at if entry.sampled_at is not None else None
+            entry.sampled_at = now
+
+            if entry.cpu_ticks is not None and cpu_ticks == entry.cpu_ticks:
+                # Không dùng CPU kể từ lần trước: gần như chắc chắn không có IO, bỏ qua đọc /proc/<pid>/io
+                entry.cpu_percent = 0.0
+                entry.read_rate = entry.write_rate = 0.0
+                entry.active = False
+                continue
+
+            entry.active = True
+            if entry.cpu_ticks is not None and elapsed:
+                entry.cpu_percent = round((cpu_ticks - entry.cpu_ticks) / CLOCK_TICKS / elapsed * 100, 2)
+            entry.cpu_ticks = cpu_ticks
+
+            read_bytes, write_bytes = read_io(entry.pid)
+            if read_bytes is not None and entry.read_bytes is not None and elapsed:
+                entry.read_rate = round(max(0, read_bytes - entry.read_bytes) / elapsed, 1)
+                entry.write_rate = round(max(0, write_bytes - entry.write_bytes) / elapsed, 1)
+            entry.read_bytes, entry.write_bytes = read_bytes, write_bytes
+
+        entries = list(self.table.values())
+        # Process nghỉ có CPU/IO bằng 0: top theo CPU/IO chỉ cần xét process đang hoạt động
+        active = [entry for entry in entries if entry.active]
+        top = {
+            "cpu": self._top(active, "cpu_percent"),
+            "memory": self._top(entries, "rss"),
+            "io_read": self._top(active, "read_rate"),
+            "io_write": self._top(active, "write_rate"),
+        }
+        self.pinned = {str(item["pid"]) for items in top.values() for item in items}
+        return {"total": len(entries), "top": top}
+
+    def _top(self, entries, key):
+        top = []
+        for entry in heapq.nlargest(self.top_n, entries, key=operator.attrgetter(key)):
+            if not getattr(entry, key):
+                break
+            if entry.cmdline is None:
+                try:
+                    with open(f"/proc/{entry.pid}/cmdline", "rb") as f:
+                        entry.cmdline = f.read(4096).replace(b"\0", b" ").decode("utf-8", "replace").strip()
+                except OSError:
+                    entry.cmdline = ""
+            top.append({
+                "pid": entry.pid,
+                "name": entry.name,
+                "cmdline": entry.cmdline,
+                "cpu_percent": entry.cpu_percent,
+                "rss": entry.rss,
+                "read_bytes_per_sec": entry.read_rate,
+                "write_bytes_per_sec": entry.write_rate,
+            })
+        return top
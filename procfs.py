@@ -0,0 +1,176 @@
+# procfs.py
+
+import os
+import re
+import time
+
+# Mã trạng thái TCP trong /proc/net/tcp* (include/net/tcp_states.h)
+TCP_STATES = {
+    "01": "ESTABLISHED", "02": "SYN_SENT", "03": "SYN_RECV", "04": "FIN_WAIT1",
+    "05": "FIN_WAIT2", "06": "TIME_WAIT", "07": "CLOSE", "08": "CLOSE_WAIT",
+    "09": "LAST_ACK", "0A": "LISTEN", "0B": "CLOSING", "0C": "NEW_SYN_RECV",
+}
+TCP_STATE_RE = re.compile(rb"^\s*\d+: \S+ \S+ ([0-9A-F]{2}) ", re.M)
+SECTOR_SIZE = 512
+
+
+class ProcFile:
+    """File trong /proc mở một lần và đọc lại từ đầu vào buffer dùng chung"""
+
+    def __init__(self, path, size=65536):
+        self.path = path
+        self.buf = bytearray(size)
+        self.handle = None
+
+    def read(self):
+        """Trả về nội dung hiện tại (bytes); lỗi thì trả về b\"\" """
+        try:
+            if self.handle is None:
+                self.handle = open(self.path, "rb", buffering=0)
+            self.handle.seek(0)
+            view = memoryview(self.buf)
+            length = 0
+            while True:
+                if length == len(self.buf):
+                    # File lớn hơn buffer (vd. /proc/net/tcp trên LB): nới buffer cho các lần sau
+                    # Phải nhả view trước: bytearray đang bị export thì không đổi kích thước được
+                    view.release()
+                    self.buf.extend(bytearray(len(self.buf)))
+                    view = memoryview(self.buf)
+                n = self.handle.readinto(view[length:])
+                if not n:
+                    break
+                length += n
+            data = bytes(view[:length])
+            view.release()
+            return data
+        except OSError:
+            self.close()
+            return b""
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+class ProcStats:
+    """Thu thập số liệu tần suất cao trực tiếp từ /proc, trả về dạng tổng hợp gọn"""
+
+    def __init__(self, root="/proc"):
+        self.files = {}
+        self.root = root
+        self._last_net = None
+        self._last_disk = None
+        self._disks = self._whole_disks()
+
+    def _read(self, name):
+        if name not in self.files:
+            self.files[name] = ProcFile(os.path.join(self.root, name))
+        return self.files[name].read().decode("ascii", "replace")
+
+    def _whole_disks(self):
+        """Danh sách ổ đĩa thật (bỏ loop/ram/zram), để không cộng trùng phân vùng"""
+        try:
+            return {d for d in os.listdir("/sys/block") if not d.startswith(("loop", "ram", "zram"))}
+        except OSError:
+            return set()
+
+    def meminfo(self):
+        """/proc/meminfo, đơn vị byte"""
+        info = {}
+        for line in self._read("meminfo").splitlines():
+            key, _, value = line.partition(":")
+            parts = value.split()
+            if parts:
+                info[key] = int(parts[0]) * (1024 if len(parts) > 1 and parts[1] == "kB" else 1)
+        return info
+
+    def sockstat(self):
+        """Số socket theo giao thức từ /proc/net/sockstat (+ sockstat6)"""
+        stats = {}
+        for name in ("net/sockstat", "net/sockstat6"):
+            for line in self._read(name).splitlines():
+                proto, _, rest = line.partition(":")
+                fields = rest.split()
+                values = {fields[i]: int(fields[i + 1]) for i in range(0, len(fields) - 1, 2)}
+                if values:
+                    stats[proto.lower()] = values
+        return stats
+
+    def snmp(self):
+        """Bộ đếm Tcp/Udp trong /proc/net/snmp (dòng tiêu đề + dòng giá trị)"""
+        stats = {}
+        lines = self._read("net/snmp").splitlines()
+        for header, values in zip(lines[::2], lines[1::2]):
+            proto, _, names = header.partition(":")
+            if proto in ("Tcp", "Udp"):
+                stats[proto.lower()] = dict(zip(names.split(), (int(v) for v in values.split(":", 1)[1].split())))
+        return stats
+
+    def tcp_states(self):
+        """Đếm kết nối TCP theo trạng thái từ /proc/net/tcp và tcp6"""
+        counts = {}
+        for name in ("net/tcp", "net/tcp6"):
+            if name not in self.files:
+                self.files[name] = ProcFile(os.path.join(self.root, name), size=1024 * 1024)
+            for code in TCP_STATE_RE.findall(self.files[name].read()):
+                state = TCP_STATES.get(code.decode(), code.decode())
+                counts[state] = counts.get(state, 0) + 1
+        return counts
+
+    def net_dev(self):
+        """Bộ đếm và tốc độ (byte/s, gói/s) theo từng interface từ /proc/net/dev"""
+        now = time.monotonic()
+        counters = {}
+        for line in self._read("net/dev").splitlines()[2:]:
+            name, _, values = line.partition(":")
+            fields = values.split()
+            if len(fields) >= 16:
+                counters[name.strip()] = {
+                    "rx_bytes": int(fields[0]), "rx_packets": int(fields[1]),
+                    "rx_errors": int(fields[2]), "rx_dropped": int(fields[3]),
+                    "tx_bytes": int(fields[8]), "tx_packets": int(fields[9]),
+                    "tx_errors": int(fields[10]), "tx_dropped": int(fields[11]),
+                }
+        interfaces = self._with_rates(counters, self._last_net, now,
+                                      ("rx_bytes", "tx_bytes", "rx_packets", "tx_packets"))
+        self._last_net = (now, counters)
+        return interfaces
+
+    def diskstats(self):
+        """Tổng IO của các ổ đĩa thật từ /proc/diskstats, kèm tốc độ"""
+        now = time.monotonic()
+        total = {"reads": 0, "writes": 0, "read_bytes": 0, "write_bytes": 0}
+        for line in self._read("diskstats").splitlines():
+            fields = line.split()
+            if len(fields) >= 10 and fields[2] in self._disks:
+                total["reads"] += int(fields[3])
+                total["read_bytes"] += int(fields[5]) * SECTOR_SIZE
+                total["writes"] += int(fields[7])
+                total["write_bytes"] += int(fields[9]) * SECTOR_SIZE
+        io = self._with_rates({"total": total}, self._last_disk, now,
+                              ("reads", "writes", "read_bytes", "write_bytes"))["total"]
+        self._last_disk = (now, {"total": total})
+        return io
+
+    @staticmethod
+    def _with_rates(counters, last, now, keys):
+        """Thêm `<key>_per_sec` tính từ chênh lệch với lần đọc trước"""
+        result = {}
+        for name, values in counters.items():
+            entry = dict(values)
+            if last is not None and name in last[1] and now > last[0]:
+                elapsed = now - last[0]
+                for key in keys:
+                    delta = values[key] - last[1][name][key]
+                    # Bộ đếm bị reset (interface tạo lại) thì bỏ qua mẫu này
+                    entry[f"{key}_per_sec"] = int(round(delta / elapsed)) if delta >= 0 else None
+            result[name] = entry
+        return result
+
+    def close(self):
+        for proc_file in self.files.values():
+            proc_file.close()
+        self.files = {}
+
@@ -0,0 +1,217 @@
+# scheduler.py
+
+import heapq
+import logging
+import random
+import threading
+import time
+
+from instrumentation import metrics
+
+
+def is_number(value, minimum=0, inclusive=True):
+    """Số thực/nguyên (không phải bool) >= minimum, hoặc > minimum nếu inclusive=False"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    return value >= minimum if inclusive else value > minimum
+
+
+class Job:
+    """Một tác vụ định kỳ với interval, jitter và timeout riêng"""
+
+    def __init__(self, name, func, interval, jitter=0, timeout=None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.next_run = 0.0
+        self.base_run = 0.0
+        self.trigger_at = None
+        self.callbacks = []
+        self.thread = None
+        self.started_at = None
+        self.timed_out = False
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+
+class Scheduler:
+    """Bộ lập lịch dùng heap theo đồng hồ monotonic, mỗi job chạy trên thread riêng"""
+
+    def __init__(self, clock=time.monotonic, first_run_spread=None):
+        self.clock = clock
+        # Lần chạy đầu lệch ngẫu nhiên tối đa min(jitter, first_run_spread) giây: cả fleet khởi động lại
+        # cùng lúc (update.sh) không dồn mọi job vào cùng một tick; None = lệch tối đa bằng jitter
+        self.first_run_spread = first_run_spread
+        self.jobs = {}
+        self._heap = []
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+
+    def add_job(self, name, func, interval, jitter=0, timeout=None, delay=0, spread_first=True):
+        """Đăng ký job; lần chạy đầu sau `delay` giây, cộng jitter (tối đa first_run_spread) nếu `spread_first`
+
+        Lịch sai kiểu (vd. interval "3600" từ file JSON) bị từ chối ngay bằng ValueError thay vì làm
+        chết thread lập lịch ở lần chạy sau.
+        """
+        if not is_number(interval, 0, inclusive=False):
+            raise ValueError(f"Job {name}: interval must be a positive number, got {interval!r}")
+        if not is_number(jitter) or not is_number(delay):
+            raise ValueError(f"Job {name}: jitter and delay must be non-negative numbers, got {jitter!r}, {delay!r}")
+        if timeout is not None and not is_number(timeout, 0, inclusive=False):
+            raise ValueError(f"Job {name}: timeout must be a positive number or None, got {timeout!r}")
+        job = Job(name, func, interval, jitter, timeout)
+        spread = 0
+        if spread_first:
+            spread = jitter if self.first_run_spread is None else min(jitter, self.first_run_spread)
+        with self._lock:
+            self.jobs[name] = job
+            job.base_run = self.clock() + delay
+            self._push(job, job.base_run + (random.uniform(0, spread) if spread else 0.0))
+        self._wakeup.set()
+        return job
+
+    def trigger(self, name, then=None, delay=0):
+        """Chạy job sau `delay` giây (mặc định ở vòng lặp kế tiếp), lịch định kỳ giữ nguyên;
+        trả về False nếu không có job
+
+        `then` được gọi trên thread của job sau khi lần chạy này kết thúc. Nhiều trigger trước khi
+        job kịp chạy gộp thành một lần (theo hạn sớm nhất); job đang chạy thì lần được trigger chạy
+        sau khi nó xong.
+        """
+        with self._lock:
+            job = self.jobs.get(name)
+            if job is None:
+                return False
+            if then is not None:
+                job.callbacks.append(then)
+            when = self.clock() + delay
+            if job.trigger_at is None or when < job.trigger_at:
+                self._push_trigger(job, when)
+        self._wakeup.set()
+        return True
+
+    def _push_trigger(self, job, when):
+        job.trigger_at = when
+        self._seq += 1
+        heapq.heappush(self._heap, (when, self._seq, job.name))
+
+    def _jitter(self, job):
+        return random.uniform(0, job.jitter) if job.jitter else 0.0
+
+    def _push(self, job, when):
+        job.next_run = when
+        self._seq += 1
+        heapq.heappush(self._heap, (when, self._seq, job.name))
+
+    def _run_job(self, job, callbacks=()):
+        outcome = "success"
+        try:
+            job.func()
+        except Exception as e:
+            outcome = "error"
+            logging.error(f"Job {job.name} failed: {str(e)}")
+        finally:
+            elapsed = self.clock() - job.started_at
+            metrics.observe("agent_job_duration_seconds", elapsed, job=job.name)
+            metrics.inc("agent_job_runs_total", job=job.name, outcome=outcome)
+            if job.timed_out:
+                logging.warning(f"Job {job.name} finished after timeout ({elapsed:.1f}s)")
+            logging.debug(f"Job {job.name} finished in {elapsed:.3f}s")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logging.error(f"Callback after job {job.name} failed: {str(e)}")
+
+    def _dispatch(self, job, callbacks=()):
+        # Không chạy chồng: nếu lần trước chưa xong thì bỏ qua lượt này
+        if job.running:
+            logging.warning(f"Job {job.name} still running, skipping this run")
+            metrics.inc("agent_job_skipped_total", job=job.name)
+            return
+        job.started_at = self.clock()
+        job.timed_out = False
+        job.thread = threading.Thread(target=self._run_job, args=(job, callbacks), name=f"job-{job.name}")
+        job.thread.daemon = True
+        job.thread.start()
+
+    def _check_timeouts(self):
+        now = self.clock()
+        for job in self.jobs.values():
+            if job.timeout and job.running and not job.timed_out and now - job.started_at > job.timeout:
+                # Thread Python không thể bị kill; đánh dấu để các lượt sau bị bỏ qua cho tới khi job kết thúc
+                job.timed_out = True
+                metrics.inc("agent_job_timeouts_total", job=job.name)
+                logging.error(f"Job {job.name} exceeded timeout of {job.timeout}s")
+
+    def run_pending(self):
+        """Chạy các job đến hạn, trả về số giây tới job kế tiếp"""
+        now = self.clock()
+        due = {}  # job -> callback của các trigger
+        retry = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                when, _, name = heapq.heappop(self._heap)
+                job = self.jobs.get(name)
+                if job is None:
+                    continue
+                try:
+                    self._schedule(job, when, now, due, retry)
+                except Exception as e:
+                    # Lỗi của một job không được làm dừng lịch của các job khác
+                    logging.error(f"Scheduling job {job.name} failed, retrying in 60s: {str(e)}")
+                    metrics.inc("agent_scheduler_errors_total", job=job.name)
+                    self._push(job, now + 60)
+            for job in retry:
+                self._push_trigger(job, now + 1.0)
+            delay = self._heap[0][0] - now if self._heap else 1.0
+        for job, callbacks in due.items():
+            try:
+                self._dispatch(job, callbacks)
+            except Exception as e:
+                logging.error(f"Starting job {job.name} failed: {str(e)}")
+                metrics.inc("agent_scheduler_errors_total", job=job.name)
+        self._check_timeouts()
+        return max(0.0, min(delay, 1.0))
+
+    def _schedule(self, job, when, now, due, retry):
+        """Xử lý một mục đến hạn của heap (đang giữ lock): đưa job vào `due` và đặt lịch lần sau"""
+        if job.trigger_at == when:
+            # Chạy theo trigger(): không đẩy lịch định kỳ; job đang chạy thì thử lại sau 1 giây
+            if job.running:
+                retry.append(job)
+                return
+            job.trigger_at = None
+            callbacks, job.callbacks = job.callbacks, []
+            due.setdefault(job, []).extend(callbacks)
+            return
+        if job.next_run != when:
+            return
+        due.setdefault(job, [])
+        # Lịch tính từ mốc dự kiến (chưa cộng jitter) thay vì thời điểm chạy xong, tránh trôi nhịp
+        job.base_run += job.interval
+        if job.base_run <= now:
+            job.base_run = now + job.interval
+        self._push(job, job.base_run + self._jitter(job))
+
+    def run(self):
+        """Vòng lặp chính, chạy cho tới khi stop(); lỗi bất ngờ chỉ được ghi log, vòng lặp vẫn chạy"""
+        while not self._stop.is_set():
+            try:
+                delay = self.run_pending()
+            except Exception as e:
+                logging.error(f"Scheduler loop failed: {str(e)}")
+                metrics.inc("agent_scheduler_errors_total", job="")
+                delay = 1.0
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
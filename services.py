@@ -0,0 +1,132 @@
+# services.py
+
+import logging
+import os
+import time
+
+from executor import run_command
+
+PROPERTIES = (
+    "Id", "Description", "LoadState", "ActiveState", "SubState", "UnitFileState",
+    "MainPID", "NRestarts", "MemoryCurrent", "CPUUsageNSec", "TasksCurrent", "ControlGroup",
+)
+# Các trường xác định "trạng thái" của unit; accounting thay đổi liên tục nên không tính
+STATE_FIELDS = ("load_state", "active_state", "sub_state", "unit_file_state", "main_pid", "restarts")
+CGROUP_ROOT = "/sys/fs/cgroup"
+UNSET = ("", "[not set]", "18446744073709551615")
+
+
+def _int(value):
+    return None if value in UNSET else int(value)
+
+
+def parse_show(output):
+    """Tách output `systemctl show` nhiều unit (các khối cách nhau bởi dòng trống)"""
+    units = []
+    current = {}
+    for line in output.splitlines():
+        if not line.strip():
+            if current:
+                units.append(current)
+            current = {}
+            continue
+        key, _, value = line.partition("=")
+        current[key] = value
+    if current:
+        units.append(current)
+    return units
+
+
+def _read_cgroup(path):
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def cgroup_accounting(control_group):
+    """Bộ nhớ (byte) và CPU (ns) của một cgroup khi systemd không bật accounting"""
+    if not control_group:
+        return None, None
+    # cgroup v2
+    memory = _read_cgroup(os.path.join(CGROUP_ROOT, control_group.lstrip("/"), "memory.current"))
+    cpu_stat = _read_cgroup(os.path.join(CGROUP_ROOT, control_group.lstrip("/"), "cpu.stat"))
+    cpu = None
+    if cpu_stat:
+        for line in cpu_stat.splitlines():
+            if line.startswith("usage_usec "):
+                cpu = int(line.split()[1]) * 1000
+    if memory is None:
+        # cgroup v1
+        memory = _read_cgroup(os.path.join(CGROUP_ROOT, "memory", control_group.lstrip("/"), "memory.usage_in_bytes"))
+        usage = _read_cgroup(os.path.join(CGROUP_ROOT, "cpu,cpuacct", control_group.lstrip("/"), "cpuacct.usage"))
+        cpu = int(usage) if usage else cpu
+    return (int(memory) if memory else None), cpu
+
+
+class ServiceCollector:
+    """Lấy trạng thái mọi service bằng một lệnh `systemctl show`, kèm MainPID, số lần restart và accounting"""
+
+    def __init__(self):
+        self.last_states = None
+        self.last_cpu = {}
+
+    def query(self):
+        result = run_command(
+            ["systemctl", "show", "--no-pager", f"--property={','.join(PROPERTIES)}", "*.service"]
+        )
+        if not result.ok:
+            raise RuntimeError(result.describe())
+        return parse_show(result.output)
+
+    def collect(self):
+        """Trả về dict gồm toàn bộ service, các unit đổi trạng thái và accounting của unit đang chạy"""
+        now = time.monotonic()
+        services = []
+        accounting = {}
+        cpu_totals = {}
+        for unit in self.query():
+            if not unit.get("Id", "").endswith(".service"):
+                continue
+            name = unit["Id"][:-len(".service")]
+            service = {
+                "name": name,
+                "load_state": unit.get("LoadState", ""),
+                "active_state": unit.get("ActiveState", ""),
+                "sub_state": unit.get("SubState", ""),
+                "unit_file_state": unit.get("UnitFileState", ""),
+                "description": unit.get("Description") or "No description",
+                "main_pid": _int(unit.get("MainPID", "")) or None,
+                "restarts": _int(unit.get("NRestarts", "")),
+            }
+            services.append(service)
+
+            if service["active_state"] not in ("active", "reloading", "activating", "deactivating"):
+                continue
+            memory = _int(unit.get("MemoryCurrent", ""))
+            cpu_ns = _int(unit.get("CPUUsageNSec", ""))
+            if memory is None or cpu_ns is None:
+                cg_memory, cg_cpu = cgroup_accounting(unit.get("ControlGroup", ""))
+                memory = memory if memory is not None else cg_memory
+                cpu_ns = cpu_ns if cpu_ns is not None else cg_cpu
+            usage = {"memory": memory, "tasks": _int(unit.get("TasksCurrent", "")), "cpu_ns": cpu_ns}
+            if cpu_ns is not None:
+                cpu_totals[name] = cpu_ns
+                previous = self.last_cpu.get(name)
+                if previous and now > previous[0] and cpu_ns >= previous[1]:
+                    usage["cpu_percent"] = round((cpu_ns - previous[1]) / ((now - previous[0]) * 1e9) * 100, 2)
+            accounting[name] = usage
+        self.last_cpu = {name: (now, cpu) for name, cpu in cpu_totals.items()}
+
+        states = {s["name"]: tuple(s[f] for f in STATE_FIELDS) for s in services}
+        if self.last_states is None:
+            changes = services
+            removed = []
+        else:
+            changes = [s for s in services if self.last_states.get(s["name"]) != states[s["name"]]]
+            removed = [name for name in self.last_states if name not in states]
+        self.last_states = states
+        if changes or removed:
+            logging.info(f"Services: {len(changes)} changed, {len(removed)} removed of {len(services)}")
+        return {"services": services, "changes": changes, "removed": removed, "accounting": accounting}
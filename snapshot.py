@@ -0,0 +1,102 @@
+# snapshot.py
+
+import json
+import logging
+import os
+import threading
+import time
+
+
+class Snapshot:
+    """Kết quả mới nhất của một collector, chuyển thẳng cho sender trong bộ nhớ"""
+
+    __slots__ = ("name", "data", "timestamp", "seq")
+
+    def __init__(self, name, data, timestamp, seq):
+        self.name = name
+        self.data = data
+        self.timestamp = timestamp
+        self.seq = seq
+
+
+class SnapshotStore:
+    """Lưu snapshot mới nhất theo tên; ghi ra đĩa (tùy chọn) trên thread riêng bằng rename nguyên tử"""
+
+    def __init__(self, data_dir=None, persist=False):
+        self.data_dir = data_dir
+        self.persist = persist and data_dir is not None
+        self.snapshots = {}
+        self._seq = 0
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._writer = None
+
+    def _path(self, name):
+        return os.path.join(self.data_dir, f"{name}.json")
+
+    def publish(self, name, data):
+        """Ghi nhận kết quả mới của collector `name`"""
+        with self._lock:
+            self._seq += 1
+            snapshot = Snapshot(name, data, time.time(), self._seq)
+            self.snapshots[name] = snapshot
+            if self.persist:
+                self._dirty.add(name)
+        if self.persist:
+            self._wakeup.set()
+        return snapshot
+
+    def get(self, name):
+        with self._lock:
+            return self.snapshots.get(name)
+
+    def latest(self, names=None):
+        """{tên: Snapshot} cho các collector đã có dữ liệu"""
+        with self._lock:
+            if names is None:
+                return dict(self.snapshots)
+            return {name: self.snapshots[name] for name in names if name in self.snapshots}
+
+    def load(self, names):
+        """Nạp các snapshot đã lưu từ lần chạy trước (chỉ gọi lúc khởi động)"""
+        for name in names:
+            try:
+                with open(self._path(name), "r") as f:
+                    data = json.load(f)
+                with self._lock:
+                    if name not in self.snapshots:
+                        self._seq += 1
+                        self.snapshots[name] = Snapshot(name, data, os.path.getmtime(self._path(name)), self._seq)
+            except FileNotFoundError:
+                continue
+            except (ValueError, OSError) as e:
+                logging.warning(f"Ignoring unreadable snapshot file {self._path(name)}: {str(e)}")
+
+    def flush(self):
+        """Ghi các snapshot đã thay đổi ra đĩa: file tạm rồi os.replace, không bao giờ đọc phải file ghi dở"""
+        with self._lock:
+            dirty = [self.snapshots[name] for name in self._dirty]
+            self._dirty.clear()
+        for snapshot in dirty:
+            path = self._path(snapshot.name)
+            try:
+                data = json.dumps(snapshot.data, separators=(",", ":"), default=str)
+                with open(f"{path}.tmp", "w") as f:
+                    f.write(data)
+                os.replace(f"{path}.tmp", path)
+            except OSError as e:
+                logging.error(f"Failed to persist snapshot {snapshot.name}: {str(e)}")
+
+    def _run_writer(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            self.flush()
+
+    def start(self):
+        """Khởi động thread ghi đĩa nền nếu bật persist"""
+        if self.persist and self._writer is None:
+            self._writer = threading.Thread(target=self._run_writer, name="snapshot-writer")
+            self._writer.daemon = True
+            self._writer.start()
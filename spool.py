@@ -0,0 +1,179 @@
+# spool.py
+
+import json
+import logging
+import os
+import struct
+import threading
+import zlib
+
+# Mỗi bản ghi: độ dài payload + CRC32 của payload, sau đó là payload JSON
+HEADER = struct.Struct("<II")
+SEGMENT_SUFFIX = ".seg"
+CURSOR_FILE = "cursor.json"
+
+
+class Spool:
+    """Hàng đợi append-only trên đĩa, chia segment, có giới hạn dung lượng và con trỏ ack"""
+
+    def __init__(self, directory, segment_bytes, max_bytes):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.evicted = 0
+        self.id = None  # Định danh của spool này, cùng với cursor tạo thành id batch duy nhất
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self.segments = self._list_segments()
+        self.cursor = self._load_cursor()
+        if self.id is None:
+            self.id = os.urandom(6).hex()
+            self._save_cursor()
+        self._writer = None
+        self._recover()
+
+    def _segment_path(self, seq):
+        return os.path.join(self.directory, f"{seq:012d}{SEGMENT_SUFFIX}")
+
+    def _list_segments(self):
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit():
+                segments.append(int(name[:-len(SEGMENT_SUFFIX)]))
+        return sorted(segments)
+
+    def _load_cursor(self):
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE), "r") as f:
+                cursor = json.load(f)
+            self.id = cursor.get("id")
+            return (cursor["segment"], cursor["offset"])
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, OSError) as e:
+            logging.error(f"Spool cursor unreadable, replaying from oldest segment: {str(e)}")
+        return (self.segments[0] if self.segments else 0, 0)
+
+    def _save_cursor(self):
+        path = os.path.join(self.directory, CURSOR_FILE)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({"segment": self.cursor[0], "offset": self.cursor[1], "id": self.id}, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _size(self):
+        total = 0
+        for seq in self.segments:
+            try:
+                total += os.path.getsize(self._segment_path(seq))
+            except OSError:
+                pass
+        return total
+
+    def _recover(self):
+        """Cắt bỏ bản ghi ghi dở ở cuối segment mới nhất (vd. do mất điện)"""
+        if not self.segments:
+            return
+        path = self._segment_path(self.segments[-1])
+        valid = 0
+        with open(path, "rb") as f:
+            while True:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    break
+                length, crc = HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                valid = f.tell()
+        if valid < os.path.getsize(path):
+            logging.warning(f"Truncating torn tail of spool segment {path} at offset {valid}")
+            os.truncate(path, valid)
+
+    def _open_writer(self):
+        if self._writer is not None:
+            if self._writer.tell() < self.segment_bytes:
+                return self._writer
+            self._writer.close()
+            self.segments.append(self.segments[-1] + 1)
+        elif not self.segments:
+            self.segments.append(max(self.cursor[0], 1))
+        self._writer = open(self._segment_path(self.segments[-1]), "ab")
+        return self._writer
+
+    def _evict(self):
+        """Xóa segment cũ nhất khi vượt quá dung lượng cho phép (giữ segment đang ghi)"""
+        while len(self.segments) > 1 and self._size() > self.max_bytes:
+            seq = self.segments.pop(0)
+            os.remove(self._segment_path(seq))
+            self.evicted += 1
+            logging.warning(f"Spool over {self.max_bytes} bytes, evicted segment {seq}")
+            if self.cursor[0] <= seq:
+                self.cursor = (self.segments[0], 0)
+                self._save_cursor()
+
+    def append(self, record):
+        """Ghi một bản ghi (dict JSON) vào cuối spool, trả về số byte của bản ghi"""
+        payload = json.dumps(record, separators=(",", ":"), default=str).encode("utf-8")
+        with self._lock:
+            writer = self._open_writer()
+            writer.write(HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+            writer.flush()
+            self._evict()
+        return len(payload)
+
+    def batch_id(self, start, end):
+        """Id ổn định của đoạn [start, end): gửi lại đúng đoạn đó (mất ack) cho cùng id để server bỏ trùng"""
+        return f"{self.id}:{start[0]}.{start[1]}-{end[0]}.{end[1]}"
+
+    def read_batch(self, max_records, max_bytes):
+        """Đọc các bản ghi từ con trỏ ack; trả về (records, cursor_mới) để ack sau khi gửi"""
+        records = []
+        size = 0
+        with self._lock:
+            if self._writer is not None:
+                self._writer.flush()
+            seq, offset = self.cursor
+            for segment in [s for s in self.segments if s >= seq]:
+                if segment != seq:
+                    offset = 0
+                seq = segment
+                try:
+                    with open(self._segment_path(segment), "rb") as f:
+                        f.seek(offset)
+                        while len(records) < max_records and size < max_bytes:
+                            header = f.read(HEADER.size)
+                            if len(header) < HEADER.size:
+                                break
+                            length, crc = HEADER.unpack(header)
+                            payload = f.read(length)
+                            if len(payload) < length or zlib.crc32(payload) != crc:
+                                # Bản ghi hỏng (ghi dở khi mất điện...): bỏ phần còn lại của segment
+                                logging.error(f"Corrupt record in spool segment {segment} at offset {offset}, skipping rest of segment")
+                                offset = os.path.getsize(self._segment_path(segment))
+                                break
+                            records.append(json.loads(payload.decode("utf-8")))
+                            size += length
+                            offset = f.tell()
+                except FileNotFoundError:
+                    continue
+                if len(records) >= max_records or size >= max_bytes:
+                    break
+            return records, (seq, offset)
+
+    def ack(self, cursor):
+        """Ghi nhận đã gửi xong tới cursor, xóa các segment đã đọc hết"""
+        with self._lock:
+            self.cursor = cursor
+            self._save_cursor()
+            while len(self.segments) > 1 and self.segments[0] < cursor[0]:
+                seq = self.segments.pop(0)
+                try:
+                    os.remove(self._segment_path(seq))
+                except FileNotFoundError:
+                    pass
+
+    def pop_evicted(self):
+        """Trả về số segment bị xóa do đầy kể từ lần gọi trước"""
+        with self._lock:
+            evicted, self.evicted = self.evicted, 0
+            return evicted
@@ -0,0 +1,146 @@
+# timeseries.py
+
+import json
+import logging
+import math
+import os
+import socketserver
+import threading
+import time
+from array import array
+
+
+class RingBuffer:
+    """Bộ đệm vòng cố định cho một chuỗi số (timestamp, giá trị) dựa trên array"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self.start = 0
+        self.count = 0
+
+    def append(self, timestamp, value):
+        index = (self.start + self.count) % self.capacity
+        self.times[index] = timestamp
+        self.values[index] = value
+        if self.count < self.capacity:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def range(self, start=None, end=None):
+        """Các điểm (timestamp, giá trị) trong [start, end), theo thứ tự thời gian"""
+        points = []
+        for i in range(self.count):
+            index = (self.start + i) % self.capacity
+            timestamp = self.times[index]
+            if (start is None or timestamp >= start) and (end is None or timestamp < end):
+                points.append((timestamp, self.values[index]))
+        return points
+
+
+def summarize(values):
+    """min/max/avg/p95 của một bucket"""
+    ordered = sorted(values)
+    p95 = ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+    return {
+        "min": ordered[0],
+        "max": ordered[-1],
+        "avg": round(sum(ordered) / len(ordered), 3),
+        "p95": p95,
+        "count": len(ordered)
+    }
+
+
+class TimeSeriesStore:
+    """Lưu các chuỗi số liệu trong RAM với bộ nhớ cố định cho mỗi chuỗi"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def record(self, metrics, timestamp=None):
+        """Ghi một mẫu gồm nhiều metric {tên: số}; bỏ qua giá trị None"""
+        timestamp = timestamp or time.time()
+        with self._lock:
+            for name, value in metrics.items():
+                if value is None:
+                    continue
+                if name not in self.series:
+                    self.series[name] = RingBuffer(self.capacity)
+                self.series[name].append(timestamp, float(value))
+
+    def names(self):
+        with self._lock:
+            return sorted(self.series)
+
+    def query(self, name, start=None, end=None):
+        with self._lock:
+            ring = self.series.get(name)
+            return ring.range(start, end) if ring else []
+
+    def rollup(self, start, end, step, names=None):
+        """Gộp các điểm trong [start, end) thành bucket `step` giây: {tên: [bucket...]}"""
+        result = {}
+        for name in names or self.names():
+            buckets = {}
+            for timestamp, value in self.query(name, start, end):
+                bucket = timestamp - timestamp % step
+                buckets.setdefault(bucket, []).append(value)
+            if buckets:
+                result[name] = [dict(summarize(values), start=bucket) for bucket, values in sorted(buckets.items())]
+        return result
+
+
+class QueryHandler(socketserver.StreamRequestHandler):
+    """Mỗi dòng yêu cầu là một JSON, trả về một dòng JSON
+
+    {"op": "series"}
+    {"op": "query", "series": "cpu.percent", "start": ..., "end": ...}
+    {"op": "rollup", "start": ..., "end": ..., "step": 60, "series": [...]}
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line.decode("utf-8"))
+                response = self.server.dispatch(request)
+            except Exception as e:
+                response = {"error": str(e)}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class QueryServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """API truy vấn cục bộ qua Unix socket"""
+
+    daemon_threads = True
+
+    def __init__(self, path, store):
+        self.store = store
+        if os.path.exists(path):
+            os.remove(path)
+        super().__init__(path, QueryHandler)
+        os.chmod(path, 0o600)
+
+    def dispatch(self, request):
+        op = request.get("op")
+        now = time.time()
+        if op == "series":
+            return {"series": self.store.names()}
+        if op == "query":
+            points = self.store.query(request["series"], request.get("start"), request.get("end"))
+            return {"series": request["series"], "points": points}
+        if op == "rollup":
+            return {"rollup": self.store.rollup(
+                request.get("start", now - 3600), request.get("end", now),
+                request.get("step", 60), request.get("series")
+            )}
+        return {"error": f"unknown op {op}"}
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, name="timeseries-query")
+        thread.daemon = True
+        thread.start()
+        logging.info(f"Time series query API listening on {self.server_address}")
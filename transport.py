@@ -0,0 +1,150 @@
+# transport.py
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import metrics
+
+# Lỗi tạm thời nên thử lại / chuyển sang endpoint khác
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Request không idempotent (POST không có Idempotency-Key) chỉ thử lại khi chắc chắn server chưa xử lý:
+# không kết nối được, hoặc server báo từ chối trước khi xử lý. Read timeout, 500/502/504 có thể đã được ghi
+NOT_PROCESSED_STATUSES = (429, 503)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+class TransportError(requests.RequestException):
+    """Mọi endpoint đều lỗi hoặc hết ngân sách thử lại"""
+
+
+def normalize_url(url):
+    """Thêm https:// cho URL không có scheme (vd. MONITOR_URL cũ dạng "host.com")"""
+    return url if "://" in url else f"https://{url}"
+
+
+class RetryBudget:
+    """Giới hạn số lần thử lại theo tỉ lệ số request, tránh dồn dập retry khi server quá tải"""
+
+    def __init__(self, ratio, max_tokens=10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class Transport:
+    """HTTP dùng chung cho mọi kết nối ra ngoài: pool keep-alive, timeout, retry có jitter, failover"""
+
+    def __init__(self, endpoints=(), pool_size=4, connect_timeout=5, read_timeout=30,
+                 max_retries=2, retry_base=0.5, retry_budget_ratio=0.2, max_concurrency=4):
+        self.endpoints = [normalize_url(url) for url in endpoints]
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.budget = RetryBudget(retry_budget_ratio)
+        self.preferred = 0
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    @staticmethod
+    def idempotent(method, kwargs):
+        """Gửi lại request này có an toàn không (server bỏ trùng theo Idempotency-Key)"""
+        return method.upper() in IDEMPOTENT_METHODS or "Idempotency-Key" in (kwargs.get("headers") or {})
+
+    @staticmethod
+    def retryable(error, idempotent):
+        """Lỗi có thể thử lại / chuyển endpoint mà không làm server ghi hai lần"""
+        if isinstance(error, requests.HTTPError):
+            statuses = RETRY_STATUSES if idempotent else NOT_PROCESSED_STATUSES
+            return error.response is not None and error.response.status_code in statuses
+        if isinstance(error, requests.ConnectionError):
+            # ConnectTimeout là ConnectionError; ReadTimeout thì không
+            return True
+        return idempotent and isinstance(error, requests.Timeout)
+
+    def request(self, method, url, **kwargs):
+        """Gửi request, thử lại lỗi tạm thời với backoff lũy thừa + full jitter trong ngân sách cho phép"""
+        kwargs.setdefault("timeout", self.timeout)
+        idempotent = self.idempotent(method, kwargs)
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                with self._slots:
+                    response = self.session.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                error = requests.HTTPError(f"{response.status_code} from {url}", response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            if not self.retryable(error, idempotent):
+                if isinstance(error, requests.HTTPError):
+                    return error.response
+                raise error
+            if attempt >= self.max_retries or not self.budget.withdraw():
+                raise error
+            attempt += 1
+            metrics.inc("agent_http_retries_total")
+            time.sleep(random.uniform(0, self.retry_base * 2 ** attempt))
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def post_ingest(self, **kwargs):
+        """POST tới endpoint ingest, bắt đầu từ endpoint tốt gần nhất và chuyển sang endpoint khác khi lỗi"""
+        if not self.endpoints:
+            raise TransportError("No ingest endpoint configured")
+        idempotent = self.idempotent("POST", kwargs)
+        errors = []
+        for i in range(len(self.endpoints)):
+            index = (self.preferred + i) % len(self.endpoints)
+            url = self.endpoints[index]
+            try:
+                response = self.post(url, **kwargs)
+                if response.status_code in RETRY_STATUSES:
+                    raise requests.HTTPError(f"{response.status_code} from {url}", response=response)
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                logging.warning(f"Ingest endpoint {url} failed: {str(e)}")
+                if not self.retryable(e, idempotent):
+                    # Endpoint có thể đã nhận batch: gửi sang endpoint khác sẽ ghi trùng
+                    raise
+                errors.append(str(e))
+                continue
+            if index != self.preferred:
+                logging.info(f"Failing over to ingest endpoint {url}")
+                metrics.inc("agent_http_failovers_total")
+                self.preferred = index
+            return response
+        raise TransportError(f"All ingest endpoints failed: {'; '.join(errors)}")
+
+    def submit(self, func, *args, **kwargs):
+        """Chạy một lần gửi trên thread pool của transport, không chặn thread thu thập"""
+        return self._executor.submit(func, *args, **kwargs)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
@@ -0,0 +1,200 @@
+# watcher.py
+
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
+import hashlib
+import logging
+import os
+import select
+import struct
+import threading
+import time
+
+# include/uapi/linux/inotify.h
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+# Theo dõi thư mục (không theo inode của file): passwd, sudoers... được ghi lại bằng file tạm + rename
+WATCH_MASK = (IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT = struct.Struct("iIII")  # wd, mask, cookie, len (tên theo sau, đệm NUL)
+EVENT_NAMES = (
+    (IN_CLOSE_WRITE, "modified"), (IN_ATTRIB, "attrib"), (IN_CREATE, "created"), (IN_DELETE, "deleted"),
+    (IN_MOVED_TO, "moved_in"), (IN_MOVED_FROM, "moved_out"),
+)
+HASH_MAX_BYTES = 1024 * 1024
+
+
+class Inotify:
+    """inotify của kernel qua ctypes (không cần gói ngoài)"""
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def read_events(self):
+        """Đọc hết các sự kiện đang chờ: [(wd, mask, tên file)]"""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return events
+                raise
+            offset = 0
+            while offset + EVENT.size <= len(data):
+                wd, mask, _, length = EVENT.unpack_from(data, offset)
+                offset += EVENT.size
+                name = data[offset:offset + length].rstrip(b"\0").decode("utf-8", "replace")
+                offset += length
+                events.append((wd, mask, name))
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def describe_change(path, events):
+    """Một thay đổi gửi lên server: loại sự kiện và sha1 nội dung hiện tại (nếu còn là file thường)"""
+    change = {"path": path, "events": sorted(events)}
+    try:
+        if os.path.isfile(path) and os.path.getsize(path) <= HASH_MAX_BYTES:
+            with open(path, "rb") as f:
+                change["sha1"] = hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        pass
+    return change
+
+
+class Watcher:
+    """Theo dõi các nhóm file/thư mục, gom sự kiện trong `debounce` giây rồi gọi callback(nhóm, thay đổi)
+
+    `watches` là {nhóm: [đường dẫn]}; đường dẫn kết thúc bằng "/" nghĩa là mọi file trong thư mục đó,
+    tên file có thể là mẫu glob ("invocation:*.service").
+    Thread chỉ thức dậy khi kernel có sự kiện, không quét định kỳ.
+    """
+
+    def __init__(self, watches, callback, debounce=2.0):
+        self.callback = callback
+        self.debounce = debounce
+        self.targets = {}  # thư mục -> [(nhóm, tên file/mẫu glob hoặc None = mọi file)]
+        for group, paths in watches.items():
+            for path in paths:
+                if path.endswith("/"):
+                    directory, name = path.rstrip("/") or "/", None
+                else:
+                    directory, name = os.path.split(path)
+                self.targets.setdefault(directory, []).append((group, name))
+        self.inotify = None
+        self.wds = {}  # wd -> thư mục
+        self.pending = {}  # nhóm -> {đường dẫn: {sự kiện}}
+        self.deadline = None
+        self._wake_r = self._wake_w = None
+        self._stopped = False
+
+    def start(self):
+        """Đăng ký watch và chạy thread nền; trả về False nếu không có inotify (kernel cũ, không phải Linux)"""
+        try:
+            self.inotify = Inotify()
+        except (OSError, AttributeError) as e:
+            logging.warning(f"inotify unavailable, changes are only seen by periodic collectors: {str(e)}")
+            return False
+        for directory in self.targets:
+            try:
+                self.wds[self.inotify.add_watch(directory)] = directory
+            except OSError as e:
+                # Thư mục không có trên distro này (vd. /etc/ufw trên RHEL)
+                logging.debug(f"Not watching {directory}: {str(e)}")
+        self._wake_r, self._wake_w = os.pipe()
+        thread = threading.Thread(target=self.run, name="watcher")
+        thread.daemon = True
+        thread.start()
+        logging.info(f"Watching {len(self.wds)} directories for changes")
+        return True
+
+    def _add(self, group, path, labels):
+        self.pending.setdefault(group, {}).setdefault(path, set()).update(labels)
+
+    def _record(self, directory, mask, name):
+        labels = [label for bit, label in EVENT_NAMES if mask & bit]
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            labels.append("removed")
+        for group, target in self.targets.get(directory, ()):
+            if target is None or not name or fnmatch.fnmatchcase(name, target):
+                self._add(group, os.path.join(directory, name) if name else directory, labels)
+
+    def handle(self, events):
+        """Gom sự kiện theo nhóm; lượt đầu tiên của một đợt đặt hạn debounce"""
+        for wd, mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                # Hàng đợi kernel tràn: không biết file nào đổi, coi như mọi nhóm đều đổi
+                for directory, entries in self.targets.items():
+                    for group, target in entries:
+                        self._add(group, os.path.join(directory, target) if target else directory, ["overflow"])
+                continue
+            directory = self.wds.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                # Thư mục bị xóa hoặc unmount: kernel tự gỡ watch
+                del self.wds[wd]
+                continue
+            self._record(directory, mask, name)
+        if self.pending and self.deadline is None:
+            self.deadline = time.monotonic() + self.debounce
+
+    def flush(self):
+        pending, self.pending, self.deadline = self.pending, {}, None
+        for group, paths in pending.items():
+            changes = [describe_change(path, events) for path, events in sorted(paths.items())]
+            try:
+                self.callback(group, changes)
+            except Exception as e:
+                logging.error(f"Change handler for {group} failed: {str(e)}")
+
+    def run(self):
+        poller = select.poll()
+        poller.register(self.inotify.fd, select.POLLIN)
+        poller.register(self._wake_r, select.POLLIN)
+        while not self._stopped:
+            timeout = None if self.deadline is None else max(0, (self.deadline - time.monotonic()) * 1000)
+            ready = {fd for fd, _ in poller.poll(timeout)}
+            if self._stopped:
+                break
+            if self.inotify.fd in ready:
+                self.handle(self.inotify.read_events())
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                self.flush()
+        self.inotify.close()
+        os.close(self._wake_r)
+
+    def stop(self):
+        if self._wake_w is not None and not self._stopped:
+            self._stopped = True
+            os.write(self._wake_w, b"x")
+            os.close(self._wake_w)
@@ -0,0 +1,218 @@
+# wtmp.py
+
+import json
+import logging
+import os
+import re
+import struct
+from datetime import datetime, timedelta, timezone
+
+# struct utmp của glibc trên Linux (384 byte, ut_tv dùng 32 bit kể cả trên x86_64)
+UTMP = struct.Struct("<h2xi32s4s32s256s2hi2i4i20s")
+BOOT_TIME = 2
+LOGIN_PROCESS = 6
+USER_PROCESS = 7
+DEAD_PROCESS = 8
+READ_CHUNK_RECORDS = 4096
+
+AUTH_FAILURE_RE = re.compile(
+    r"Failed (?:password|publickey) for (?:invalid user )?(?P<user>\S+) from (?P<host>\S+)"
+)
+# rsyslog mặc định mới (RFC3339): "2026-10-18T10:00:00.123456+07:00 host sshd[1]: ..."
+RFC3339_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(?:\.\d+)?(Z|[+-]\d{2}:?\d{2})?")
+# Syslog cổ điển (RFC3164), không có năm: "Oct 18 10:00:00 host sshd[1]: ..."
+RFC3164_RE = re.compile(r"^([A-Z][a-z]{2}) +(\d{1,2}) (\d{2}):(\d{2}):(\d{2})")
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def _text(raw):
+    return raw.split(b"\0", 1)[0].decode("utf-8", "replace")
+
+
+def parse_syslog_time(line, now=None):
+    """Thời điểm của một dòng syslog (RFC3339 hoặc RFC3164) dạng ISO giờ địa phương như parse_utmp; None nếu không nhận ra"""
+    now = now or datetime.now()
+    match = RFC3339_RE.match(line)
+    if match:
+        year, month, day, hour, minute, second = (int(value) for value in match.groups()[:6])
+        offset = match.group(7)
+        try:
+            moment = datetime(year, month, day, hour, minute, second)
+        except ValueError:
+            return None
+        if offset:
+            # Đổi về giờ địa phương của agent, cùng mốc với thời gian trong wtmp/btmp
+            if offset == "Z":
+                tz = timezone.utc
+            else:
+                sign = -1 if offset[0] == "-" else 1
+                digits = offset[1:].replace(":", "")
+                tz = timezone(sign * timedelta(hours=int(digits[:2]), minutes=int(digits[2:])))
+            moment = datetime.fromtimestamp(moment.replace(tzinfo=tz).timestamp())
+        return moment.isoformat()
+    match = RFC3164_RE.match(line)
+    if match and match.group(1) in MONTHS:
+        month = MONTHS.index(match.group(1)) + 1
+        day, hour, minute, second = (int(value) for value in match.groups()[1:])
+        try:
+            moment = datetime(now.year, month, day, hour, minute, second)
+            if moment > now + timedelta(days=1):
+                # Dòng của tháng 12 đọc vào tháng 1: năm trước
+                moment = moment.replace(year=now.year - 1)
+        except ValueError:
+            return None
+        return moment.isoformat()
+    return None
+
+
+def parse_utmp(data):
+    """Giải mã các bản ghi utmp/wtmp/btmp nguyên vẹn trong `data`"""
+    usable = len(data) - len(data) % UTMP.size
+    for fields in UTMP.iter_unpack(data[:usable]):
+        ut_type, pid, line, _, user, host, _, _, _, tv_sec, _ = fields[:11]
+        yield {
+            "type": ut_type,
+            "pid": pid,
+            "line": _text(line),
+            "user": _text(user),
+            "host": _text(host) or "local",
+            "time": datetime.fromtimestamp(tv_sec).isoformat(),
+        }
+
+
+class FileCursor:
+    """Vị trí đã đọc của một file log, nhận biết xoay vòng (đổi inode) và bị cắt ngắn"""
+
+    def __init__(self, path, state, align=1, backfill=0):
+        self.path = path
+        self.state = state
+        self.align = align
+        self.backfill = backfill
+
+    def _read_from(self, path, offset, size):
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return f.read(size - offset)
+
+    def read_new(self):
+        """Trả về các bytes mới kể từ lần đọc trước và cập nhật vị trí trong state"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return b""
+        saved = self.state.get(self.path)
+        chunks = []
+
+        if saved is None:
+            # Lần chạy đầu: chỉ lấy `backfill` byte cuối thay vì toàn bộ lịch sử
+            offset = max(0, st.st_size - self.backfill)
+        elif saved["inode"] != st.st_ino:
+            # File đã bị xoay vòng: đọc nốt phần còn lại của file cũ nếu còn (vd. wtmp.1)
+            rotated = f"{self.path}.1"
+            try:
+                rst = os.stat(rotated)
+                if rst.st_ino == saved["inode"] and rst.st_size > saved["offset"]:
+                    chunks.append(self._read_from(rotated, saved["offset"], rst.st_size))
+            except FileNotFoundError:
+                pass
+            offset = 0
+        elif st.st_size < saved["offset"]:
+            logging.warning(f"{self.path} was truncated, reading from start")
+            offset = 0
+        else:
+            offset = saved["offset"]
+
+        offset -= offset % self.align
+        end = st.st_size - (st.st_size - offset) % self.align  # Bỏ bản ghi đang ghi dở
+        if end > offset:
+            chunks.append(self._read_from(self.path, offset, end))
+        self.state[self.path] = {"inode": st.st_ino, "offset": max(end, offset)}
+        return b"".join(chunks)
+
+
+class LoginHistoryReader:
+    """Đọc tăng dần wtmp/btmp/auth.log, chỉ trả về sự kiện mới kể từ lần chạy trước"""
+
+    def __init__(self, state_file, wtmp="/var/log/wtmp", btmp="/var/log/btmp",
+                 auth_logs=("/var/log/auth.log", "/var/log/secure"), backfill_records=1000):
+        self.state_file = state_file
+        self.wtmp = wtmp
+        self.btmp = btmp
+        self.auth_logs = auth_logs
+        self.backfill_records = backfill_records
+        self.state = self.load()
+
+    def load(self):
+        try:
+            with open(self.state_file, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"files": {}, "sessions": {}}
+        except (ValueError, OSError) as e:
+            logging.error(f"Login cursor {self.state_file} unreadable, starting over: {str(e)}")
+            return {"files": {}, "sessions": {}}
+
+    def save(self):
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_file, self.state_file)
+
+    def _cursor(self, path, align=1, backfill=0):
+        return FileCursor(path, self.state.setdefault("files", {}), align, backfill)
+
+    def read_wtmp(self):
+        """Sự kiện login/logout/reboot mới trong wtmp"""
+        events = []
+        sessions = self.state.setdefault("sessions", {})
+        data = self._cursor(self.wtmp, UTMP.size, self.backfill_records * UTMP.size).read_new()
+        for offset in range(0, len(data), READ_CHUNK_RECORDS * UTMP.size):
+            for record in parse_utmp(data[offset:offset + READ_CHUNK_RECORDS * UTMP.size]):
+                if record["type"] == USER_PROCESS and record["user"]:
+                    sessions[record["line"]] = {"user": record["user"], "host": record["host"], "login_time": record["time"]}
+                    events.append({"event": "login", "user": record["user"], "host": record["host"],
+                                   "line": record["line"], "time": record["time"]})
+                elif record["type"] == DEAD_PROCESS and record["line"] in sessions:
+                    session = sessions.pop(record["line"])
+                    events.append({"event": "logout", "user": session["user"], "host": session["host"],
+                                   "line": record["line"], "login_time": session["login_time"], "time": record["time"]})
+                elif record["type"] == BOOT_TIME:
+                    # Khởi động lại: mọi phiên cũ đã kết thúc
+                    sessions.clear()
+                    events.append({"event": "reboot", "time": record["time"]})
+        return events
+
+    def read_failed(self):
+        """Đăng nhập thất bại mới từ btmp và auth.log/secure"""
+        failed = []
+        data = self._cursor(self.btmp, UTMP.size, self.backfill_records * UTMP.size).read_new()
+        for record in parse_utmp(data):
+            failed.append({"user": record["user"], "host": record["host"],
+                           "line": record["line"], "time": record["time"], "source": "btmp"})
+        for path in self.auth_logs:
+            data = self._cursor(path, backfill=0).read_new()
+            # Chỉ xử lý các dòng hoàn chỉnh; dòng đang ghi dở sẽ được đọc ở lần sau
+            complete = data.rfind(b"\n") + 1
+            if complete < len(data):
+                self.state["files"][path]["offset"] -= len(data) - complete
+            for line in data[:complete].decode("utf-8", "replace").splitlines():
+                match = AUTH_FAILURE_RE.search(line)
+                if match:
+                    # Dòng không có thời điểm đọc được: auth log chỉ đọc phần mới nên lấy thời điểm đọc
+                    failed.append({"user": match.group("user"), "host": match.group("host"),
+                                   "time": parse_syslog_time(line) or datetime.now().replace(microsecond=0).isoformat(),
+                                   "source": os.path.basename(path)})
+        return failed
+
+    def read(self):
+        """Trả về sự kiện mới và danh sách phiên đang mở, rồi lưu cursor"""
+        history = {
+            "successful_logins": self.read_wtmp(),
+            "failed_logins": self.read_failed(),
+            "last_login_summary": [dict(session, line=line) for line, session in self.state["sessions"].items()]
+        }
+        try:
+            self.save()
+        except OSError as e:
+            logging.error(f"Failed to save login cursor to {self.state_file}: {str(e)}")
+        return history